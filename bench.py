@@ -0,0 +1,210 @@
+import sys
+import time
+import json
+import argparse
+import platform
+import tracemalloc
+
+import numpy as np
+import pygame
+
+from game import Game
+from scripts.collision import hit_effect
+
+BASELINE_PATH = 'bench_baseline.json'
+SEED = 1234 # every scenario plays out the same every run
+FRAME_BUDGET_MS = 1000 / 60 # the game runs at 60 fps
+ENVIRONMENT = ('swarm', 'python', 'pygame', 'numpy', 'machine') # timings are only comparable when all of these match
+
+NO_INPUT = {'movement': [False, False, False, False], 'dash': []}
+
+def idle(game, tick):
+    '''
+    nobody touches the keyboard
+    '''
+    return NO_INPUT
+
+def dash_spam(game, tick):
+    '''
+    runs in circles and dashes as soon as the dash is back
+    '''
+    side = tick // 40 % 4
+    movement = [side == 0, side == 2, side == 1, side == 3]
+    dash = ['LKJI'[side]] if tick % 12 == 0 else []
+    return {'movement': movement, 'dash': dash}
+
+def death_bursts(game, tick):
+    '''
+    every 10 ticks a handful of enemies "die" around the player, sparks and particles pile up
+    '''
+    if tick % 10 == 0:
+        x, y = game.player.rect().center
+        for i in range(8):
+            hit_effect(game, (x + game.rng.uniform(-80, 80), y + game.rng.uniform(-60, 60)), sides=True)
+    return NO_INPUT
+
+# name -> (map to load, inputs for each tick, ticks to run before timing, player can't die)
+SCENARIOS = {
+    'idle': (0, idle, 30, False),
+    'chase': (9, idle, 30, True), # biggest map, every enemy walking at the player
+    'boss': (10, idle, 200, True), # timed once the boss's patterns have filled the screen
+    'deaths': (5, death_bursts, 30, True),
+    'dash': (3, dash_spam, 30, True),
+}
+
+def setup(name, swarm=False):
+    '''
+    makes an offscreen game on the scenario's map
+    (scenario name, swarm: bool) -> (game)
+    '''
+    level = SCENARIOS[name][0]
+    game = Game(headless=True, swarm=swarm, seed=SEED)
+    game.level = level
+    game.load_level(level)
+    return game
+
+def frame(game, name, tick):
+    '''
+    one step and one render, the same as a frame of Game.run
+    (game, scenario name, tick of the scenario)
+    '''
+    level, inputs, warmup, immortal = SCENARIOS[name]
+    if immortal:
+        game.dead = min(game.dead, -2) # hits still happen, they just never add up to a death and a reload
+    game.step(inputs(game, tick))
+    game.render()
+
+def run_scenario(name, frames=600, alloc_frames=60, swarm=False):
+    '''
+    times every frame of a scenario, then plays it again with tracemalloc on to see how much each frame allocates
+    allocations are a separate run since tracing makes everything a lot slower
+    (scenario name, frames to time, frames to trace allocations for, swarm: bool) -> (dict of results)
+    '''
+    warmup = SCENARIOS[name][2]
+
+    game = setup(name, swarm)
+    for tick in range(warmup):
+        frame(game, name, tick)
+    times = np.zeros(frames)
+    peaks = {'particles': 0, 'sparks': 0, 'projectiles': 0, 'magic': 0, 'enemies': 0}
+    for i in range(frames):
+        start = time.perf_counter()
+        frame(game, name, warmup + i)
+        times[i] = (time.perf_counter() - start) * 1000
+        counts = {'particles': len(game.particles), 'sparks': len(game.sparks), 'projectiles': len(game.projectiles), 'magic': len(game.magic),
+                  'enemies': len(game.skeletons) + len(game.spiders) + len(game.boss)}
+        peaks = {key: max(peaks[key], counts[key]) for key in peaks}
+
+    game = setup(name, swarm)
+    for tick in range(warmup):
+        frame(game, name, tick)
+    allocated = np.zeros(alloc_frames)
+    tracemalloc.start()
+    for i in range(alloc_frames):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        frame(game, name, warmup + i)
+        allocated[i] = (tracemalloc.get_traced_memory()[1] - before) / 1024 # most memory the frame had out at once
+    tracemalloc.stop()
+
+    return {
+        'frames': frames,
+        'mean_ms': round(float(times.mean()), 4),
+        'p50_ms': round(float(np.percentile(times, 50)), 4),
+        'p95_ms': round(float(np.percentile(times, 95)), 4),
+        'p99_ms': round(float(np.percentile(times, 99)), 4),
+        'max_ms': round(float(times.max()), 4),
+        'alloc_kb_per_frame': round(float(allocated.mean()), 2),
+        'peak_counts': peaks, # most of everything alive at once, to see the scenario did what it says
+    }
+
+def compare(results, baseline, threshold):
+    '''
+    finds every scenario that got slower than the baseline by more than threshold
+    (results, baseline: dicts from run_scenario by name, threshold: 0.25 is 25% slower) -> (list of messages)
+    '''
+    failures = []
+    for name, result in results.items():
+        if name not in baseline['scenarios']:
+            continue
+        for key in ('mean_ms', 'p95_ms'):
+            old = baseline['scenarios'][name][key]
+            if result[key] > old * (1 + threshold):
+                failures.append(f"{name} {key} {result[key]:.3f} ms, baseline {old:.3f} ms (+{(result[key] / old - 1) * 100:.0f}%)")
+    return failures
+
+
+def mismatches(output, baseline):
+    '''
+    everything about the run that isn't the same as when the baseline was saved, a swarm run or another machine can't be held to it's numbers
+    (output, baseline: dicts with the ENVIRONMENT keys) -> (list of messages)
+    '''
+    return [f"{key} is {output[key]}, baseline has {baseline.get(key)}" for key in ENVIRONMENT if output[key] != baseline.get(key)]
+
+def budget_notes(results):
+    '''
+    notes for every scenario that's over the frame budget, so a baseline that's already too slow says so
+    (results: dicts from run_scenario by name) -> (dict of scenario name -> note)
+    '''
+    return {name: f"p95 {result['p95_ms']:.1f} ms is over the {FRAME_BUDGET_MS:.1f} ms frame budget"
+            for name, result in results.items() if result['p95_ms'] > FRAME_BUDGET_MS}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='frame time benchmarks, offscreen, on the real maps')
+    parser.add_argument('scenarios', nargs='*', help=f"scenarios to run, default all of: {', '.join(SCENARIOS)}")
+    parser.add_argument('--frames', type=int, default=600, help='frames timed per scenario')
+    parser.add_argument('--swarm', action='store_true', help='run the enemies in swarm mode')
+    parser.add_argument('--out', metavar='PATH', help='write the results as json')
+    parser.add_argument('--baseline', metavar='PATH', default=BASELINE_PATH, help='results to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25, help='how much slower than the baseline fails, 0.25 is 25%%')
+    parser.add_argument('--save-baseline', action='store_true', help='write these results over the baseline instead of comparing')
+    args = parser.parse_args()
+
+    names = args.scenarios or list(SCENARIOS)
+    results = {}
+    for name in names:
+        results[name] = run_scenario(name, frames=args.frames, swarm=args.swarm)
+        r = results[name]
+        print(f"{name:<8} mean {r['mean_ms']:7.3f}  p95 {r['p95_ms']:7.3f}  p99 {r['p99_ms']:7.3f} ms  {r['alloc_kb_per_frame']:8.1f} KB/frame  {r['peak_counts']}")
+
+    output = {
+        'python': platform.python_version(),
+        'pygame': pygame.version.ver,
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'swarm': args.swarm,
+        'scenarios': results,
+        'notes': budget_notes(results),
+    }
+    for name, note in output['notes'].items():
+        print('OVER BUDGET', name, note)
+    if args.out:
+        f = open(args.out, 'w')
+        json.dump(output, f, indent=2)
+        f.close()
+
+    if args.save_baseline:
+        f = open(args.baseline, 'w')
+        json.dump(output, f, indent=2)
+        f.close()
+        print(f"saved baseline to {args.baseline}")
+    else:
+        try:
+            f = open(args.baseline)
+            baseline = json.load(f)
+            f.close()
+        except FileNotFoundError:
+            print(f"no baseline at {args.baseline}, run with --save-baseline to make one")
+            sys.exit(0)
+        different = mismatches(output, baseline)
+        if different:
+            for message in different:
+                print('NOT COMPARABLE', message)
+            print(f"not comparing against {args.baseline}, save a baseline for this setup with --save-baseline --baseline PATH")
+            sys.exit(2)
+        failures = compare(results, baseline, args.threshold)
+        for failure in failures:
+            print('REGRESSION', failure)
+        if failures:
+            sys.exit(1)
+        print(f"no scenario more than {args.threshold * 100:.0f}% slower than {args.baseline}")
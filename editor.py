@@ -1,10 +1,14 @@
 import sys
+import os
 import pygame
 
-from scripts.utils import load_images, Animation
+from scripts.utils import load_images, use_pack, Animation
 from scripts.tilemap import Tilemap
+from scripts.mapformat import BINARY_EXT
+from scripts.mapstore import ChunkStore
 
 RENDER_SCALE = 2.0
+STREAM_PATH = 'map_chunks' # big maps split with python -m scripts.mapstore split, streamed in around the camera
 
 class Editor:
     def __init__(self):
@@ -22,6 +26,8 @@ class Editor:
 
         self.clock = pygame.time.Clock()
         
+        use_pack() # shares the game's compiled asset pack, if one has been built
+
         self.assets = {
             'decor': load_images('tiles/decor'),
             'grass': load_images('tiles/grass'),
@@ -35,10 +41,15 @@ class Editor:
         #initalizing tilemap
         self.tilemap = Tilemap(self, tile_size=16)
 
-        try: # only load the map if it exists
-            self.tilemap.load('map.json')
-        except FileNotFoundError:
-            pass
+        # a chunk folder gets streamed, otherwise only load the map if it exists, json first then binary
+        self.store = None
+        if os.path.isdir(STREAM_PATH):
+            self.store = ChunkStore(self.tilemap, STREAM_PATH)
+        else:
+            for path in ('map.json', 'map' + BINARY_EXT):
+                if os.path.exists(path):
+                    self.tilemap.load(path)
+                    break
 
         # creating 'camera'  scroll for it's movement
         self.scroll = [0, 0]
@@ -52,6 +63,7 @@ class Editor:
         self.right_clicking = False
         self.shift = False
         self.ongrid = True
+        self.autotiling = True # grass and stone fit themselves to their neighbors as you paint
 
     def run(self):
         '''
@@ -65,6 +77,8 @@ class Editor:
             self.scroll[0] += (self.movement[1] - self.movement[0]) * 2 # camera x axis
             self.scroll[1] += (self.movement[3] - self.movement[2]) * 2 # camera y axis
             render_scroll = (int(self.scroll[0]), int(self.scroll[1]))
+            if self.store: # only the chunks around the camera are loaded
+                self.store.update(render_scroll, self.display.get_size())
 
             # render the tile map
             self.tilemap.render(self.display, offset=render_scroll)
@@ -82,18 +96,22 @@ class Editor:
             else: 
                 self.display.blit(current_tile_img, mpos)
 
+            tile_loc = str(tile_pos[0]) + ';' + str(tile_pos[1])
             if self.clicking and self.ongrid: # assing positon on tile map to that asset
-                self.tilemap.tilemap[str(tile_pos[0]) + ';' + str(tile_pos[1])] = {'type': self.tile_list[self.tile_group], 'variant': self.tile_variant, 'pos': tile_pos}
+                current = self.tilemap.tilemap.get(tile_loc)
+                # holding the button down shouldn't place (and autotile) the same tile every frame
+                if not current or current['type'] != self.tile_list[self.tile_group] or (current['variant'] != self.tile_variant and not self.autotiling):
+                    self.tilemap.set_tile({'type': self.tile_list[self.tile_group], 'variant': self.tile_variant, 'pos': tile_pos})
+                    if self.autotiling:
+                        self.tilemap.autotile_around(tile_pos)
             if self.right_clicking:
-                tile_loc = str(tile_pos[0]) + ';' + str(tile_pos[1])
                 if tile_loc in self.tilemap.tilemap:
                     # if location exists
-                    del self.tilemap.tilemap[tile_loc]
-                for tile in self.tilemap.offgrid_tiles.copy(): # take a copy of refernce so we dont mess up the actual iteration
-                    tile_img = self.assets[tile['type']][tile['variant']]
-                    tile_r = pygame.Rect(tile['pos'][0] - self.scroll[0], tile['pos'][1] - self.scroll[1], tile_img.get_width(), tile_img.get_height())
-                    if tile_r.collidepoint(mpos): # if this tile is colliding with mouse
-                        self.tilemap.offgrid_tiles.remove(tile)
+                    self.tilemap.remove_tile(tile_loc)
+                    if self.autotiling:
+                        self.tilemap.autotile_around(tile_pos)
+                for tile in self.tilemap.offgrid_at((mpos[0] + self.scroll[0], mpos[1] + self.scroll[1])): # only the decor under the mouse, from the tilemap's spatial hash
+                    self.tilemap.remove_offgrid(tile)
 
             self.display.blit(current_tile_img, (5,5))
 
@@ -105,7 +123,7 @@ class Editor:
                     if event.button == 1: # left click, places
                         self.clicking = True
                         if not self.ongrid:
-                            self.tilemap.offgrid_tiles.append({'type': self.tile_list[self.tile_group], 'variant': self.tile_variant, 'pos': (mpos[0] + self.scroll[0], mpos[1] + self.scroll[1])})
+                            self.tilemap.add_offgrid({'type': self.tile_list[self.tile_group], 'variant': self.tile_variant, 'pos': (mpos[0] + self.scroll[0], mpos[1] + self.scroll[1])})
                     if event.button == 3: # right click
                         self.right_clicking = True
                 if event.type == pygame.MOUSEBUTTONUP:
@@ -144,10 +162,16 @@ class Editor:
                         self.shift = True
                     if event.key == pygame.K_g: # switch drawing on/offgrid 
                         self.ongrid = not self.ongrid
-                    if event.key == pygame.K_o: # same tilemap
+                    if event.key in (pygame.K_o, pygame.K_p) and self.store: # streaming, only the edited chunks get written
+                        self.store.save()
+                    elif event.key == pygame.K_o: # same tilemap
                         self.tilemap.save('map.json') # path we are saving it to
-                    if event.key == pygame.K_t:
-                        self.tilemap.autotile()
+                    elif event.key == pygame.K_p: # same tilemap in the binary format
+                        self.tilemap.save('map' + BINARY_EXT)
+                    if event.key == pygame.K_t: # whole map at once, when streaming only the tiles with every neighbor loaded
+                        self.tilemap.autotile(self.store.settled() if self.store else None)
+                    if event.key == pygame.K_y: # autotile while painting on/off
+                        self.autotiling = not self.autotiling
                 if event.type == pygame.KEYUP: # when key is released
                     if event.key == pygame.K_a: 
                         self.movement[0] = False
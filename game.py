@@ -2,27 +2,61 @@ import sys
 import os
 import math
 import random
+import argparse
+import numpy as np
 import pygame
 
-from scripts.utils import load_image, load_images, Animation
-from scripts.entities import PhysicsEntity, Player, Skeleton, Spider, Boss
+from scripts.utils import load_image, load_images, load_sound, use_pack, Animation, NullSound, SpriteAtlas
+from scripts.entities import PhysicsEntity, Player, BOSS_PATTERNS, BOSS_PHASES
 from scripts.tilemap import Tilemap
 from scripts.clouds import Clouds
-from scripts.particle import Particle
-from scripts.spark import Spark
-from scripts.UI import Heart, Levelbar
+from scripts.particle import ParticleSystem
+from scripts.spark import SparkSystem
+from scripts.projectile import ProjectileSystem
+from scripts.pattern import PatternSystem
+from scripts.UI import HUD
+from scripts.outline import OutlineCompositor
+from scripts.collision import CollisionSystem, hit_effect
+from scripts.flowfield import FlowField
+from scripts.swarm import EnemySwarm
+from scripts.replay import InputRecorder, InputReplay
+from scripts.profiler import FrameProfiler
+from scripts.levels import LevelLoader
+
+PRELOAD_ENEMIES = 2 # start preparing the next level once this few enemies are left
+SIM_DT = 1 / 60 # length of one simulation tick in seconds
+MAX_SIM_STEPS = 5 # most ticks we'll catch up on per rendered frame before letting the game slow down
 
 class Game:
-    def __init__(self):
+    def __init__(self, headless=False, check_outlines=False, swarm=False, seed=None, boss_phases=False):
         '''
         initializes Game
+        (headless: bool, runs the simulation without a window, audio or frame cap, check_outlines: bool, compares the outlines against the old way every frame,
+         swarm: bool, skeletons and spiders live in arrays (scripts/swarm.py) instead of one object each,
+         seed: int, every random thing in the simulation comes from it so the same seed and inputs always play out the same, None picks one,
+         boss_phases: bool, the boss fires BOSS_PHASES (spirals, aimed fans and rings between teleports) instead of just it's orbit)
         '''
+        self.headless = headless
+        self.swarm = swarm
+        self.boss_phases = boss_phases
+        self.boss_patterns = BOSS_PHASES if boss_phases else BOSS_PATTERNS # what Boss.update fires
+        self.seed = random.randrange(2 ** 32) if seed is None else seed
+        self.rng = random.Random(self.seed) # everything the simulation rolls goes through this
+        self.shake_rng = random.Random(self.seed) # screenshake is only drawn, so it gets it's own and rendering can't change the simulation
+        if self.headless: # dummy drivers so we don't need a display or sound card
+            os.environ['SDL_VIDEODRIVER'] = 'dummy'
+            os.environ['SDL_AUDIODRIVER'] = 'dummy'
+
         pygame.init()
 
-        # change the window caption
-        pygame.display.set_caption("10 Levels of Hell")
-        # create window
-        self.screen = pygame.display.set_mode((640, 480)) # (640, 480), (960, 720), (768, 576)
+        if self.headless:
+            pygame.display.set_mode((1, 1)) # never shown, but convert() needs it so images get the same format as a windowed or packed run
+            self.screen = pygame.Surface((640, 480)) # offscreen, nothing is ever shown
+        else:
+            # change the window caption
+            pygame.display.set_caption("10 Levels of Hell")
+            # create window
+            self.screen = pygame.display.set_mode((640, 480)) # (640, 480), (960, 720), (768, 576)
 
         self.display_red= pygame.Surface((320, 240), pygame.SRCALPHA) # render on smaller resolution then scale it up to bigger screen
 
@@ -32,11 +66,22 @@ class Game:
 
         self.display_2 = pygame.Surface((320, 240))
 
+        # the tiles only change when the map does, so they get drawn once here and reused
+        self.tile_layer = pygame.Surface((320, 240), pygame.SRCALPHA)
+        self.tile_layer_key = None
+        self.outlines = OutlineCompositor(check=check_outlines)
+
 
         self.clock = pygame.time.Clock()
+        self.fps = 0 if self.headless else 60 # 0 means uncapped
         
         self.movement = [False, False, False, False]
 
+        use_pack() # compiled asset pack, if one has been built (python -m scripts.assetpack)
+
+        # entity sprites get packed here facing both ways, so rendering them never has to flip or copy a surface
+        self.atlas = SpriteAtlas()
+
         self.assets = {
             'decor': load_images('tiles/decor'),
             'grass': load_images('tiles/grass'),
@@ -46,17 +91,17 @@ class Game:
             'background': load_image('background.png'),
             'heart': load_image('UI/health.png'),
             'sheild': load_image('UI/sheild.png'),
-            'skele/idle': Animation(load_images('entities/skele/idle'), img_dur=1),
-            'skele/run': Animation(load_images('entities/skele/run'), img_dur=4),
-            'spid/idle': Animation(load_images('entities/spider/idle'), img_dur=1),
-            'spid/run': Animation(load_images('entities/spider/run'), img_dur=4),
-            'boss/idle': Animation(load_images('entities/boss/idle'), img_dur=10),
-            'boss/dash': Animation(load_images('entities/boss/dash'), img_dur=1),
-            'player/idle': Animation(load_images('entities/player/idle'), img_dur=1),
-            'player/run': Animation(load_images('entities/player/run'), img_dur=4),
-            'player/runDOWN': Animation(load_images('entities/player/runDOWN'), img_dur=4),
-            'player/runUP': Animation(load_images('entities/player/runUP'), img_dur=6),
-            'player/slide': Animation(load_images('entities/player/slide')),
+            'skele/idle': Animation(load_images('entities/skele/idle'), img_dur=1, atlas=self.atlas),
+            'skele/run': Animation(load_images('entities/skele/run'), img_dur=4, atlas=self.atlas),
+            'spid/idle': Animation(load_images('entities/spider/idle'), img_dur=1, atlas=self.atlas),
+            'spid/run': Animation(load_images('entities/spider/run'), img_dur=4, atlas=self.atlas),
+            'boss/idle': Animation(load_images('entities/boss/idle'), img_dur=10, atlas=self.atlas),
+            'boss/dash': Animation(load_images('entities/boss/dash'), img_dur=1, atlas=self.atlas),
+            'player/idle': Animation(load_images('entities/player/idle'), img_dur=1, atlas=self.atlas),
+            'player/run': Animation(load_images('entities/player/run'), img_dur=4, atlas=self.atlas),
+            'player/runDOWN': Animation(load_images('entities/player/runDOWN'), img_dur=4, atlas=self.atlas),
+            'player/runUP': Animation(load_images('entities/player/runUP'), img_dur=6, atlas=self.atlas),
+            'player/slide': Animation(load_images('entities/player/slide'), atlas=self.atlas),
             'particle/leaf': Animation(load_images('particles/leaf'), img_dur=20, loop=False),
             'particle/particle': Animation(load_images('particles/particle'), img_dur=6, loop=False),
             'bow': load_image('bow.png'),
@@ -64,21 +109,28 @@ class Game:
             'projectile': load_image('projectile.png'),
             'magic': load_image('magic.png'),
         }
+        self.sprites = {name: self.atlas.add(self.assets[name]) for name in ('bow', 'projectile')} # atlas indexes for the sprites that get flipped
+        self.atlas.build()
 
         # adding sound
-        self.sfx = {
-            'jump': pygame.mixer.Sound('data/sfx/jump.wav'),
-            'dash': pygame.mixer.Sound('data/sfx/dash.wav'),
-            'hit': pygame.mixer.Sound('data/sfx/hit.wav'),
-            'shoot': pygame.mixer.Sound('data/sfx/shoot.wav'),
-            'ambience': pygame.mixer.Sound('data/sfx/ambience.wav'),
-        }
+        if self.headless: # silent stand ins, skips decoding every wav
+            self.sfx = {name: NullSound() for name in ('jump', 'dash', 'hit', 'shoot', 'ambience')}
+        else:
+            self.sfx = {
+                'jump': load_sound('sfx/jump.wav'),
+                'dash': load_sound('sfx/dash.wav'),
+                'hit': load_sound('sfx/hit.wav'),
+                'shoot': load_sound('sfx/shoot.wav'),
+                'ambience': load_sound('sfx/ambience.wav'),
+            }
         
         self.sfx['ambience'].set_volume(0.2)
         self.sfx['shoot'].set_volume(0.4)
         self.sfx['hit'].set_volume(0.8)
         self.sfx['dash'].set_volume(0.3)
 
+        self.hud = HUD(self.assets, (self.display_black.get_width(), 48), (self.display_red.get_width() // 2 - 25, 13))
+
         #self.clouds = Clouds(self.assets['clouds'], count=16)
 
         # initalizing player
@@ -87,9 +139,33 @@ class Game:
         # initalizing tilemap
         self.tilemap = Tilemap(self, tile_size=16)
 
+        # every particle lives in the same set of arrays, grouped by type
+        self.particles = ParticleSystem({'leaf': self.assets['particle/leaf'], 'particle': self.assets['particle/particle']})
+
+        # skeleton arrows and boss magic, each group lives in it's own arrays
+        self.projectiles = ProjectileSystem()
+        self.magic = PatternSystem() # the boss's bullet patterns, positions come from the pattern tables
+
+        # every spark lives in one fixed size pool, when it's full the spark closest to dying gets replaced
+        self.sparks = SparkSystem(capacity=512, overflow='replace')
+
+        # times every phase of a frame, F3 shows the overlay
+        self.profiler = FrameProfiler()
+
+        # reads and prepares the next level on a worker thread before the transition gets to it
+        self.levels = LevelLoader(self)
+
+        # which way enemies walk to reach the player, rebuilt when the player changes tile
+        self.flow = FlowField(self.tilemap)
+
+        # one collision stage for the player against every enemy kind
+        self.collisions = CollisionSystem()
+        self.collisions.on('player_hit', self.player_hit)
+        self.collisions.on('enemy_kill', self.enemy_kill)
+
         # tracking level
         self.level = 0
-        self.max_level = len(os.listdir('data/maps')) # max level,
+        self.max_level = len([name for name in os.listdir('data/maps') if name.endswith('.json')]) # max level, binary maps are built from the json ones
         # loading the level
         self.load_level(0)  # self.load_level(self.level), hard coding to 1 atm
 
@@ -97,397 +173,431 @@ class Game:
         self.screenshake = 0
 
         self.cooldown = 0
-        self.angle_count = 0
-        self.horizontal_count = 0
+
+        self.tick = 0 # simulation ticks since the game started
+        self.game_over = False
 
 
     def load_level(self, map_id):
-        self.tilemap.load('data/maps/' + str(map_id) + '.json')
+        level = self.levels.take(map_id) # already prepared on the worker if it was preloaded
+        self.tilemap.adopt(level.tilemap)
 
         # keep track
-        self.particles = []
+        self.particles.clear()
 
         # creating 'camera' 
         self.scroll = [0, 0]
 
         self.dead = -2  # gives player 3 lives, -2, -1, 0
 
-        self.projectiles = []
-        self.magic = []
-        self.sparks = []
+        self.projectiles.clear()
+        self.magic.clear()
+        self.sparks.clear()
 
         # transition for levels
         self.transition = -30
 
         # leaf particle affect
         # change this to be like embers that spawns maybe on the border of the map, or i can make a transparent spawner
-        self.leaf_spawners = []
-        for tree in self.tilemap.extract([('large_decor', 2)], keep=True):
-            self.leaf_spawners.append(pygame.Rect((4 + tree['pos'][0]), (4 + tree['pos'][1]), 23, 13)) # offsetting by 4 due to tree sprite
-            # Rect(x, y, width, height)
-        
-        # spawn the ememies
-        self.spiders = []
+        self.leaf_spawners = level.leaf_spawners
+
         # spawn the ememies
-        self.skeletons = []
-        self.boss = []
-        for spawner in self.tilemap.extract([('spawners', 0), ('spawners', 1), ('spawners', 2), ('spawners', 3)]):
-            if spawner['variant'] == 0: 
-                self.player.pos = spawner['pos']
-            elif spawner['variant'] == 1:
-                self.skeletons.append(Skeleton(self, spawner['pos'], (7, 15)))
-            elif spawner['variant'] == 2:
-                self.spiders.append(Spider(self, spawner['pos'], (10, 7)))
-            else:
-                self.boss.append(Boss(self, spawner['pos'], (21, 31)))
-                # spawn the ememies
+        if level.player_pos is not None:
+            self.player.pos = level.player_pos
+        self.skeletons = level.skeletons
+        self.spiders = level.spiders
+        self.boss = level.boss
 
-    def run(self):
+    def player_hit(self, enemy, group):
         '''
-        runs the Game
+        an enemy touched the player
+        (enemy, list it's in)
         '''
-        pygame.mixer.music.load('data/music.mp3')
-        pygame.mixer.music.set_volume(0.5)
-        pygame.mixer.music.play(-1)
+        if not self.cooldown: # dead cooldown for collisions
+            self.dead += 1 # die
+            self.sfx['hit'].play()
+            self.cooldown = 150
+            self.screenshake = max(16, self.screenshake)  # apply screenshake, larger wont be overrided by a smaller screenshake
+            hit_effect(self, self.player.rect().center)
+
+    def enemy_kill(self, enemy, group):
+        '''
+        the player dashed through an enemy
+        (enemy, list it's in)
+        '''
+        if enemy.dashed(): # if the enemy died [**]
+            group.remove(enemy)
 
-        self.sfx['ambience'].play(-1)
+    def handle_events(self):
+        '''
+        reads the pygame event queue into this frame's inputs
+        () -> (inputs: dict, 'movement' [left, right, up, down] and 'dash' list of dash keys pressed)
+        '''
+        dashes = []
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT: # have to code the window closing
+                pygame.quit()
+                sys.exit()
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_F3: # frame times overlay
+                    self.profiler.overlay = not self.profiler.overlay
+                if event.key == pygame.K_a: # referencing WASD
+                    self.movement[0] = True
+                if event.key == pygame.K_d:
+                    self.movement[1] = True
+                if event.key == pygame.K_w:
+                    self.movement[2] = True
+                if event.key == pygame.K_s:
+                    self.movement[3] = True
+                if event.key == pygame.K_j:
+                    dashes.append('J')
+                if event.key == pygame.K_i:
+                    dashes.append('I')
+                if event.key == pygame.K_l:
+                    dashes.append('L')
+                if event.key == pygame.K_k:
+                    dashes.append('K')
+            if event.type == pygame.KEYUP: # when key is released
+                if event.key == pygame.K_a: 
+                    self.movement[0] = False
+                if event.key == pygame.K_d: 
+                    self.movement[1] = False
+                if event.key == pygame.K_w:
+                    self.movement[2] = False
+                if event.key == pygame.K_s:
+                    self.movement[3] = False
+        return {'movement': list(self.movement), 'dash': dashes}
+
+    def step(self, inputs):
+        '''
+        advances the simulation by exactly one tick, draws nothing
+        (inputs: dict from handle_events) -> (False once the game is over)
+        '''
+        self.tick += 1
+
+        for direction in inputs['dash']:
+            self.player.dash(direction)
+        movement = inputs['movement']
+
+        self.screenshake = max(0, self.screenshake-1) # resets screenshake value
+
+        # level transiition
+        if not len(self.skeletons) and not len(self.spiders) and not len(self.boss): 
+            self.transition += 1 # start timer, increasing value past 0
+            if self.transition > 30: 
+                self.level = min(self.level + 1, self.max_level -1) # increase level
+                if self.level == 10:
+                    print("Game Over")
+                    self.game_over = True
+                    return False
+                else:
+                    self.load_level(self.level) # self.load_level(self.level) 
+        if self.transition < 0:
+            self.transition += 1 # goes up automatically until 0
+
+        if self.dead >= 1: # get hit 3 times
+            self.dead += 1
+            if self.dead >= 10: # to make the level transitions smoother
+                self.transition = min(self.transition + 1, 30) # go as high as it can without changing level
+            if self.dead > 40: # timer that starts when you die
+                # self.level = 0
+                self.load_level(self.level) # start at level 0 again. self.load_level(0)
+        
 
-        # creating an infinite game loop
-        while True:
-            self.display_red.fill((0, 0, 0, 0))    # red outlines
-            self.display_white.fill((0, 0, 0, 0))    # white outlines
-            self.display_black.fill((0, 0, 0, 0))    # black outlines
-            self.display_none.fill((0,0,0,0))
-            # clear the screen for new image generation in loop
-            self.display_2.blit(self.assets['background'], (0,0)) # no outline
-
-            self.screenshake = max(0, self.screenshake-1) # resets screenshake value
-
-            # level transiition
-            if not len(self.skeletons) and not len(self.spiders) and not len(self.boss): 
-                self.transition += 1 # start timer, increasing value past 0
-                if self.transition > 30: 
-                    self.level = min(self.level + 1, self.max_level -1) # increase level
-                    if self.level == 10:
-                        print("Game Over")
-                        return
-                    else:
-                        self.load_level(self.level) # self.load_level(self.level) 
-            if self.transition < 0:
-                self.transition += 1 # goes up automatically until 0
-
-            if self.dead >= 1: # get hit 3 times
+        # scroll = current scroll + (where we want the camera to be - what we have/can see currently) 
+        self.scroll[0] = self.display_red.get_width()/2 / 30 + 3 # x axis
+        self.scroll[1] = self.display_red.get_height()/2/ 30 + 3
+
+        # spawn particles
+        for rect in self.leaf_spawners:
+            if self.rng.random() * 49999 < rect.width * rect.height:
+                pos = (rect.x + self.rng.random() * rect.width, rect.y + self.rng.random() * rect.height)
+                self.particles.add('leaf', pos, velocity=[-0.1, 0.3], frame=self.rng.randint(0, 20))
+
+        # self.clouds.update() # updates clouds before the rest of the tiles
+
+        # update the enemies, swarms update all of theirs at once
+        self.profiler.begin('enemies')
+        self.flow.update(self.player.rect().center)
+        for group in (self.skeletons, self.spiders, self.boss):
+            if isinstance(group, EnemySwarm):
+                group.update(self.tilemap)
+            else:
+                for enemy in group:
+                    enemy.update(self.tilemap, (0,0))
+
+        self.profiler.end()
+
+        # player against every enemy, sends player_hit / enemy_kill to the handlers below
+        self.profiler.begin('collisions')
+        self.collisions.update(self.player, [self.skeletons, self.spiders, self.boss])
+        self.profiler.end()
+
+        # almost cleared, get the next level ready in the background so the transition doesn't have to load it
+        if len(self.skeletons) + len(self.spiders) + len(self.boss) <= PRELOAD_ENEMIES and self.level + 1 < self.max_level:
+            self.levels.preload(self.level + 1)
+
+        # Reduce timer
+        if self.cooldown > 0:
+                self.cooldown -= 1
+
+        self.profiler.begin('player')
+        if self.dead != 1:
+            # update player movement
+            self.player.update(self.tilemap, (movement[1] - movement[0], movement[3] - movement[2]))
+        self.profiler.end()
+
+        # move bullet projectiles, all of them at once
+        self.profiler.begin('projectiles')
+        self.projectiles.advance()
+        # keep this but change it to the borders of the map, also might want some obsticles later
+        wall = self.tilemap.solid_check_many(self.projectiles.pos[:len(self.projectiles)]) # if location is a solid tile
+        expired = ~wall & (self.projectiles.timer[:len(self.projectiles)] > 360) # if timer > 6 seconds
+        hit = np.zeros(len(self.projectiles), dtype=bool)
+        if abs(self.player.dashing) < 50: # if not in dash
+            hit = ~wall & ~expired & self.projectiles.inside(self.player.rect())
+        for pos, velocity in zip(self.projectiles.pos[:len(self.projectiles)][wall].tolist(), self.projectiles.velocity[:len(self.projectiles)][wall, 0].tolist()):
+            for i in range(4):
+                self.sparks.add(pos, self.rng.random() - 0.5 + (math.pi if velocity > 0 else 0), 2 + self.rng.random()) # (math.pi if velocity > 0 else 0), sparks bounce in oppositie direction if hit wall which depends on projectile direction
+        for i in range(int(np.count_nonzero(hit))):
+            self.dead += 1
+            self.sfx['hit'].play()
+            self.screenshake = max(16, self.screenshake)  # apply screenshake, larger wont be overrided by a smaller screenshake
+            hit_effect(self, self.player.rect().center) # when projectile hits player
+        self.projectiles.remove(wall | expired | hit)
+        self.profiler.end()
+
+        # move magic projectiles, the boss fires them in Boss.update
+        self.profiler.begin('magic')
+        if len(self.boss):
+            self.magic.update(self.boss[0].rect().center)
+
+            n = len(self.magic)
+            expired = self.magic.expired()
+            hit = np.zeros(n, dtype=bool)
+            if abs(self.player.dashing) < 50:  # if not in dash
+                hit = ~expired & self.magic.inside(self.player.rect())
+            hits = int(np.count_nonzero(hit))
+            for i in range(hits):
                 self.dead += 1
-                if self.dead >= 10: # to make the level transitions smoother
-                    self.transition = min(self.transition + 1, 30) # go as high as it can without changing level
-                if self.dead > 40: # timer that starts when you die
-                    # self.level = 0
-                    self.load_level(self.level) # start at level 0 again. self.load_level(0)
-            
-
-            # scroll = current scroll + (where we want the camera to be - what we have/can see currently) 
-            self.scroll[0] = self.display_red.get_width()/2 / 30 + 3 # x axis
-            self.scroll[1] = self.display_red.get_height()/2/ 30 + 3
-
-            # fix the jitter
-            render_scroll = (int(self.scroll[0]), int(self.scroll[1]))
-
-            # spawn particles
-            for rect in self.leaf_spawners:
-                if random.random() * 49999 < rect.width * rect.height:
-                    pos = (rect.x + random.random() * rect.width, rect.y + random.random() * rect.height)
-                    self.particles.append(Particle(self, 'leaf', pos, velocity=[-0.1, 0.3], frame=random.randint(0, 20)))
-
-            # self.clouds.update() # updates clouds before the rest of the tiles
-            # self.clouds.render(self.display_2, offset=render_scroll)
-
-            self.tilemap.render(self.display_white, offset=render_scroll)
-
-            # render the enemies
-            for enemy in self.skeletons.copy():
-                kill =  enemy.update(self.tilemap, (0,0))
+                self.sfx['hit'].play()
+                self.screenshake = max(16, self.screenshake)  # apply screenshake, larger wont be overridden by a smaller screenshake
+                hit_effect(self, self.player.rect().center)  # when projectile hits player
+            self.magic.remove(expired | hit)
+
+        self.profiler.end()
+
+        self.profiler.begin('particles')
+        self.sparks.update()
+        self.particles.update()
+        self.profiler.end()
+
+        return True
+
+    def render(self):
+        '''
+        draws the current state of the game, changes nothing in the simulation
+        '''
+        self.profiler.begin('clear')
+        self.display_red.fill((0, 0, 0, 0))    # red outlines
+        self.display_white.fill((0, 0, 0, 0))    # white outlines
+        self.display_black.fill((0, 0, 0, 0))    # black outlines
+        self.display_none.fill((0,0,0,0))
+        # clear the screen for new image generation in loop
+        self.display_2.blit(self.assets['background'], (0,0)) # no outline
+
+        self.profiler.end()
+
+        # fix the jitter
+        render_scroll = (int(self.scroll[0]), int(self.scroll[1]))
+
+        # self.clouds.render(self.display_2, offset=render_scroll)
+
+        self.profiler.begin('tiles')
+        tile_layer_key = (self.tilemap.version, render_scroll)
+        if tile_layer_key != self.tile_layer_key:
+            self.tile_layer.fill((0, 0, 0, 0))
+            self.tilemap.render(self.tile_layer, offset=render_scroll)
+            self.tile_layer_key = tile_layer_key
+        self.display_white.blit(self.tile_layer, (0, 0))
+        self.profiler.end()
+
+        # render the enemies
+        self.profiler.begin('entities')
+        if self.swarm:
+            self.skeletons.render(self.display_black, offset=render_scroll) # change outline here
+            self.spiders.render(self.display_none, offset=render_scroll)
+        else:
+            for enemy in self.skeletons:
                 enemy.render(self.display_black, offset=render_scroll) # change outline here
-                if kill: # if enemies update fn returns true [**]
-                    self.skeletons.remove(enemy) 
-                if abs(self.player.dashing) < 50 and not self.cooldown: # not dashing and dead cooldown for collisions is
-                    if self.player.rect().colliderect(enemy): # player collides with enemy
-                        self.dead += 1 # die
-                        self.sfx['hit'].play()
-                        self.cooldown = 150
-                        self.screenshake = max(16, self.screenshake)  # apply screenshake, larger wont be overrided by a smaller screenshake
-                        for i in range(30): # when projectile hits player
-                            # on death sparks
-                            angle = random.random() * math.pi * 2 # random angle in a circle
-                            speed = random.random() * 5
-                            self.sparks.append(Spark(self.player.rect().center, angle, 2 + random.random())) 
-                            # on death particles
-                            self.particles.append(Particle(self, 'particle', self.player.rect().center, velocity=[math.cos(angle + math.pi) * speed * 0.5, math.sin(angle * math.pi) * speed * 0.5], frame=random.randint(0, 7)))
-
-            
-            # render the enemies
-            for enemy in self.spiders.copy():
-                kill =  enemy.update(self.tilemap, (0,0))
+            for enemy in self.spiders:
                 enemy.render(self.display_none, offset=render_scroll) # change outline here
-                if kill: # if enemies update fn returns true [**]
-                    self.spiders.remove(enemy) 
-                if abs(self.player.dashing) < 50 and not self.cooldown: # not dashing
-                    if self.player.rect().colliderect(enemy): # player collides with enemy
-                        self.dead += 1 # die
-                        self.sfx['hit'].play()
-                        self.cooldown = 150
-                        self.screenshake = max(16, self.screenshake)  # apply screenshake, larger wont be overrided by a smaller screenshake
-                        for i in range(30): # when projectile hits player
-                            # on death sparks
-                            angle = random.random() * math.pi * 2 # random angle in a circle
-                            speed = random.random() * 5
-                            self.sparks.append(Spark(self.player.rect().center, angle, 2 + random.random())) 
-                            # on death particles
-                            self.particles.append(Particle(self, 'particle', self.player.rect().center, velocity=[math.cos(angle + math.pi) * speed * 0.5, math.sin(angle * math.pi) * speed * 0.5], frame=random.randint(0, 7)))
-
-            # render the enemies
-            for enemy in self.boss.copy():
-                kill =  enemy.update(self.tilemap)
-                enemy.render(self.display_red, offset=render_scroll) # change outline here
-                if kill: # if enemies update fn returns true [**]
-                    self.boss.remove(enemy) 
-                if abs(self.player.dashing) < 50 and not self.cooldown: # not dashing
-                    if self.player.rect().colliderect(enemy): # player collides with enemy
-                        self.dead += 1 # die
-                        self.sfx['hit'].play()
-                        self.cooldown = 150
-                        self.screenshake = max(16, self.screenshake)  # apply screenshake, larger wont be overrided by a smaller screenshake
-                        for i in range(30): # when projectile hits player
-                            # on death sparks
-                            angle = random.random() * math.pi * 2 # random angle in a circle
-                            speed = random.random() * 5
-                            self.sparks.append(Spark(self.player.rect().center, angle, 2 + random.random())) 
-                            # on death particles
-                            self.particles.append(Particle(self, 'particle', self.player.rect().center, velocity=[math.cos(angle + math.pi) * speed * 0.5, math.sin(angle * math.pi) * speed * 0.5], frame=random.randint(0, 7)))
-
-            # Reduce timer
-            if self.cooldown > 0:
-                    self.cooldown -= 1
-
-            if self.dead != 1:
-                # update player movement
-                self.player.update(self.tilemap, (self.movement[1] - self.movement[0], self.movement[3] - self.movement[2]))
-                self.player.render(self.display_white, offset=render_scroll)
-
-            # render/spawn bullet projectiles
-            # [[x, y], direction, timer]
-            for projectile in self.projectiles.copy():
-                projectile[0][0] += projectile[1] 
-                projectile[2] += 1
-                img = self.assets['projectile']
-                self.display_black.blit(img if projectile[1] > 0 else pygame.transform.flip(img, True, False), (projectile[0][0] - img.get_width() / 2 - render_scroll[0], projectile[0][1] - img.get_height() / 2 - render_scroll[1])) # spawns it the center of the projectile
-                
-                # keep this but change it to the borders of the map, also might want some obsticles later
-                if self.tilemap.solid_check(projectile[0]): # if location is a solid tile
-                    self.projectiles.remove(projectile)
-                    for i in range(4):
-                        self.sparks.append(Spark(projectile[0], random.random() - 0.5 + (math.pi if projectile[1] > 0 else 0), 2 + random.random())) # (math.pi if projectile[1] > 0 else 0), sparks bounce in oppositie direction if hit wall which depends on projectile direction
-                elif projectile[2] > 360: #if timer > 6 seconds
-                    self.projectiles.remove(projectile)
-                elif abs(self.player.dashing) < 50: # if not in dash
-                    if self.player.rect().collidepoint(projectile[0]):
-                        self.projectiles.remove(projectile)
-                        self.dead += 1
-                        self.sfx['hit'].play()
-                        self.screenshake = max(16, self.screenshake)  # apply screenshake, larger wont be overrided by a smaller screenshake
-                        for i in range(30): # when projectile hits player
-                            # on death sparks
-                            angle = random.random() * math.pi * 2 # random angle in a circle
-                            speed = random.random() * 5
-                            self.sparks.append(Spark(self.player.rect().center, angle, 2 + random.random())) 
-                            # on death particles
-                            self.particles.append(Particle(self, 'particle', self.player.rect().center, velocity=[math.cos(angle + math.pi) * speed * 0.5, math.sin(angle * math.pi) * speed * 0.5], frame=random.randint(0, 7)))
-           
-
-            # render/spawn magic projectiles
-            # [[x, y], direction [x, y], timer, tag string: Uo, Down, Left, Right]
-
-            max_radius = 130  # Adjust this value as needed
-            radius_growth_rate = 0.0005  # Adjust this value to control how fast the radius grows
-            rotation_speed = 0.0001  # Adjust this value to control the speed of rotation
-
-            max_existing_projectiles = 10  # Maximum number of existing projectiles
-            max_bullet_hell_projectiles = 10  # Maximum number of bullet hell pattern projectiles
-
-            num_projectiles = len(self.magic) + 1
-            angle_shift = 360 / num_projectiles  # Angle shift for each projectile
-
-            if len(self.boss):
-                existing_projectiles_count = 0
-                bullet_hell_projectiles_count = 0
-
-                for index, projectile in enumerate(self.magic.copy()):
-                    angle = (self.angle_count * angle_shift + index * angle_shift) * (math.pi / 180)
-                    
-                    # Calculate the radius of the circular path around the player character
-                    radius = min(max_radius, max_radius * (1 - math.exp(-radius_growth_rate * self.angle_count)))
-                    
-                    # Calculate the new x and y positions for the projectile
-                    new_x = self.boss[0].pos[0] + 15 + radius * math.cos(angle)
-                    new_y = self.boss[0].pos[1] + 19 + radius * math.sin(angle)
-                    
-                    # Update the projectile's position
-                    projectile[0][0] = new_x
-                    projectile[0][1] = new_y
-                    
-                    # Update angle count for rotation
-                    self.angle_count = (self.angle_count + rotation_speed) % 360
-
-                    projectile[2] += 1
-                    img = self.assets['magic']
-                    self.display_black.blit(img, (projectile[0][0] - img.get_width() / 2 - render_scroll[0], projectile[0][1] - img.get_height() / 2 - render_scroll[1]))  # spawns it the center of the projectile
-                    
-                    if projectile[2] > 80:  # if timer > 3 seconds
-                        self.magic.remove(projectile)
-                    elif abs(self.player.dashing) < 50:  # if not in dash
-                        if self.player.rect().collidepoint(projectile[0]):
-                            self.magic.remove(projectile)
-                            self.dead += 1
-                            self.sfx['hit'].play()
-                            self.screenshake = max(16, self.screenshake)  # apply screenshake, larger wont be overridden by a smaller screenshake
-                            for i in range(30):  # when projectile hits player
-                                # on death sparks
-                                angle = random.random() * math.pi * 2  # random angle in a circle
-                                speed = random.random() * 5
-                                self.sparks.append(Spark(self.player.rect().center, angle, 2 + random.random()))
-                                # on death particles
-                                self.particles.append(
-                                    Particle(self, 'particle', self.player.rect().center, velocity=[math.cos(angle + math.pi) * speed * 0.5, math.sin(angle * math.pi) * speed * 0.5], frame=random.randint(0, 7)))
-                                
-                            existing_projectiles_count += 1
-                            if existing_projectiles_count >= max_existing_projectiles:
-                                break
-                
-                if existing_projectiles_count < max_existing_projectiles:
-                    for index in range(num_projectiles):
-                        angle = (self.angle_count * angle_shift + index * angle_shift) * (math.pi / 180)
-                        
-                        # Calculate a random speed for the bullet
-                        bullet_speed = random.uniform(1.0, 3.0)  # Adjust the speed range as needed
-                        
-                        # Calculate the new x and y positions for the projectile
-                        new_x = self.boss[0].pos[0] + 15 + max_radius * math.cos(angle)
-                        new_y = self.boss[0].pos[1] + 19 + max_radius * math.sin(angle)
-                        
-                        # Calculate the direction vector
-                        direction_vector = [new_x - self.boss[0].pos[0] + 15, new_y - self.boss[0].pos[1] + 19]
-                        
-                        # Normalize the direction vector
-                        direction_magnitude = math.sqrt(direction_vector[0]**2 + direction_vector[1]**2)
-                        if direction_magnitude != 0:
-                            direction_vector[0] /= direction_magnitude
-                            direction_vector[1] /= direction_magnitude
-                        
-                        # Add the projectile to the list
-                        self.magic.append([[self.boss[0].pos[0] + 15, self.boss[0].pos[1] + 19], direction_vector, 0, 'None'])  # Replace 'None' with your desired direction tag
-                        
-                        self.angle_count = (self.angle_count + 1) % 360
-
-                        bullet_hell_projectiles_count += 1
-                        if bullet_hell_projectiles_count >= max_bullet_hell_projectiles:
-                            break
-
-                                    
-            hp_1 = Heart(self.assets['heart'].copy(), [13, 19], 15)
-            hp_2 = Heart(self.assets['heart'].copy(), [30, 19], 15)
-            hp_3 = Heart(self.assets['heart'].copy(), [47, 19], 15)
-            if self.dead <= 0 and self.dead < 1:
-                hp_1.update()
-                hp_1.render(self.display_black)
-            if self.dead <= -1:
-                hp_2.update()
-                hp_2.render(self.display_black)
-            if self.dead <= -2:
-                hp_3.update()
-                hp_3.render(self.display_black)
-
-            level_bar = Levelbar(self.level, pos=(self.display_red.get_width() // 2 - 25, 13))
-            level_bar.render(self.display_black, 22)
-            
-
-            # black ouline based on display_black
-            display_mask = pygame.mask.from_surface(self.display_black)
-            display_sillhouette = display_mask.to_surface(setcolor=(0, 0, 0, 180), unsetcolor=(0, 0, 0, 0)) # 180 opaque, 0 transparent
-            self.display_2.blit(display_sillhouette, (0, 0))
-            for offset in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-                self.display_2.blit(display_sillhouette, offset) # putting what we drew onframe back into display
-
-            # red ouline based on display
-            display_mask = pygame.mask.from_surface(self.display_red)
-            display_sillhouette = display_mask.to_surface(setcolor=(225, 0, 0, 180), unsetcolor=(0, 0, 0, 0)) # 180 opaque, 0 transparent
-            self.display_2.blit(display_sillhouette, (0, 0))
-            for offset in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-                self.display_2.blit(display_sillhouette, offset) # putting what we drew onframe back into display
-            
-
-            # white ouline based on display_white
-            display_mask = pygame.mask.from_surface(self.display_white)
-            display_sillhouette = display_mask.to_surface(setcolor=(225, 225, 225, 180), unsetcolor=(0, 0, 0, 0)) # 180 opaque, 0 transparent
-            self.display_2.blit(display_sillhouette, (0, 0))
-            for offset in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-                self.display_2.blit(display_sillhouette, offset) # putting what we drew onframe back into display
-            
-
-            for particle in self.particles.copy():
-                kill = particle.update()
-                particle.render(self.display_red, offset=render_scroll)
-                if particle.type == 'leaf':
-                    particle.pos[0] += math.sin(particle.animation.frame * 0.035) * 0.3 # making the parlitcle move back and forth smooth'y
-                if kill:
-                    self.particles.remove(particle)
-
-
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT: # have to code the window closing
-                    pygame.quit()
-                    sys.exit()
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_a: # referencing WASD
-                        self.movement[0] = True
-                    if event.key == pygame.K_d:
-                        self.movement[1] = True
-                    if event.key == pygame.K_w:
-                        self.movement[2] = True
-                    if event.key == pygame.K_s:
-                        self.movement[3] = True
-                    if event.key == pygame.K_j:
-                        self.player.dash('J')
-                    if event.key == pygame.K_i:
-                        self.player.dash('I')
-                    if event.key == pygame.K_l:
-                        self.player.dash('L')
-                    if event.key == pygame.K_k:
-                        self.player.dash('K')
-                if event.type == pygame.KEYUP: # when key is released
-                    if event.key == pygame.K_a: 
-                        self.movement[0] = False
-                    if event.key == pygame.K_d: 
-                        self.movement[1] = False
-                    if event.key == pygame.K_w:
-                        self.movement[2] = False
-                    if event.key == pygame.K_s:
-                        self.movement[3] = False
-            
-            self.display_2.blit(self.display_white, (0, 0)) # white
-            self.display_2.blit(self.display_red, (0, 0)) # red 
-            self.display_2.blit(self.display_black, (0, 0)) # black 
-            self.display_2.blit(self.display_none, (0,0))
-            
-            # implementing transition
-            if self.transition:
-                transition_surf = pygame.Surface(self.display_red.get_size())
-                pygame.draw.circle(transition_surf, (255, 255, 255), (self.display_red.get_width() // 2, self.display_red.get_height() // 2), (30 - abs(self.transition)) * 8) # display center of screen, 30 is the timer we chose, 30 * 8 = 180
-                transition_surf.set_colorkey((255, 255, 255)) # making the circle transparent now
-                self.display_2.blit(transition_surf, (0, 0))
-
-            screenshake_offset = (random.random() * self.screenshake - self.screenshake / 2, random.random() * self.screenshake - self.screenshake / 2)
-            self.screen.blit(pygame.transform.scale(self.display_2, self.screen.get_size()), screenshake_offset) # render (now scaled) display image on big screen
+        for enemy in self.boss:
+            enemy.render(self.display_red, offset=render_scroll) # change outline here
+
+        if self.dead != 1:
+            self.player.render(self.display_white, offset=render_scroll)
+
+        # render bullet projectiles, spawns it the center of the projectile, flipped when going left
+        self.projectiles.render_atlas(self.display_black, self.atlas, self.sprites['projectile'], offset=render_scroll)
+
+        # render magic projectiles, they only show up while the boss is alive
+        if len(self.boss):
+            self.magic.render(self.display_black, self.assets['magic'], offset=render_scroll)
+
+        self.profiler.end()
+
+        # hearts and level counter, -2 dead is 3 lives, boss hearts go from -6 up to 0
+        self.profiler.begin('hud')
+        self.hud.render(self.display_black, max(0, min(3, 1 - self.dead)), self.level, -self.boss[0].hearts if len(self.boss) else 0)
+
+        self.profiler.end()
+
+        # black, red then white outlines, the tiles on display_white never move so their outline is cached
+        self.profiler.begin('outlines')
+        self.outlines.composite(self.display_2, [(self.display_black, (0, 0, 0)), (self.display_red, (225, 0, 0)), (self.display_white, (225, 225, 225))], static=(2, self.tile_layer, self.tile_layer_key))
+        self.profiler.end()
+
+        self.profiler.begin('effects')
+        self.particles.render(self.display_red, offset=render_scroll)
+        self.sparks.render(self.display_red, (255, 255, 255), offset=render_scroll)
+        self.profiler.end()
+        
+        self.profiler.begin('composite')
+        self.display_2.blit(self.display_white, (0, 0)) # white
+        self.display_2.blit(self.display_red, (0, 0)) # red 
+        self.display_2.blit(self.display_black, (0, 0)) # black 
+        self.display_2.blit(self.display_none, (0,0))
+        
+        # implementing transition
+        if self.transition:
+            transition_surf = pygame.Surface(self.display_red.get_size())
+            pygame.draw.circle(transition_surf, (255, 255, 255), (self.display_red.get_width() // 2, self.display_red.get_height() // 2), (30 - abs(self.transition)) * 8) # display center of screen, 30 is the timer we chose, 30 * 8 = 180
+            transition_surf.set_colorkey((255, 255, 255)) # making the circle transparent now
+            self.display_2.blit(transition_surf, (0, 0))
+        self.profiler.end()
+
+        self.profiler.render(self.display_2) # frame times overlay, F3 turns it on and off
+
+        self.profiler.begin('scale')
+        screenshake_offset = (self.shake_rng.random() * self.screenshake - self.screenshake / 2, self.shake_rng.random() * self.screenshake - self.screenshake / 2)
+        self.screen.blit(pygame.transform.scale(self.display_2, self.screen.get_size()), screenshake_offset) # render (now scaled) display image on big screen
+        if not self.headless:
             pygame.display.update()
-            self.clock.tick(60) # run at 60 fps, like a sleep
+        self.profiler.end()
 
-# returns the game then runs it
-Game().run()
\ No newline at end of file
+    def run(self, frames=None, render=True, recorder=None, replay=None):
+        '''
+        runs the Game, fixed timestep: the simulation always moves in SIM_DT ticks, 
+        if we fall behind we do a few ticks per rendered frame instead of slowing down
+        (frames: int, stop after this many ticks, None runs forever, render: bool, False only simulates,
+         recorder: InputRecorder, every tick's inputs get written to it,
+         replay: InputReplay, inputs come from it instead of the keyboard, one tick per frame as fast as we can) -> (ticks ran: int)
+        '''
+        if not self.headless:
+            pygame.mixer.music.load('data/music.mp3')
+            pygame.mixer.music.set_volume(0.5)
+            pygame.mixer.music.play(-1)
+
+        self.sfx['ambience'].play(-1)
+
+        start_tick = self.tick
+        accumulator = 0.0
+        dashes = [] # dash presses wait here until a tick uses them, frames shorter than SIM_DT don't step at all
+        replay_inputs = iter(replay) if replay is not None else None
+        # creating an infinite game loop
+        while not self.game_over and (frames is None or self.tick - start_tick < frames):
+            if replay_inputs is not None:
+                pygame.event.pump() # keeps the window alive, the keyboard is ignored
+                inputs = next(replay_inputs, None)
+                if inputs is None: # end of the recording
+                    break
+                steps = 1 # faster than real time, one tick per frame
+            elif self.headless:
+                with self.profiler.scope('events'):
+                    inputs = self.handle_events()
+                steps = 1 # no real time to keep up with, tick as fast as we can
+            else:
+                with self.profiler.scope('events'):
+                    inputs = self.handle_events()
+                # time since last frame, capped so a long hitch doesn't make us fast forward forever
+                accumulator = min(accumulator + self.clock.tick(self.fps) / 1000, SIM_DT * MAX_SIM_STEPS)
+                steps = int(accumulator / SIM_DT)
+                accumulator -= steps * SIM_DT
+
+            dashes = dashes + inputs['dash']
+            inputs = {'movement': inputs['movement'], 'dash': dashes}
+            for i in range(steps):
+                if recorder:
+                    recorder.record(inputs)
+                with self.profiler.scope('step'):
+                    running = self.step(inputs)
+                dashes = []
+                if not running:
+                    break
+                inputs = {'movement': inputs['movement'], 'dash': dashes} # a dash key press only counts once
+
+            if render and not self.game_over:
+                with self.profiler.scope('render'):
+                    self.render()
+
+            # how many things are alive this frame
+            self.profiler.count('particles', len(self.particles))
+            self.profiler.count('sparks', len(self.sparks))
+            self.profiler.count('projectiles', len(self.projectiles))
+            self.profiler.count('magic', len(self.magic))
+            self.profiler.count('enemies', len(self.skeletons) + len(self.spiders) + len(self.boss))
+            self.profiler.end_frame()
+
+        return self.tick - start_tick
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--headless', action='store_true', help='run without a window, audio or frame cap')
+    parser.add_argument('--frames', type=int, default=None, help='stop after this many ticks')
+    parser.add_argument('--no-render', action='store_true', help='only run the simulation, skips drawing')
+    parser.add_argument('--swarm', action='store_true', help='keep skeletons and spiders in arrays and update them all at once')
+    parser.add_argument('--boss-phases', action='store_true', help='the boss fires spirals, aimed fans and rings between teleports, not just it\'s orbit')
+    parser.add_argument('--check-outlines', action='store_true', help='compare the outlines against the old way every frame')
+    parser.add_argument('--seed', type=int, default=None, help='seed for everything random in the simulation')
+    parser.add_argument('--record', metavar='PATH', help='write every tick\'s inputs to a file')
+    parser.add_argument('--replay', metavar='PATH', help='play back a file made with --record, as fast as it can')
+    parser.add_argument('--profile', action='store_true', help='print p50/p95/p99 of every frame phase at the end')
+    parser.add_argument('--overlay', action='store_true', help='start with the frame times overlay on (F3 toggles it)')
+    parser.add_argument('--trace', metavar='PATH', help='write a chrome trace of the last frames at the end')
+    args = parser.parse_args()
+
+    replay = InputReplay(args.replay) if args.replay else None
+    if replay: # the recording decides how the game is set up
+        args.seed = replay.seed
+        args.swarm = replay.swarm
+        args.boss_phases = replay.boss_phases
+
+    # returns the game then runs it
+    game = Game(headless=args.headless, check_outlines=args.check_outlines, swarm=args.swarm, seed=args.seed, boss_phases=args.boss_phases)
+    if replay and replay.level != game.level:
+        game.level = replay.level
+        game.load_level(game.level)
+    recorder = InputRecorder(args.record, game) if args.record else None
+    game.profiler.overlay = args.overlay
+    start = pygame.time.get_ticks()
+    try:
+        frames = game.run(frames=args.frames, render=not args.no_render, recorder=recorder, replay=replay)
+    finally: # closing the window exits from inside run, the recording still needs it's footer
+        if recorder:
+            recorder.close(game)
+    if args.headless:
+        elapsed = max(1, pygame.time.get_ticks() - start)
+        print(f"{frames} frames in {elapsed} ms ({elapsed / max(1, frames):.3f} ms/frame)")
+    if args.check_outlines:
+        print(f"{game.outlines.mismatches} frames with outlines that don't match")
+    if args.profile:
+        print(game.profiler.report())
+    if args.trace:
+        game.profiler.export_trace(args.trace)
+    if replay:
+        match = replay.matches(game)
+        if match is None:
+            print(f"replayed {frames} of {len(replay)} ticks, the recording has no fingerprint to check")
+        else:
+            print(f"replayed {frames} of {len(replay)} ticks, {'same' if match else 'DIFFERENT'} end state as the recording")
@@ -30,6 +30,8 @@ class Heart:
         surf.blit(self.img, self.pos)
 
 class Levelbar:
+    fonts = {} # font size -> font, SysFont goes looking through files so only do it once per size
+
     def __init__(self, level, pos=[0,0]):
         '''
         initializing the level counter
@@ -37,6 +39,7 @@ class Levelbar:
         '''
         self.level = level
         self.pos = pos
+        self.text = {} # (level, font size) -> pre rendered text
     
 
     def render(self, surf, fontsize):
@@ -45,5 +48,41 @@ class Levelbar:
         (surface, font size)
         '''
         self.fontsize = fontsize
-        current_level = pygame.font.SysFont('Superstar', fontsize).render(f"Level {self.level}", False, (255,255, 0))
-        surf.blit(current_level, self.pos)
\ No newline at end of file
+        if (self.level, fontsize) not in self.text:
+            if fontsize not in Levelbar.fonts:
+                Levelbar.fonts[fontsize] = pygame.font.SysFont('Superstar', fontsize)
+            self.text[(self.level, fontsize)] = Levelbar.fonts[fontsize].render(f"Level {self.level}", False, (255,255, 0))
+        surf.blit(self.text[(self.level, fontsize)], self.pos)
+
+class HUD:
+    def __init__(self, assets, size, level_pos):
+        '''
+        keeps the player's hearts, the boss's hearts and the level counter drawn on one strip at the top of the screen
+        it only gets drawn again when something on it changes
+        (assets, size of the strip, position of the level counter)
+        '''
+        self.surf = pygame.Surface(size, pygame.SRCALPHA)
+        self.player_hearts = [Heart(assets['heart'], [x, 19], 15) for x in (13, 30, 47)]
+        # gold hearts are a shield, they go on top of the red ones
+        self.boss_hearts = [Heart(assets['heart'], [x, 19], 15) for x in (250, 270, 290)] + [Heart(assets['sheild'], [x, 19], 15) for x in (250, 270, 290)]
+        for heart in self.player_hearts + self.boss_hearts:
+            heart.update() # hearts used to be made new every frame so they only ever got one update, keeps them where they've always been
+        self.level_bar = Levelbar(0, pos=level_pos)
+        self.key = None # what the hud showed the last time it was drawn
+
+    def render(self, surf, lives, level, boss_hearts=0):
+        '''
+        renders the hud on screen, redraws it first if anything changed
+        (surface, lives left 0-3, level, boss hearts left 0-6)
+        '''
+        key = (lives, level, boss_hearts)
+        if key != self.key:
+            self.key = key
+            self.surf.fill((0, 0, 0, 0))
+            for heart in self.player_hearts[:lives]:
+                heart.render(self.surf)
+            for heart in self.boss_hearts[:boss_hearts]:
+                heart.render(self.surf)
+            self.level_bar.level = level
+            self.level_bar.render(self.surf, 22)
+        surf.blit(self.surf, (0, 0))
\ No newline at end of file
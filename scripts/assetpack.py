@@ -0,0 +1,134 @@
+import os
+import json
+import mmap
+import struct
+import pygame
+
+PACK_PATH = 'data/assets.pack'
+MAGIC = b'GQPK'
+VERSION = 2 # 2 added the source file's mtime and size to every entry
+HEADER = struct.Struct('<4sHI') # magic, version, length of the json index
+COLORKEY = (0, 0, 0)
+
+def build_pack(path=PACK_PATH, data_dir='data'):
+    '''
+    packs every image (already converted, so the colorkey just has to be set again) and every sound's samples into one file
+    each entry remembers the mtime and size of the file it came from, so a file changed after the pack was built gets loaded instead
+    run with: python -m scripts.assetpack
+    (path to write the pack to, data folder) -> (number of assets packed)
+    '''
+    # convert() and the sound samples need a display and a mixer, dummy ones are fine
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    pygame.init()
+    if not pygame.display.get_surface():
+        pygame.display.set_mode((1, 1))
+
+    entries = []
+    blobs = []
+    offset = 0
+    for root, dirs, files in os.walk(data_dir):
+        dirs.sort()
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            key = os.path.relpath(file_path, data_dir).replace(os.sep, '/')
+            if name.endswith('.png'):
+                img = pygame.image.load(file_path).convert() # same as load_image
+                blob = pygame.image.tobytes(img, 'RGB')
+                entry = {'name': key, 'kind': 'image', 'size': list(img.get_size())}
+            elif name.endswith('.wav'):
+                blob = pygame.mixer.Sound(file_path).get_raw()
+                entry = {'name': key, 'kind': 'sound', 'mixer': list(pygame.mixer.get_init())} # samples only make sense in this mixer format
+            else:
+                continue
+            stat = os.stat(file_path)
+            entry['mtime'] = stat.st_mtime_ns
+            entry['bytes'] = stat.st_size
+            entry['offset'] = offset
+            entry['length'] = len(blob)
+            entries.append(entry)
+            blobs.append(blob)
+            offset += len(blob)
+
+    index = json.dumps(entries).encode('utf-8')
+    f = open(path, 'wb')
+    f.write(HEADER.pack(MAGIC, VERSION, len(index)))
+    f.write(index)
+    for blob in blobs:
+        f.write(blob)
+    f.close()
+    return len(entries)
+
+
+class AssetPack:
+    def __init__(self, path=PACK_PATH):
+        '''
+        opens a pack made by build_pack, the file is memory mapped and surfaces are made straight from it's bytes
+        (path to the pack)
+        '''
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, index_length = HEADER.unpack_from(self.data)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {VERSION} asset pack, rebuild it with python -m scripts.assetpack")
+        self.entries = {entry['name']: entry for entry in json.loads(bytes(self.data[HEADER.size:HEADER.size + index_length]))}
+        self.data_start = HEADER.size + index_length
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def close(self):
+        '''
+        closes the file, surfaces made from the pack without a display still point into it so only do this when you're done
+        '''
+        self.data.close()
+        self.file.close()
+
+    def fresh(self, name, file_path):
+        '''
+        whether the pack has an asset and it's still the same as the file it was built from
+        (asset name, path to the source file) -> (bool)
+        '''
+        entry = self.entries.get(name)
+        if not entry:
+            return False
+        try:
+            stat = os.stat(file_path)
+        except OSError: # the file is gone, let the loader complain about it
+            return False
+        return stat.st_mtime_ns == entry['mtime'] and stat.st_size == entry['bytes']
+
+    def view(self, name):
+        '''
+        the bytes of an asset, no copy
+        (asset name) -> (memoryview)
+        '''
+        entry = self.entries[name]
+        start = self.data_start + entry['offset']
+        return memoryview(self.data)[start:start + entry['length']]
+
+    def image(self, name):
+        '''
+        makes a surface for a packed image
+        (asset name, e.g. images/bow.png) -> (img)
+        '''
+        img = pygame.image.frombuffer(self.view(name), self.entries[name]['size'], 'RGB')
+        if pygame.display.get_surface(): # helps preformance when rendering, and it copies the pixels out of the pack
+            img = img.convert()
+        img.set_colorkey(COLORKEY)
+        return img
+
+    def sound(self, name):
+        '''
+        makes a sound from packed samples, None if the mixer isn't set up the same way it was when the pack was built
+        (asset name, e.g. sfx/jump.wav) -> (pygame.mixer.Sound or None)
+        '''
+        if list(pygame.mixer.get_init() or ()) != self.entries[name]['mixer']:
+            return None
+        return pygame.mixer.Sound(buffer=self.view(name))
+
+
+if __name__ == '__main__':
+    count = build_pack()
+    print(f"packed {count} assets into {PACK_PATH}")
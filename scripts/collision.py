@@ -0,0 +1,118 @@
+import math
+
+def hit_effect(game, pos, sides=False):
+    '''
+    the burst of sparks and particles when something gets hit
+    (game, position: tuple, sides: bool, two big sparks shooting left and right for enemy deaths)
+    '''
+    for i in range(30):
+        # on death sparks
+        angle = game.rng.random() * math.pi * 2 # random angle in a circle
+        speed = game.rng.random() * 5
+        game.sparks.add(pos, angle, 2 + game.rng.random())
+        # on death particles
+        game.particles.add('particle', pos, velocity=[math.cos(angle + math.pi) * speed * 0.5, math.sin(angle * math.pi) * speed * 0.5], frame=game.rng.randint(0, 7))
+    if sides:
+        game.sparks.add(pos, 0, 5 + game.rng.random()) # left
+        game.sparks.add(pos, math.pi, 5 + game.rng.random()) # right
+
+
+class SpatialHash:
+    def __init__(self, cell_size=32):
+        '''
+        buckets rects into a grid of cells so we only compare things that are near each other
+        (cell_size: pixels, should be about the size of the biggest thing in it)
+        '''
+        self.cell_size = cell_size
+        self.cells = {}
+
+    def clear(self):
+        self.cells = {}
+
+    def cells_for(self, rect):
+        '''
+        every cell a rect touches
+        (rect) -> (generator of (cx, cy))
+        '''
+        size = self.cell_size
+        for cx in range(rect.left // size, (rect.right - 1) // size + 1):
+            for cy in range(rect.top // size, (rect.bottom - 1) // size + 1):
+                yield (cx, cy)
+
+    def insert(self, rect, item):
+        '''
+        (rect, anything)
+        '''
+        for cell in self.cells_for(rect):
+            self.cells.setdefault(cell, []).append(item)
+
+    def remove(self, rect, item):
+        '''
+        takes an item back out, rect has to be the one it was inserted with
+        (rect, item)
+        '''
+        for cell in self.cells_for(rect):
+            bucket = self.cells.get(cell)
+            if bucket and item in bucket:
+                bucket.remove(item)
+                if not bucket:
+                    del self.cells[cell]
+
+    def query(self, rect):
+        '''
+        everything in the cells a rect touches, might not actually overlap it
+        (rect) -> (set of items)
+        '''
+        found = set()
+        for cell in self.cells_for(rect):
+            found.update(self.cells.get(cell, ()))
+        return found
+
+
+class CollisionSystem:
+    def __init__(self, cell_size=32):
+        '''
+        one collision stage a tick for the player against every enemy
+        rects are grabbed once, bucketed in a spatial hash and only pairs that really overlap send events
+        events: 'player_hit' when an enemy touches the player, 'enemy_kill' when the player dashes through an enemy
+        (cell_size: spatial hash cell size in pixels)
+        '''
+        self.hash = SpatialHash(cell_size)
+        self.handlers = {'player_hit': [], 'enemy_kill': []}
+
+    def on(self, event, handler):
+        '''
+        registers a handler, it gets called with (enemy, the list the enemy lives in)
+        (event name, function)
+        '''
+        self.handlers[event].append(handler)
+
+    def overlaps(self, rect, groups):
+        '''
+        every enemy whose rect overlaps rect, enemies from lists first (in the same order as groups) then enemies from swarms
+        groups that keep their enemies in arrays (EnemySwarm) test them all at once with overlapping() instead of going through the hash
+        (rect, groups: list of enemy lists or swarms) -> (list of (enemy, group))
+        '''
+        self.hash.clear()
+        rects = []
+        found = []
+        for group in groups:
+            if not isinstance(group, list):
+                found.extend((enemy, group) for enemy in group.overlapping(rect))
+                continue
+            for enemy in group:
+                index = len(rects)
+                rects.append((enemy, group, enemy.rect()))
+                self.hash.insert(rects[index][2], index)
+        hits = [rects[i][:2] for i in sorted(self.hash.query(rect)) if rects[i][2].colliderect(rect)]
+        return hits + found
+
+    def update(self, player, groups):
+        '''
+        finds what the player is touching and sends the events
+        (player, groups: list of enemy lists or swarms, enemies get removed from them by handlers)
+        '''
+        event = 'enemy_kill' if abs(player.dashing) >= 50 else 'player_hit' # dashing through enemies kills them
+        for enemy, group in self.overlaps(player.rect(), groups):
+            for handler in self.handlers[event]:
+                handler(enemy, group)
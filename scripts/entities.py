@@ -1,10 +1,26 @@
 import pygame
 import math
-import random
 
-from scripts.particle import Particle
-from scripts.spark import Spark
-from scripts.UI import Heart
+from scripts.collision import hit_effect
+from scripts.pattern import Ring, Spiral, Orbit, Aimed
+
+# what the boss fires, (pattern, fires while low < boss timer < high, every this many frames)
+# the boss's orbit, a volley of 10 every tick that circles it and grows out towards 130 pixels for 80 frames
+# this is an approximation of the old orbit, not a copy. the old radius came from one angle count shared by every bullet that went up 10 a tick
+# and wrapped at 360, so the whole orbit pulsed between 0 and ~21 pixels. here every bullet grows with it's own age (0.005 a frame, the same
+# rate the count grew at) so it keeps going out to ~43 pixels by the time it expires, and the spacing between bullets is even instead
+BOSS_PATTERNS = [
+    (Orbit(10, radius=130, growth=0.005, lifetime=80, turn=4.5, spin=4.5), -1, 501, 1),
+    (Orbit(1, radius=130, growth=0.005, lifetime=80, turn=4.5, spin=4.5), 50, 450, 6), # the shot it drops while waiting to teleport, the orbit picks it up too
+]
+
+# the harder boss (--boss-phases), it's attack changes with where it is between teleports instead of just orbiting
+BOSS_PHASES = [
+    (Orbit(8, radius=130, growth=0.04, lifetime=80, turn=11, spin=2), -1, 501, 4), # the ring that always circles the boss
+    (Spiral(6, speed=1.2, lifetime=180, turn=7), 50, 450, 6), # spiral arms while the boss is waiting to teleport
+    (Aimed(5, spread=40, speed=2, lifetime=150), 350, 450, 25), # right after a teleport, aimed at the player
+    (Ring(16, speed=0.8, lifetime=240), 0, 50, 25), # slow ring just before the next teleport
+]
 
 class PhysicsEntity:
     def __init__(self, game, e_type, pos, size):
@@ -96,7 +112,7 @@ class PhysicsEntity:
         '''
         renders entitiy asset
         '''
-        surf.blit(pygame.transform.flip(self.animation.img(), self.flip, False), (self.pos[0] - offset[0] + self.anim_offset[0], self.pos[1] - offset[1] + self.anim_offset[1])) # fliping agasint horizontal axis
+        self.game.atlas.blit(surf, self.animation.frame_index(), (self.pos[0] - offset[0] + self.anim_offset[0], self.pos[1] - offset[1] + self.anim_offset[1]), self.flip) # atlas has every frame flipped agasint horizontal axis already
 
 
 
@@ -118,10 +134,10 @@ class Player(PhysicsEntity):
         if abs(self.dashing) in (60, 50): # if at start or end of dash
             for i in range(20): # do 20 times
                 # for burst of particles
-                angle = random.random() * math.pi * 2
-                speed = random.random() * 0.5 + 0.5 # random from 0.5 to 1
+                angle = self.game.rng.random() * math.pi * 2
+                speed = self.game.rng.random() * 0.5 + 0.5 # random from 0.5 to 1
                 pvelocity = [math.cos(angle) * speed, math.sin(angle) * speed]
-                self.game.particles.append(Particle(self.game, 'particle', self.rect().center, velocity=pvelocity, frame=random.randint(0, 7)))
+                self.game.particles.add('particle', self.rect().center, velocity=pvelocity, frame=self.game.rng.randint(0, 7))
         # dash cooldown
         if self.dashing > 0:
             self.dashing = max(0, self.dashing - 1)
@@ -144,8 +160,8 @@ class Player(PhysicsEntity):
                 self.velocity[0] *= 0.01
                 self.velocity[1] *= 0.01  # goes to 0, but never allows player to move downward
             # trail of particles in the middle of dash
-            pvelocity = [abs(self.dashing)/self.dashing * random.random() * 3, 0] # particles move in the direction of the dash
-            self.game.particles.append(Particle(self.game, 'particle', self.rect().center, velocity=pvelocity, frame=random.randint(0, 7)))
+            pvelocity = [abs(self.dashing)/self.dashing * self.game.rng.random() * 3, 0] # particles move in the direction of the dash
+            self.game.particles.add('particle', self.rect().center, velocity=pvelocity, frame=self.game.rng.randint(0, 7))
     
         if movement[0] != 0: # if moving horizontally
             self.set_action('run')
@@ -183,9 +199,32 @@ class Player(PhysicsEntity):
             else:
                 self.dashing = 60 # how long the dash is + it's direction
                 self.set_action('slide')
-            
 
-class Skeleton(PhysicsEntity):
+
+class Enemy(PhysicsEntity):
+    def dashed(self):
+        '''
+        called by the collision stage when the player dashes through this enemy
+        () -> (True if the enemy died and should be removed)
+        '''
+        self.game.screenshake = max(16, self.game.screenshake)  # apply screenshake
+        self.game.sfx['hit'].play()
+        hit_effect(self.game, self.rect().center, sides=True) # enemy death effect
+        return True # [**]
+
+    def heading(self, dis):
+        '''
+        which way to walk to get to the player, a few tiles away we follow the game's flow field so we go around walls
+        (dis: vector straight at the player) -> ((x, y))
+        '''
+        center = self.rect().center
+        waypoint = self.game.flow.waypoint(center)
+        if waypoint is None: # close by, straight at the player
+            return (dis[0], dis[1])
+        return (waypoint[0] - center[0], waypoint[1] - center[1])
+
+
+class Skeleton(Enemy):
     def __init__(self, game, pos, size):
         '''
         instantiates the enemies
@@ -202,7 +241,8 @@ class Skeleton(PhysicsEntity):
             dis = pygame.math.Vector2(self.game.player.pos[0] - self.pos[0], self.game.player.pos[1] - self.pos[1])
             distance = dis.length()            
             if distance >= 30:
-                angle = math.atan2(dis.y, dis.x)
+                heading = self.heading(dis)
+                angle = math.atan2(heading[1], heading[0])
                 movement = (math.cos(angle) * self.speed, math.sin(angle) * self.speed)
                 self.walking = True
             elif (abs(self.game.player.pos[1] - self.pos[1]) != 0):
@@ -215,17 +255,19 @@ class Skeleton(PhysicsEntity):
                     if (self.flip and dis[0] < 0): # player is left of enemy, and enemy is looking left
                         self.timer = 60 # Set a cooldown timer for shooting (300 frames = 5 seconds)
                         self.game.sfx['shoot'].play()
-                        self.game.projectiles.append([[self.rect().centerx - 7, self.rect().centery], -2.5, 0])
+                        arrow_pos = (self.rect().centerx - 7, self.rect().centery)
+                        self.game.projectiles.add(arrow_pos, (-2.5, 0))
                         for i in range(4):
-                            self.game.sparks.append(Spark(self.game.projectiles[-1][0], random.random() - 0.5 + math.pi, 2 + random.random())) # getting pos from projectiles in it's list, facing left
+                            self.game.sparks.add(arrow_pos, self.game.rng.random() - 0.5 + math.pi, 2 + self.game.rng.random()) # sparks at the arrow, facing left
                     if (not self.flip and dis[0] > 0):
-                        self.game.projectiles.append([[self.rect().centerx + 7, self.rect().centery], 2.5, 0])
+                        arrow_pos = (self.rect().centerx + 7, self.rect().centery)
+                        self.game.projectiles.add(arrow_pos, (2.5, 0))
                         self.timer = 60  # Set a cooldown timer for shooting (300 frames = 5 seconds)
                         self.game.sfx['shoot'].play()
                         for i in range(4):
-                            self.game.sparks.append(Spark(self.game.projectiles[-1][0], random.random() - 0.5, 2 + random.random())) # facing right
-        elif random.random() < 0.01: # 1 in every 6.1 seconds
-            self.walking = random.randint(30, 120)
+                            self.game.sparks.add(arrow_pos, self.game.rng.random() - 0.5, 2 + self.game.rng.random()) # facing right
+        elif self.game.rng.random() < 0.01: # 1 in every 6.1 seconds
+            self.walking = self.game.rng.randint(30, 120)
         
         # Reduce timer
         if self.timer > 0:
@@ -238,34 +280,19 @@ class Skeleton(PhysicsEntity):
         else:
             self.set_action('idle')
 
-        if abs(self.game.player.dashing) >= 50:
-            if self.rect().colliderect(self.game.player.rect()): # if enemy hitbox collides with player
-                self.game.screenshake = max(16, self.game.screenshake)  # apply screenshake
-                self.game.sfx['hit'].play()
-                for i in range(30): # enemy death effect
-                    # on death sparks
-                    angle = random.random() * math.pi * 2 # random angle in a circle
-                    speed = random.random() * 5
-                    self.game.sparks.append(Spark(self.rect().center, angle, 2 + random.random())) 
-                    # on death particles
-                    self.game.particles.append(Particle(self.game, 'particle', self.rect().center, velocity=[math.cos(angle + math.pi) * speed * 0.5, math.sin(angle * math.pi) * speed * 0.5], frame=random.randint(0, 7)))
-                self.game.sparks.append(Spark(self.rect().center, 0, 5 + random.random())) # left
-                self.game.sparks.append(Spark(self.rect().center, math.pi, 5 + random.random())) # right
-                return True # [**]
-                
 
     def render(self, surf, offset=(0, 0)):
         super().render(surf, offset=offset)
 
         if self.flip:
-            surf.blit(pygame.transform.flip(self.game.assets['bow'], True, False), (self.rect().centerx + 1 - self.game.assets['bow'].get_width() + 2 - offset[0], self.rect().centery - 8 - offset[1])) # renders the bow 
+            self.game.atlas.blit(surf, self.game.sprites['bow'], (self.rect().centerx + 1 - self.game.assets['bow'].get_width() + 2 - offset[0], self.rect().centery - 8 - offset[1]), True) # renders the bow 
         else:
-            surf.blit(self.game.assets['bow'], (self.rect().centerx - 1 - offset[0], self.rect().centery - 8 - offset[1]))
+            self.game.atlas.blit(surf, self.game.sprites['bow'], (self.rect().centerx - 1 - offset[0], self.rect().centery - 8 - offset[1]))
 
     
 
         
-class Spider(PhysicsEntity):
+class Spider(Enemy):
     def __init__(self, game, pos, size):
         '''
         instantiates the spider
@@ -289,7 +316,8 @@ class Spider(PhysicsEntity):
             movement = (math.cos(angle) * self.speed, math.sin(angle) * self.speed) # + math.pi so it's the opposite direction
             self.bite =  150 # t
         if not self.bite or distance > 25:
-            angle = math.atan2(dis.y, dis.x)
+            heading = self.heading(dis)
+            angle = math.atan2(heading[1], heading[0])
             movement = (math.cos(angle) * self.speed, math.sin(angle) * self.speed) # the same rate that the player has before he can get hit again by collision
         else:
             movement= (0, 0)
@@ -305,28 +333,13 @@ class Spider(PhysicsEntity):
         else:
             self.set_action('idle')
 
-        if abs(self.game.player.dashing) >= 50:
-            if self.rect().colliderect(self.game.player.rect()): # if enemy hitbox collides with player
-                self.game.screenshake = max(16, self.game.screenshake)  # apply screenshake
-                self.game.sfx['hit'].play()
-                for i in range(30): # enemy death effect
-                    # on death sparks
-                    angle = random.random() * math.pi * 2 # random angle in a circle
-                    speed = random.random() * 5
-                    self.game.sparks.append(Spark(self.rect().center, angle, 2 + random.random())) 
-                    # on death particles
-                    self.game.particles.append(Particle(self.game, 'particle', self.rect().center, velocity=[math.cos(angle + math.pi) * speed * 0.5, math.sin(angle * math.pi) * speed * 0.5], frame=random.randint(0, 7)))
-                self.game.sparks.append(Spark(self.rect().center, 0, 5 + random.random())) # left
-                self.game.sparks.append(Spark(self.rect().center, math.pi, 5 + random.random())) # right
-                return True # [**]
-                
 
     def render(self, surf, offset=(0, 0)):
         super().render(surf, offset=offset)
 
     
 
-class Boss(PhysicsEntity):
+class Boss(Enemy):
     def __init__(self, game, pos, size):
         '''
         instantiates the spider
@@ -368,11 +381,11 @@ class Boss(PhysicsEntity):
             self.game.sfx['dash'].play()
             for i in range(40): # do 20 times
                 # for burst of particles
-                angle = random.random() * math.pi * 10
-                speed = random.random() * 0.5 + 0.5 # random from 0.5 to 1
+                angle = self.game.rng.random() * math.pi * 10
+                speed = self.game.rng.random() * 0.5 + 0.5 # random from 0.5 to 1
                 pvelocity = [math.cos(angle) * speed, math.sin(angle) * speed]
-                self.game.particles.append(Particle(self.game, 'particle', self.rect().center, velocity=pvelocity, frame=random.randint(0, 7)))
-                self.game.sparks.append(Spark(self.rect().center, angle, 2 + random.random())) 
+                self.game.particles.add('particle', self.rect().center, velocity=pvelocity, frame=self.game.rng.randint(0, 7))
+                self.game.sparks.add(self.rect().center, angle, 2 + self.game.rng.random()) 
             
         
         if self.tele_timer == 0: # teleports after 1 sec
@@ -381,34 +394,19 @@ class Boss(PhysicsEntity):
             if self.particle == 0:
                 for i in range(40): # do 20 times
                     # for burst of particles
-                    angle = random.random() * math.pi * 10
-                    speed = random.random() * 0.5 + 0.5 # random from 0.5 to 1
+                    angle = self.game.rng.random() * math.pi * 10
+                    speed = self.game.rng.random() * 0.5 + 0.5 # random from 0.5 to 1
                     pvelocity = [math.cos(angle) * speed, math.sin(angle) * speed]
-                    self.game.particles.append(Particle(self.game, 'particle', self.rect().center, velocity=pvelocity, frame=random.randint(0, 7)))
-                    self.game.sparks.append(Spark(self.rect().center, angle, 2 + random.random())) 
+                    self.game.particles.add('particle', self.rect().center, velocity=pvelocity, frame=self.game.rng.randint(0, 7))
+                    self.game.sparks.add(self.rect().center, angle, 2 + self.game.rng.random()) 
             self.particle = 1
             self.tele_timer = -1 # so it doesnt activate again
 
-        # let the bullets fall
-        if self.timer < 450 and self.timer > 50:
-            if self.timer % 2 == 0 and self.timer % 3 == 0: # limit the projectiles
-                # spawn the four projectiles at the player's pos
-                # want to give the prok a horizontal direction and we'll apply a exponential increasing angle to the vector
-                # we only need to adjust the valua that's zero
-                # Top / Bottom
-                self.game.magic.append([[self.rect().centerx, self.rect().centery + 15], [0, -1], 0, 'Up'])
-                # self.game.magic.append([[self.rect().centerx, self.rect().centery - 15], [0, 1], 0, 'Down'])
-                # Right / Left
-                # self.game.magic.append([[self.rect().centerx + 14, self.rect().centery], [1, 0], 0, 'Left'])
-                # self.game.magic.append([[self.rect().centerx - 11, self.rect().centery], [-1, 0], 0, 'Right'])       
-        
-
-
-                # dir = [self.game.player.pos[0] - self.pos[0], self.game.player.pos[1] - self.pos[1]] 
-                # self.game.magic.append([[self.rect().centerx + 14, self.rect().centery], dir , 0])
+        # let the bullets fall, every pattern is fired while the timer is in it's window
+        for pattern, low, high, every in self.game.boss_patterns:
+            if low < self.timer < high and self.timer % every == 0:
+                self.game.magic.emit(pattern, self.game.tick, self.rect().center, self.game.player.rect().center)
 
-        
-            
         # Reduce timers
         if self.timer > 0:
             self.timer -= 1
@@ -419,60 +417,23 @@ class Boss(PhysicsEntity):
         self.count = (self.count + 1) % self.max # count for staff animation
 
 
-        if abs(self.game.player.dashing) >= 50 and self.timer > 350 and self.death_timer == 0:
-            if self.rect().colliderect(self.game.player.rect()): # if enemy hitbox collides with player
-                self.game.screenshake = max(16, self.game.screenshake)  # apply screenshake
-                self.game.sfx['hit'].play()
-                for i in range(30): # enemy death effect
-                    # on death sparks
-                    angle = random.random() * math.pi * 2 # random angle in a circle
-                    speed = random.random() * 5
-                    self.game.sparks.append(Spark(self.rect().center, angle, 2 + random.random())) 
-                    # on death particles
-                    self.game.particles.append(Particle(self.game, 'particle', self.rect().center, velocity=[math.cos(angle + math.pi) * speed * 0.5, math.sin(angle * math.pi) * speed * 0.5], frame=random.randint(0, 7)))
-                self.game.sparks.append(Spark(self.rect().center, 0, 5 + random.random())) # left
-                self.game.sparks.append(Spark(self.rect().center, math.pi, 5 + random.random())) # right
-                
-                self.death_timer = 150 # 500 - 350 so max heart loss is 1
-                self.hearts += 1
-                if self.hearts == 0:
-                    return True # [**]
-
         super().update(tilemap, movement=movement)
 
+    def dashed(self):
+        '''
+        the boss only takes a hit right after teleporting, and loses one heart at most per teleport
+        () -> (True once it's out of hearts)
+        '''
+        if self.timer <= 350 or self.death_timer:
+            return False
+        super().dashed()
+        self.death_timer = 150 # 500 - 350 so max heart loss is 1
+        self.hearts += 1
+        return self.hearts == 0 # [**]
+
     def render(self, surf, offset=(0, 0)):
         super().render(surf, offset=offset)
         if self.count >= 25:
             surf.blit(self.game.assets['staff'], (self.rect().centerx - self.game.assets['bow'].get_width() + 24 - offset[0], self.rect().centery - 16 - offset[1])) # renders the staff
         else:
             surf.blit(self.game.assets['staff'], (self.rect().centerx - self.game.assets['bow'].get_width() + 24 - offset[0], self.rect().centery - 18 - offset[1])) # renders the staff
-        
-        # rendering the hearts, we want 6 heart levels, gold heart is a shield, red is actually hit
-        hp_1 = Heart(self.game.assets['heart'].copy(), [250, 19], 15)
-        hp_2 = Heart(self.game.assets['heart'].copy(), [270, 19], 15)
-        hp_3 = Heart(self.game.assets['heart'].copy(), [290, 19], 15)
-        hp_4 = Heart(self.game.assets['sheild'].copy(), [250, 19], 15)
-        hp_5 = Heart(self.game.assets['sheild'].copy(), [270, 19], 15)
-        hp_6 = Heart(self.game.assets['sheild'].copy(), [290, 19], 15)
-        if self.hearts < 0:
-            hp_1.update()
-            hp_1.render(self.game.display_black)
-        if self.hearts < -1:
-            hp_2.update()
-            hp_2.render(self.game.display_black)
-        if self.hearts < -2:
-            hp_3.update()
-            hp_3.render(self.game.display_black)
-        if self.hearts < -3:
-            hp_4.update()
-            hp_4.render(self.game.display_black)
-        if self.hearts < -4:
-            hp_5.update()
-            hp_5.render(self.game.display_black)
-        if self.hearts < -5:
-            hp_6.update()
-            hp_6.render(self.game.display_black)
-
-
-
-        
\ No newline at end of file
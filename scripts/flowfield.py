@@ -0,0 +1,122 @@
+from collections import deque
+
+import numpy as np
+
+# the 8 ways to step out of a cell, straight ones first so ties go straight
+FLOW_OFFSETS = [(1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (-1, 1), (1, -1), (-1, -1)]
+
+class FlowField:
+    def __init__(self, tilemap):
+        '''
+        how far every open tile is from the player's tile and which tile to step to next to get closer
+        worked out with one BFS over tilemap.solid whenever the player changes tile or the map changes, enemies just look up their tile
+        (tilemap)
+        '''
+        self.tilemap = tilemap
+        self.key = None # (target cell, tilemap version) the field was built for
+        self.target_cell = None
+        self.distance = np.zeros((0, 0), dtype=np.int32) # steps to the target, -1 if it can't be reached, indexed [x, y] like the tilemap grid
+        self.next_cell = np.zeros((0, 0, 2), dtype=np.int64) # grid cell to walk to from each cell
+        self.builds = 0 # how many times the field has been worked out, for checking it isn't redone every frame
+
+    def cell(self, pos):
+        '''
+        grid cell a pixel position is in
+        (pixel position) -> (grid x, grid y)
+        '''
+        return self.tilemap.grid_pos((pos[0] // self.tilemap.tile_size, pos[1] // self.tilemap.tile_size))
+
+    def update(self, target):
+        '''
+        rebuilds the field if the target moved to another tile or the map changed
+        (target: pixel position, usually the center of the player)
+        '''
+        target_cell = self.cell(target)
+        key = (target_cell, self.tilemap.version)
+        if key == self.key:
+            return
+        self.key = key
+        self.target_cell = target_cell
+        self.build(target_cell)
+
+    def build(self, target_cell):
+        '''
+        BFS out from the target over every open tile, diagonal steps can't cut the corner of a solid tile
+        (target grid cell)
+        '''
+        self.builds += 1
+        solid = self.tilemap.solid
+        grid_w, grid_h = solid.shape
+        distance = np.full((grid_w, grid_h), -1, dtype=np.int32)
+        tx, ty = target_cell
+        if not (0 <= tx < grid_w and 0 <= ty < grid_h) or solid[tx, ty]:
+            self.distance = distance # player is off the map or inside a wall, nothing to follow
+            self.next_cell = np.zeros((grid_w, grid_h, 2), dtype=np.int64)
+            return
+
+        blocked = solid.tolist() # plain lists are quicker than numpy for one cell at a time
+        steps = [[-1] * grid_h for x in range(grid_w)]
+        steps[tx][ty] = 0
+        queue = deque([(tx, ty)])
+        while queue:
+            x, y = queue.popleft()
+            d = steps[x][y] + 1
+            for dx, dy in FLOW_OFFSETS:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < grid_w and 0 <= ny < grid_h and steps[nx][ny] == -1 and not blocked[nx][ny]:
+                    if dx and dy and (blocked[nx][y] or blocked[x][ny]): # dont cut corners
+                        continue
+                    steps[nx][ny] = d
+                    queue.append((nx, ny))
+        distance[:] = steps
+        self.distance = distance
+
+        # next cell from every cell is the neighbor closest to the target, the same corner rule applies
+        big = np.iinfo(np.int32).max
+        padded = np.full((grid_w + 2, grid_h + 2), big, dtype=np.int64)
+        padded[1:-1, 1:-1] = np.where(distance >= 0, distance, big)
+        open_cells = np.zeros((grid_w + 2, grid_h + 2), dtype=bool)
+        open_cells[1:-1, 1:-1] = ~solid
+        xs, ys = np.meshgrid(np.arange(grid_w), np.arange(grid_h), indexing='ij')
+        best = np.where(distance >= 0, distance, big).astype(np.int64)
+        next_cell = np.stack((xs, ys), axis=-1)
+        for dx, dy in FLOW_OFFSETS:
+            neighbor = padded[1 + dx:grid_w + 1 + dx, 1 + dy:grid_h + 1 + dy]
+            better = neighbor < best
+            if dx and dy:
+                better &= open_cells[1 + dx:grid_w + 1 + dx, 1:-1] & open_cells[1:-1, 1 + dy:grid_h + 1 + dy]
+            best = np.where(better, neighbor, best)
+            next_cell[better] = np.stack((xs[better] + dx, ys[better] + dy), axis=-1)
+        self.next_cell = next_cell
+
+    def waypoints(self, points):
+        '''
+        where enemies at points should walk towards, the center of the next tile on the way to the target
+        only far away enemies get one, in the target's tile or right next to it they should go straight at the player
+        (points: numpy array (n, 2) of pixel positions) -> (waypoints: numpy array (n, 2), use: bool array, False means go straight)
+        '''
+        ts = self.tilemap.tile_size
+        origin = np.array(self.tilemap.grid_origin)
+        cells = np.floor_divide(points, ts).astype(np.int64) - origin
+        grid_w, grid_h = self.distance.shape
+        inside = (cells[:, 0] >= 0) & (cells[:, 0] < grid_w) & (cells[:, 1] >= 0) & (cells[:, 1] < grid_h)
+        use = np.zeros(len(points), dtype=bool)
+        use[inside] = self.distance[cells[inside, 0], cells[inside, 1]] >= 2
+        waypoints = np.zeros((len(points), 2))
+        if use.any():
+            step = self.next_cell[cells[use, 0], cells[use, 1]]
+            waypoints[use] = (step + origin) * ts + ts / 2
+        return waypoints, use
+
+    def waypoint(self, point):
+        '''
+        waypoints for one enemy
+        (pixel position) -> ((x, y) or None to go straight at the player)
+        '''
+        gx, gy = self.cell(point)
+        grid_w, grid_h = self.distance.shape
+        if 0 <= gx < grid_w and 0 <= gy < grid_h and self.distance[gx, gy] >= 2:
+            nx, ny = self.next_cell[gx, gy]
+            ts = self.tilemap.tile_size
+            return ((nx + self.tilemap.grid_origin[0]) * ts + ts / 2, (ny + self.tilemap.grid_origin[1]) * ts + ts / 2)
+        return None
@@ -0,0 +1,181 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pygame
+
+from scripts.tilemap import Tilemap
+from scripts.mapformat import BINARY_EXT
+from scripts.entities import Skeleton, Spider, Boss
+from scripts.swarm import SkeletonSwarm, SpiderSwarm
+
+LEAF_SPAWNER = [('large_decor', 2)] # trees that drop leaves
+SPAWNERS = [('spawners', 0), ('spawners', 1), ('spawners', 2), ('spawners', 3)] # player, skeleton, spider, boss
+CACHED_LEVELS = 4 # parsed maps kept in memory
+
+def map_path(map_id):
+    '''
+    the binary version of a map if it's been built (python -m scripts.mapformat) since the json was last saved, otherwise the json
+    a binary older than the json is out of date, the json wins until the map is converted again
+    (map id) -> (path)
+    '''
+    path = 'data/maps/' + str(map_id)
+    if os.path.exists(path + BINARY_EXT):
+        if not os.path.exists(path + '.json') or os.path.getmtime(path + BINARY_EXT) >= os.path.getmtime(path + '.json'):
+            return path + BINARY_EXT
+    return path + '.json'
+
+
+class Level:
+    def __init__(self, map_id, tilemap, leaf_spawners, player_pos, skeletons, spiders, boss):
+        '''
+        one map ready to be played, the tilemap is loaded with the spawners taken out and the enemies are already made
+        (map id, tilemap, leaf spawner rects, where the player starts or None, skeletons, spiders, boss: lists or swarms)
+        '''
+        self.map_id = map_id
+        self.tilemap = tilemap
+        self.leaf_spawners = leaf_spawners
+        self.player_pos = player_pos
+        self.skeletons = skeletons
+        self.spiders = spiders
+        self.boss = boss
+
+
+class LevelTemplate:
+    def __init__(self, map_id, tilemap, leaf_spawners, spawners):
+        '''
+        a parsed map that never gets played on, levels are copied out of it with instantiate_level
+        (map id, tilemap with the spawners taken out, leaf spawner (x, y, w, h) tuples, (variant, pixel position) of every spawner)
+        '''
+        self.map_id = map_id
+        self.tilemap = tilemap
+        self.leaf_spawners = leaf_spawners
+        self.spawners = spawners
+
+
+def parse_level(game, map_id):
+    '''
+    reads a map, builds it's grid and pulls out the spawners, this is the slow part of loading a level
+    only reads from game so it's safe to run on another thread
+    (game, map id) -> (LevelTemplate)
+    '''
+    tilemap = Tilemap(game, tile_size=16)
+    tilemap.load(map_path(map_id))
+
+    # leaf particle affect
+    leaf_spawners = []
+    for tree in tilemap.extract(LEAF_SPAWNER, keep=True):
+        leaf_spawners.append(((4 + tree['pos'][0]), (4 + tree['pos'][1]), 23, 13)) # offsetting by 4 due to tree sprite
+
+    spawners = [(spawner['variant'], tuple(spawner['pos'])) for spawner in tilemap.extract(SPAWNERS)]
+    return LevelTemplate(map_id, tilemap, leaf_spawners, spawners)
+
+
+def instantiate_level(game, template):
+    '''
+    makes a playable level out of a template, copies the tilemap and makes fresh enemies so the template stays as it was
+    (game, LevelTemplate) -> (Level)
+    '''
+    leaf_spawners = [pygame.Rect(rect) for rect in template.leaf_spawners]
+
+    # spawn the ememies
+    player_pos = None
+    skeletons = SkeletonSwarm(game) if game.swarm else []
+    spiders = SpiderSwarm(game) if game.swarm else []
+    boss = []
+    for variant, pos in template.spawners:
+        pos = list(pos) # the player and boss keep the list they're given and move it
+        if variant == 0:
+            player_pos = pos
+        elif variant == 1:
+            if game.swarm:
+                skeletons.add(pos)
+            else:
+                skeletons.append(Skeleton(game, pos, (7, 15)))
+        elif variant == 2:
+            if game.swarm:
+                spiders.add(pos)
+            else:
+                spiders.append(Spider(game, pos, (10, 7)))
+        else:
+            boss.append(Boss(game, pos, (21, 31)))
+    return Level(template.map_id, template.tilemap.copy(), leaf_spawners, player_pos, skeletons, spiders, boss)
+
+
+class LevelCache:
+    def __init__(self, game, size=CACHED_LEVELS):
+        '''
+        keeps the last few parsed levels around, dying reloads the same level over and over and it shouldn't have to read the map every time
+        least recently used template goes once there are more than size, safe to use from the loader's worker and the game at once
+        (game, size: most templates kept)
+        '''
+        self.game = game
+        self.size = size
+        self.templates = OrderedDict() # map id -> LevelTemplate, least recently used first
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, map_id):
+        '''
+        the template of a map, parsed now if it isn't cached
+        (map id) -> (LevelTemplate)
+        '''
+        with self.lock:
+            if map_id in self.templates:
+                self.templates.move_to_end(map_id)
+                self.hits += 1
+                return self.templates[map_id]
+            self.misses += 1
+        template = parse_level(self.game, map_id) # outside the lock, the other thread can still get levels that are cached
+        with self.lock:
+            self.templates[map_id] = template
+            self.templates.move_to_end(map_id)
+            while len(self.templates) > self.size:
+                self.templates.popitem(last=False)
+        return template
+
+    def __len__(self):
+        return len(self.templates)
+
+
+class LevelLoader:
+    def __init__(self, game):
+        '''
+        prepares levels on a worker thread so changing level doesn't read and parse a map in the middle of a frame
+        preload() as early as we know which level is next, take() hands it over when it's time to swap
+        (game)
+        '''
+        self.game = game
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='levels')
+        self.cache = LevelCache(game)
+        self.pending = {} # map id -> future of a Level
+        self.preloads = 0 # how many levels were handed over already prepared, for checking the worker is actually used
+
+    def prepare(self, map_id):
+        '''
+        a fresh level made from the cached template, only reading the map if it isn't cached
+        (map id) -> (Level)
+        '''
+        return instantiate_level(self.game, self.cache.get(map_id))
+
+    def preload(self, map_id):
+        '''
+        starts preparing a level in the background, does nothing if it's already on the way
+        (map id)
+        '''
+        if map_id not in self.pending:
+            self.pending[map_id] = self.executor.submit(self.prepare, map_id)
+
+    def take(self, map_id):
+        '''
+        the prepared level, waits for the worker if it's not quite done and prepares it right here if it was never preloaded
+        a preloaded level can only be taken once, it's entities get played with
+        (map id) -> (Level)
+        '''
+        future = self.pending.pop(map_id, None)
+        if future is None:
+            return self.prepare(map_id)
+        self.preloads += 1
+        return future.result()
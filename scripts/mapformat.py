@@ -0,0 +1,197 @@
+import os
+import sys
+import json
+import glob
+import struct
+
+import numpy as np
+
+BINARY_EXT = '.gqmap'
+MAGIC = b'GQMP'
+VERSION = 1
+# magic, version, tile size, tile types, grid origin x, y (tiles), grid width, height, tiles in the grid, offgrid tiles, spawners
+HEADER = struct.Struct('<4sHHHiiIIIII')
+SPAWNER_TYPE = 'spawners'
+# offgrid tiles and spawners are both one of these, flags bit 0/1 mean x/y were ints in the json
+# for offgrid tiles kind is the tile type, for spawners 0 means on the grid and 1 offgrid, index is where the tile was in the json
+RECORD = np.dtype([('kind', 'u1'), ('flags', 'u1'), ('variant', '<u2'), ('index', '<u4'), ('x', '<f8'), ('y', '<f8')])
+FLAG_INT_X = 1
+FLAG_INT_Y = 2
+
+def is_binary(data):
+    '''
+    (bytes of a map file) -> (True if it's in the binary format)
+    '''
+    return data[:4] == MAGIC
+
+def _flags(pos):
+    return (FLAG_INT_X if isinstance(pos[0], int) else 0) | (FLAG_INT_Y if isinstance(pos[1], int) else 0)
+
+def _coord(value, is_int):
+    return int(value) if is_int else value
+
+def encode_map(map_data):
+    '''
+    packs a map into the binary format, every tile type is written once and the grid is stored as arrays instead of one dict per tile
+    layout: header, type names, then width * height type (uint8, 0 is empty), variant (uint16) and order (uint32) layers, then offgrid and spawner records
+    the order of the json tilemap and offgrid list is kept, it decides the order enemies spawn in so it matters for replays
+    (map data: dict like the json, tilemap / tile_size / offgrid) -> (bytes)
+    '''
+    names = []
+    type_index = {}
+    def type_id(name):
+        if name not in type_index:
+            if len(names) == 255:
+                raise ValueError('binary maps can have at most 255 tile types')
+            type_index[name] = len(names)
+            names.append(name)
+        return type_index[name]
+
+    grid = [] # (index in the tilemap, x, y, type id, variant)
+    spawners = []
+    for i, (loc, tile) in enumerate(map_data['tilemap'].items()):
+        x, y = tile['pos']
+        if set(tile) != {'type', 'variant', 'pos'} or not isinstance(x, int) or not isinstance(y, int) or loc != str(x) + ';' + str(y):
+            raise ValueError(f"tile at {loc} can't be stored in a binary map: {tile}")
+        if tile['type'] == SPAWNER_TYPE:
+            spawners.append((0, _flags(tile['pos']), tile['variant'], i, x, y))
+        else:
+            grid.append((i, x, y, type_id(tile['type']), tile['variant']))
+    offgrid = []
+    for i, tile in enumerate(map_data['offgrid']):
+        if set(tile) != {'type', 'variant', 'pos'}:
+            raise ValueError(f"offgrid tile can't be stored in a binary map: {tile}")
+        if tile['type'] == SPAWNER_TYPE:
+            spawners.append((1, _flags(tile['pos']), tile['variant'], i, tile['pos'][0], tile['pos'][1]))
+        else:
+            offgrid.append((type_id(tile['type']), _flags(tile['pos']), tile['variant'], i, tile['pos'][0], tile['pos'][1]))
+
+    if grid:
+        xs = [tile[1] for tile in grid]
+        ys = [tile[2] for tile in grid]
+        origin = (min(xs), min(ys))
+        size = (max(xs) - origin[0] + 1, max(ys) - origin[1] + 1)
+    else:
+        origin = (0, 0)
+        size = (0, 0)
+    types = np.zeros(size, dtype=np.uint8)
+    variants = np.zeros(size, dtype='<u2')
+    order = np.zeros(size, dtype='<u4')
+    for i, x, y, tile_type, variant in grid:
+        types[x - origin[0], y - origin[1]] = tile_type + 1
+        variants[x - origin[0], y - origin[1]] = variant
+        order[x - origin[0], y - origin[1]] = i
+
+    parts = [HEADER.pack(MAGIC, VERSION, map_data['tile_size'], len(names), origin[0], origin[1], size[0], size[1], len(grid), len(offgrid), len(spawners))]
+    for name in names:
+        encoded = name.encode('utf-8')
+        parts.append(bytes([len(encoded)]) + encoded)
+    parts += [types.tobytes(), variants.tobytes(), order.tobytes()]
+    parts.append(np.array(offgrid, dtype=RECORD).tobytes())
+    parts.append(np.array(spawners, dtype=RECORD).tobytes())
+    return b''.join(parts)
+
+def decode_layers(data):
+    '''
+    reads a binary map without making a dict per tile, the layers are numpy arrays straight out of the bytes (read only, they share the bytes)
+    Tilemap.load fills it's grid from these, decode_map turns them into the json style dict
+    (bytes or memoryview) -> (dict: tile_size, names, origin, types / variants / order: the [x, y] layers, tiles: how many grid tiles counting spawners,
+     spawners: {"x;y": (order, tile)} of the spawners on the grid, offgrid: offgrid tiles and spawners in order)
+    '''
+    magic, version, tile_size, type_count, ox, oy, width, height, grid_count, offgrid_count, spawner_count = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"not a version {VERSION} binary map")
+    offset = HEADER.size
+    names = []
+    for i in range(type_count):
+        length = data[offset]
+        names.append(bytes(data[offset + 1:offset + 1 + length]).decode('utf-8'))
+        offset += 1 + length
+    cells = width * height
+    types = np.frombuffer(data, dtype=np.uint8, count=cells, offset=offset).reshape(width, height)
+    variants = np.frombuffer(data, dtype='<u2', count=cells, offset=offset + cells).reshape(width, height)
+    order = np.frombuffer(data, dtype='<u4', count=cells, offset=offset + cells * 3).reshape(width, height)
+    offset += cells * 7
+    offgrid_records = np.frombuffer(data, dtype=RECORD, count=offgrid_count, offset=offset)
+    spawner_records = np.frombuffer(data, dtype=RECORD, count=spawner_count, offset=offset + offgrid_count * RECORD.itemsize)
+
+    spawners = {}
+    offgrid = [None] * (offgrid_count + spawner_count - int(np.count_nonzero(spawner_records['kind'] == 0)))
+    for tile_type, flags, variant, i, x, y in offgrid_records.tolist():
+        offgrid[i] = {'type': names[tile_type], 'variant': variant, 'pos': [_coord(x, flags & FLAG_INT_X), _coord(y, flags & FLAG_INT_Y)]}
+    for kind, flags, variant, i, x, y in spawner_records.tolist():
+        pos = [_coord(x, flags & FLAG_INT_X), _coord(y, flags & FLAG_INT_Y)]
+        if kind == 0:
+            spawners[str(pos[0]) + ';' + str(pos[1])] = (i, {'type': SPAWNER_TYPE, 'variant': variant, 'pos': pos})
+        else:
+            offgrid[i] = {'type': SPAWNER_TYPE, 'variant': variant, 'pos': pos}
+    return {'tile_size': tile_size, 'names': names, 'origin': (ox, oy), 'types': types, 'variants': variants, 'order': order,
+            'tiles': grid_count + len(spawners), 'spawners': spawners, 'offgrid': offgrid}
+
+def layer_tiles(layers):
+    '''
+    makes the grid tiles of decoded layers, spawners included
+    (layers from decode_layers) -> (list of (order, "x;y", tile) in the order they were in the json)
+    '''
+    types = layers['types']
+    names = layers['names']
+    ox, oy = layers['origin']
+    tiles = [(order, loc, tile) for loc, (order, tile) in layers['spawners'].items()]
+    xs, ys = np.nonzero(types)
+    for x, y, tile_type, variant, order in zip((xs + ox).tolist(), (ys + oy).tolist(), types[xs, ys].tolist(), layers['variants'][xs, ys].tolist(), layers['order'][xs, ys].tolist()):
+        tiles.append((order, str(x) + ';' + str(y), {'type': names[tile_type - 1], 'variant': variant, 'pos': [x, y]}))
+    tiles.sort(key=lambda tile: tile[0])
+    return tiles
+
+def decode_map(data):
+    '''
+    unpacks a binary map into the same dict json.load gives for the json version
+    (bytes or memoryview) -> (map data)
+    '''
+    layers = decode_layers(data)
+    return {'tilemap': {loc: tile for order, loc, tile in layer_tiles(layers)}, 'tile_size': layers['tile_size'], 'offgrid': layers['offgrid']}
+
+def read_map(path):
+    '''
+    reads a map in either format with one read
+    (path) -> (map data)
+    '''
+    f = open(path, 'rb')
+    data = f.read()
+    f.close()
+    if is_binary(data):
+        return decode_map(data)
+    return json.loads(data)
+
+def write_map(path, map_data):
+    '''
+    writes a map, binary if the path ends in .gqmap and json otherwise
+    (path, map data)
+    '''
+    if path.endswith(BINARY_EXT):
+        f = open(path, 'wb')
+        f.write(encode_map(map_data))
+    else:
+        f = open(path, 'w')
+        json.dump(map_data, f)
+    f.close()
+
+def convert(path):
+    '''
+    converts a map to the other format next to it, x.json <-> x.gqmap, and checks nothing was lost on the way
+    (path) -> (path written)
+    '''
+    root, ext = os.path.splitext(path)
+    out = root + ('.json' if ext == BINARY_EXT else BINARY_EXT)
+    map_data = read_map(path)
+    write_map(out, map_data)
+    if read_map(out) != map_data:
+        raise ValueError(f"{path} didn't convert losslessly")
+    return out
+
+
+if __name__ == '__main__':
+    # python -m scripts.mapformat converts every json map in data/maps, or pass the maps to convert either way
+    paths = sys.argv[1:] or sorted(glob.glob('data/maps/*.json'))
+    for path in paths:
+        print(f"{path} -> {convert(path)}")
@@ -0,0 +1,229 @@
+import os
+import sys
+import json
+
+import numpy as np
+
+from scripts.mapformat import BINARY_EXT, read_map, write_map
+
+STREAM_CHUNK = 16 # tiles per side of a chunk on disk
+LOAD_MARGIN = 1 # chunks past the edge of the screen that get loaded
+EVICT_MARGIN = 2 # chunks further than this past the edge of the screen get written out and dropped
+META_NAME = 'meta.json'
+
+def chunk_of(pos, chunk_px):
+    '''
+    (pixel position, chunk size in pixels) -> (chunk x, chunk y)
+    '''
+    return (int(pos[0] // chunk_px), int(pos[1] // chunk_px))
+
+def chunk_path(path, chunk):
+    return os.path.join(path, str(chunk[0]) + '_' + str(chunk[1]) + BINARY_EXT)
+
+def group_chunks(map_data, chunk_px):
+    '''
+    splits a map's tiles up by the chunk they're in, a tile belongs to the chunk it's top left corner is in
+    (map data, chunk size in pixels) -> ({chunk: map data of just that chunk})
+    '''
+    chunks = {}
+    def chunk_data(chunk):
+        if chunk not in chunks:
+            chunks[chunk] = {'tilemap': {}, 'tile_size': map_data['tile_size'], 'offgrid': []}
+        return chunks[chunk]
+    for loc, tile in map_data['tilemap'].items():
+        chunk_data(chunk_of((tile['pos'][0] * map_data['tile_size'], tile['pos'][1] * map_data['tile_size']), chunk_px))['tilemap'][loc] = tile
+    for tile in map_data['offgrid']:
+        chunk_data(chunk_of(tile['pos'], chunk_px))['offgrid'].append(tile)
+    return chunks
+
+def split_map(src, path, chunk_size=STREAM_CHUNK):
+    '''
+    turns a map file into a folder of chunk files the editor can stream
+    (map file, folder to write, tiles per side of a chunk) -> (number of chunks written)
+    '''
+    map_data = read_map(src)
+    os.makedirs(path, exist_ok=True)
+    f = open(os.path.join(path, META_NAME), 'w')
+    json.dump({'tile_size': map_data['tile_size'], 'chunk_size': chunk_size}, f)
+    f.close()
+    chunks = group_chunks(map_data, chunk_size * map_data['tile_size'])
+    for chunk, chunk_data in chunks.items():
+        write_map(chunk_path(path, chunk), chunk_data)
+    return len(chunks)
+
+def join_map(path, dst):
+    '''
+    puts a chunk folder back together into one map file the game can load, tiles come out chunk by chunk
+    (chunk folder, map file to write, .json or .gqmap) -> (number of chunks read)
+    '''
+    f = open(os.path.join(path, META_NAME))
+    meta = json.load(f)
+    f.close()
+    map_data = {'tilemap': {}, 'tile_size': meta['tile_size'], 'offgrid': []}
+    names = sorted(name for name in os.listdir(path) if name.endswith(BINARY_EXT))
+    for name in names:
+        chunk_data = read_map(os.path.join(path, name))
+        map_data['tilemap'].update(chunk_data['tilemap'])
+        map_data['offgrid'] += chunk_data['offgrid']
+    write_map(dst, map_data)
+    return len(names)
+
+
+class ChunkStore:
+    def __init__(self, tilemap, path):
+        '''
+        streams a map split into chunk files in and out of a tilemap, only the chunks around the camera are ever in memory
+        chunks going out of range are written back if they were edited, save() writes the edited chunks that are still loaded
+        (tilemap to stream into, it should start empty, chunk folder made by split_map)
+        '''
+        self.tilemap = tilemap
+        self.path = path
+        f = open(os.path.join(path, META_NAME))
+        meta = json.load(f)
+        f.close()
+        self.tilemap.tile_size = meta['tile_size']
+        self.chunk_size = meta['chunk_size']
+        self.chunk_px = self.chunk_size * self.tilemap.tile_size
+        # which chunks have a file, so scrolling over empty space never touches the disk
+        self.on_disk = set()
+        for name in os.listdir(path):
+            if name.endswith(BINARY_EXT):
+                cx, cy = name[:-len(BINARY_EXT)].split('_')
+                self.on_disk.add((int(cx), int(cy)))
+        self.resident = set() # chunks in the tilemap, empty ones too so tiles can be placed in them
+        self.dirty = set() # resident chunks edited since they were loaded or saved
+        self.loads = 0
+        self.evictions = 0
+        self.tilemap.on_edit = self.edited
+
+    def edited(self, pos):
+        '''
+        called by the tilemap whenever a tile is placed, removed or changes variant
+        (pixel position of the tile)
+        '''
+        self.dirty.add(chunk_of(pos, self.chunk_px))
+
+    def chunks_around(self, scroll, size, margin):
+        '''
+        every chunk on screen plus margin chunks on each side
+        (camera scroll, screen size, margin in chunks) -> (set of chunks)
+        '''
+        return {(cx, cy)
+                for cx in range(int(scroll[0]) // self.chunk_px - margin, (int(scroll[0]) + size[0]) // self.chunk_px + margin + 1)
+                for cy in range(int(scroll[1]) // self.chunk_px - margin, (int(scroll[1]) + size[1]) // self.chunk_px + margin + 1)}
+
+    def update(self, scroll, size):
+        '''
+        loads the chunks that came close to the screen and drops the ones that got far away, call it once a frame
+        there's a gap between the load and evict margins so scrolling back and forth over a chunk edge doesn't keep reloading it
+        (camera scroll, screen size)
+        '''
+        keep = self.chunks_around(scroll, size, EVICT_MARGIN)
+        far = self.resident - keep
+        if far:
+            self.evict(far)
+        near = self.chunks_around(scroll, size, LOAD_MARGIN) - self.resident
+        if near:
+            self.load(near)
+
+    def load(self, chunks):
+        '''
+        reads chunks into the tilemap, all in one batch
+        (set of chunks)
+        '''
+        tiles = []
+        offgrid = []
+        for chunk in chunks:
+            if chunk in self.on_disk:
+                chunk_data = read_map(chunk_path(self.path, chunk))
+                tiles += chunk_data['tilemap'].values()
+                offgrid += chunk_data['offgrid']
+                self.loads += 1
+        self.resident |= chunks
+        if tiles or offgrid:
+            self.tilemap.add_tiles(tiles, offgrid)
+
+    def resident_tiles(self, chunks):
+        '''
+        the loaded tiles of some chunks, grouped by chunk
+        (set of chunks) -> ({chunk: ({"x;y": tile}, [offgrid tiles])})
+        '''
+        found = {chunk: ({}, []) for chunk in chunks}
+        ts = self.tilemap.tile_size
+        for loc, tile in self.tilemap.tilemap.items():
+            chunk = chunk_of((tile['pos'][0] * ts, tile['pos'][1] * ts), self.chunk_px)
+            if chunk in found:
+                found[chunk][0][loc] = tile
+        for tile in self.tilemap.offgrid_tiles:
+            chunk = chunk_of(tile['pos'], self.chunk_px)
+            if chunk in found:
+                found[chunk][1].append(tile)
+        return found
+
+    def write(self, chunks):
+        '''
+        writes chunks to disk, chunks with nothing left in them have their file deleted
+        (dict from resident_tiles)
+        '''
+        for chunk, (tiles, offgrid) in chunks.items():
+            if tiles or offgrid:
+                write_map(chunk_path(self.path, chunk), {'tilemap': tiles, 'tile_size': self.tilemap.tile_size, 'offgrid': offgrid})
+                self.on_disk.add(chunk)
+            elif chunk in self.on_disk:
+                os.remove(chunk_path(self.path, chunk))
+                self.on_disk.discard(chunk)
+            self.dirty.discard(chunk)
+
+    def evict(self, chunks):
+        '''
+        writes out the edited ones and takes the chunks out of the tilemap
+        (set of chunks)
+        '''
+        found = self.resident_tiles(chunks)
+        self.write({chunk: found[chunk] for chunk in chunks & self.dirty})
+        locs = [loc for tiles, offgrid in found.values() for loc in tiles]
+        offgrid = [tile for tiles, offgrid in found.values() for tile in offgrid]
+        self.resident -= chunks
+        self.evictions += len(chunks)
+        if locs or offgrid:
+            self.tilemap.remove_tiles(locs, offgrid)
+
+    def settled(self):
+        '''
+        which cells of the tilemap's grid have all 8 neighbors in loaded chunks, the rest are next to tiles that aren't in memory
+        a pass over the whole map (autotile) can only trust the neighbors of these, the others would see missing tiles as empty
+        () -> (bool array shaped like the tilemap's grid)
+        '''
+        w, h = self.tilemap.grid_size
+        # chunk of every tile column and row, one past the grid on each side
+        cxs = np.floor_divide(np.arange(-1, w + 1) + self.tilemap.grid_origin[0], self.chunk_size)
+        cys = np.floor_divide(np.arange(-1, h + 1) + self.tilemap.grid_origin[1], self.chunk_size)
+        chunk_xs, column = np.unique(cxs, return_inverse=True)
+        chunk_ys, row = np.unique(cys, return_inverse=True)
+        resident = np.array([[(cx, cy) in self.resident for cy in chunk_ys.tolist()] for cx in chunk_xs.tolist()], dtype=bool).reshape(len(chunk_xs), len(chunk_ys))
+        loaded = resident[column[:, None], row[None, :]] # (w + 2, h + 2), the tile is in a loaded chunk
+        settled = np.ones((w, h), dtype=bool)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                settled &= loaded[1 + dx:1 + dx + w, 1 + dy:1 + dy + h]
+        return settled
+
+    def save(self):
+        '''
+        writes every loaded chunk that was edited, nothing else is touched
+        () -> (number of chunks written)
+        '''
+        dirty = self.dirty & self.resident
+        self.write(self.resident_tiles(dirty))
+        return len(dirty)
+
+
+if __name__ == '__main__':
+    # python -m scripts.mapstore split map.json map_chunks, or join map_chunks map.json to make a map the game can load again
+    if len(sys.argv) != 4 or sys.argv[1] not in ('split', 'join'):
+        print('usage: python -m scripts.mapstore split MAP FOLDER | join FOLDER MAP')
+        sys.exit(1)
+    if sys.argv[1] == 'split':
+        print(f"wrote {split_map(sys.argv[2], sys.argv[3])} chunks to {sys.argv[3]}")
+    else:
+        print(f"joined {join_map(sys.argv[2], sys.argv[3])} chunks into {sys.argv[3]}")
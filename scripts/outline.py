@@ -0,0 +1,114 @@
+import numpy as np
+import pygame
+
+OUTLINE_OFFSETS = [(0, 0), (-1, 0), (1, 0), (0, -1), (0, 1)] # the silhouette gets drawn at each of these, the base plus 4 around it
+OUTLINE_ALPHA = 180 # 180 opaque, 0 transparent
+
+class OutlineCompositor:
+    def __init__(self, check=False):
+        '''
+        draws the see through outlines around everything on a display layer
+        instead of blitting a silhouette 5 times we count how many of the 5 silhouettes cover each pixel
+        and look up what those blends would have produced, only pixels that changed since the static layer was cached get touched
+        (check: bool, also draws the old way every frame and counts frames that don't match pixel for pixel)
+        '''
+        self.check = check
+        self.mismatches = 0 # frames where the old and new outlines were different, only counted when check is on
+        self.luts = {} # outline color -> lookup table of blended channel values
+        self.static_key = None
+        self.static_count = None
+        self.base = None # the background with the static layer's outline already on it
+
+    def lut(self, color):
+        '''
+        lookup table for an outline color, lut[k, value, channel] is the channel value after the silhouette is blended over it k times
+        pygame does the blending for us so the table matches a real blit exactly
+        (color: (r, g, b)) -> (numpy array (len(OUTLINE_OFFSETS) + 1, 256, 3))
+        '''
+        color = tuple(color)
+        if color not in self.luts:
+            ramp = np.repeat(np.arange(256, dtype=np.uint8)[:, None, None], 3, axis=2) # every channel value, 256 x 1 pixels
+            dest = pygame.surfarray.make_surface(ramp)
+            silhouette = pygame.Surface(dest.get_size(), pygame.SRCALPHA)
+            silhouette.fill(color + (OUTLINE_ALPHA,))
+            lut = np.zeros((len(OUTLINE_OFFSETS) + 1, 256, 3), dtype=np.uint8)
+            lut[0] = ramp[:, 0]
+            for k in range(1, len(lut)):
+                dest.blit(silhouette, (0, 0))
+                lut[k] = pygame.surfarray.array3d(dest)[:, 0]
+            self.luts[color] = lut
+        return self.luts[color]
+
+    def count(self, surf):
+        '''
+        how many of the offset silhouettes of a layer cover each pixel
+        (layer surface) -> (numpy array, indexed [x, y])
+        '''
+        alpha = pygame.surfarray.pixels_alpha(surf)
+        mask = (alpha > 127).astype(np.uint8) # same threshold as pygame.mask.from_surface
+        del alpha # unlocks the surface
+        count = np.zeros_like(mask)
+        w, h = mask.shape
+        for offset in OUTLINE_OFFSETS:
+            # a silhouette blitted at offset covers pixel p when the mask is set at p - offset
+            dx, dy = offset
+            count[max(dx, 0):w + min(dx, 0), max(dy, 0):h + min(dy, 0)] += mask[max(-dx, 0):w - max(dx, 0), max(-dy, 0):h - max(dy, 0)]
+        return count
+
+    def composite(self, dest, layers, static=None):
+        '''
+        draws the outline of every layer onto dest, dest should only have the background on it
+        (dest surface, layers: list of (layer surface, outline color) in draw order,
+         static: (index into layers, surface with only the part of that layer that doesn't move, key that changes when it does) or None)
+        '''
+        if self.check:
+            expected = dest.copy()
+            self.legacy(expected, layers)
+
+        counts = [self.count(layer) for layer, color in layers]
+        if static:
+            index, static_surf, key = static
+            if key != self.static_key: # static layer changed, bake it into the base again
+                self.static_key = key
+                self.static_count = self.count(static_surf)
+                self.base = dest.copy()
+                base = pygame.surfarray.pixels3d(self.base)
+                xs, ys = np.nonzero(self.static_count)
+                base[xs, ys] = self.lut(layers[index][1])[self.static_count[xs, ys][:, None], base[xs, ys], np.arange(3)]
+                del base
+            dynamic = counts[index] != self.static_count
+            for i, count in enumerate(counts):
+                if i != index:
+                    dynamic |= count > 0
+        else:
+            dynamic = np.zeros(counts[0].shape, dtype=bool)
+            for count in counts:
+                dynamic |= count > 0
+
+        xs, ys = np.nonzero(dynamic)
+        pixels = pygame.surfarray.pixels3d(dest)
+        rgb = pixels[xs, ys] # what the background looks like under the pixels we have to blend
+        del pixels
+        if static:
+            dest.blit(self.base, (0, 0))
+
+        channels = np.arange(3)
+        for (layer, color), count in zip(layers, counts):
+            rgb = self.lut(color)[count[xs, ys][:, None], rgb, channels]
+        pixels = pygame.surfarray.pixels3d(dest)
+        pixels[xs, ys] = rgb
+        del pixels
+
+        if self.check and pygame.image.tobytes(dest, 'RGB') != pygame.image.tobytes(expected, 'RGB'):
+            self.mismatches += 1
+
+    def legacy(self, dest, layers):
+        '''
+        the old way, builds a mask for each layer and blits the silhouette at every offset
+        (dest surface, layers: list of (layer surface, outline color) in draw order)
+        '''
+        for layer, color in layers:
+            display_mask = pygame.mask.from_surface(layer)
+            display_sillhouette = display_mask.to_surface(setcolor=tuple(color) + (OUTLINE_ALPHA,), unsetcolor=(0, 0, 0, 0))
+            for offset in OUTLINE_OFFSETS:
+                dest.blit(display_sillhouette, offset) # putting what we drew onframe back into display
@@ -1,36 +1,110 @@
-class Particle:
-    def __init__(self, game, p_type, pos, velocity=[0, 0], frame=0):
+import numpy as np
+
+SWAY_TYPES = {'leaf'} # particles that drift back and forth as they fall
+
+class ParticleSystem:
+    def __init__(self, animations, capacity=256):
         '''
-        instantiates a partcle
-        (game, particle type, position: tuple, velocity=list, frame tp start on)
+        holds every particle in the game, all particles share contiguous arrays so we update them in one go
+        (animations: dict of particle type -> Animation, capacity: starting size, grows when full)
         '''
-        self.game = game
-        self.type = p_type
-        self.pos = list(pos)
-        self.velocity = list(velocity) # making a copy
-        self.animation = self.game.assets['particle/' + p_type].copy() # get a copy of animation 
-        self.frame = frame
+        self.types = list(animations)
+        self.type_ids = {p_type: i for i, p_type in enumerate(self.types)}
+        self.images = [animations[p_type].images for p_type in self.types]
+        self.img_duration = np.array([animations[p_type].img_duration for p_type in self.types])
+        self.last_frame = np.array([animations[p_type].img_duration * len(animations[p_type].images) - 1 for p_type in self.types]) # particles dont loop, they stop on the last frame
+        self.sway = np.array([p_type in SWAY_TYPES for p_type in self.types])
+        # half the size of every image, so we can center particles without looking at the surfaces
+        self.half_sizes = [np.array([(img.get_width() // 2, img.get_height() // 2) for img in images]) for images in self.images]
 
-    
-    def update(self):
+        self.count = 0 # particles alive, always packed into [0, count)
+        self.pos = np.zeros((capacity, 2))
+        self.velocity = np.zeros((capacity, 2))
+        self.frame = np.zeros(capacity, dtype=np.int32)
+        self.type = np.zeros(capacity, dtype=np.int32)
+        self.done = np.zeros(capacity, dtype=bool)
+
+    def __len__(self):
+        return self.count
+
+    def _grow(self):
         '''
-        updates particle affect, returns true once animation is finished playing
-        -> bool
+        doubles the size of every array
         '''
-        kill = False
-        if self.animation.done:
-            kill = True
-        self.pos[0] += self.velocity[0]
-        self.pos[1] += self.velocity[1]
+        capacity = len(self.pos) * 2
+        for name in ('pos', 'velocity', 'frame', 'type', 'done'):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
 
-        self.animation.update()
+    def add(self, p_type, pos, velocity=(0, 0), frame=0):
+        '''
+        spawns a particle, it's animation starts on frame 0 like Particle's always did, frame is taken and ignored the same way
+        (particle type, position: tuple, velocity, frame)
+        '''
+        if self.count == len(self.pos):
+            self._grow()
+        i = self.count
+        self.count += 1
+        type_id = self.type_ids[p_type]
+        self.pos[i] = pos
+        self.velocity[i] = velocity
+        self.frame[i] = 0
+        self.type[i] = type_id
+        self.done[i] = False
 
-        return kill
-    
-    def render(self, surf, offset=(0,0)):
-        img = self.animation.img()
-        surf.blit(img, (self.pos[0] - offset[0] - img.get_width() // 2, self.pos[1] - offset[1] - img.get_height() // 2))
+    def clear(self):
+        '''
+        removes every particle
+        '''
+        self.count = 0
 
+    def update(self):
+        '''
+        moves and animates every particle, particles whose animation finished last frame are removed
+        '''
+        n = self.count
+        if not n:
+            return
+        kill = self.done[:n].copy()
+        types = self.type[:n]
+        frame = self.frame[:n]
+        pos = self.pos[:n]
 
+        pos += self.velocity[:n]
+        np.minimum(frame + 1, self.last_frame[types], out=frame) # dont want it to go past the end of the animation
+        self.done[:n] = frame >= self.last_frame[types]
 
+        sway = self.sway[types]
+        if sway.any(): # making the particle move back and forth smoothly
+            pos[sway, 0] += np.sin(frame[sway] * 0.035) * 0.3
 
+        if kill.any(): # compact the survivors to the front of the arrays
+            alive = ~kill
+            alive_count = int(np.count_nonzero(alive))
+            for name in ('pos', 'velocity', 'frame', 'type', 'done'):
+                arr = getattr(self, name)
+                arr[:alive_count] = arr[:n][alive]
+            self.count = alive_count
+
+    def render(self, surf, offset=(0, 0)):
+        '''
+        renders every particle with a single blits call
+        (surface, camera offset)
+        '''
+        n = self.count
+        if not n:
+            return
+        types = self.type[:n]
+        img_index = self.frame[:n] // self.img_duration[types]
+        pos = self.pos[:n] - offset
+        blits = []
+        for type_id, images in enumerate(self.images):
+            mask = types == type_id
+            if not mask.any():
+                continue
+            indices = img_index[mask]
+            corners = pos[mask] - self.half_sizes[type_id][indices] # centers the image on the particle
+            blits.extend(zip([images[i] for i in indices.tolist()], map(tuple, corners.tolist())))
+        surf.blits(blits, doreturn=False)
@@ -0,0 +1,144 @@
+import math
+import numpy as np
+
+from scripts.projectile import ProjectileSystem
+
+ANGLE_STEPS = 1024 # a full circle, angles are whole steps so they wrap with a mask and index straight into the tables
+ANGLE_MASK = ANGLE_STEPS - 1
+COS = np.cos(np.arange(ANGLE_STEPS) * (2 * math.pi / ANGLE_STEPS))
+SIN = np.sin(np.arange(ANGLE_STEPS) * (2 * math.pi / ANGLE_STEPS))
+
+def angle_steps(degrees):
+    '''
+    turns degrees into table steps
+    (degrees) -> (int)
+    '''
+    return int(round(degrees * ANGLE_STEPS / 360))
+
+
+class Ring:
+    def __init__(self, count, speed, lifetime, turn=0, spin=0):
+        '''
+        count bullets spread evenly around a circle flying straight out
+        every bullet's position is worked out from it's age, nothing gets stepped forward frame by frame so a pattern always plays out the same
+        (count, speed: pixels per frame, lifetime: frames, turn: degrees the ring is rotated per game tick, spin: degrees a bullet turns per frame of age)
+        '''
+        self.count = count
+        self.lifetime = lifetime
+        self.turn = angle_steps(turn)
+        self.spin = angle_steps(spin)
+        self.follow = False # True when bullets stay centered on the shooter instead of where they were fired from
+        self.distance = speed * np.arange(lifetime + 1, dtype=np.float64) # how far from the center a bullet is at every age
+
+    def angles(self, tick, origin, target):
+        '''
+        starting angle of every bullet in a volley
+        (game tick, origin, target position) -> (int array of angle steps)
+        '''
+        return (tick * self.turn + np.arange(self.count) * ANGLE_STEPS // self.count) & ANGLE_MASK
+
+
+class Spiral(Ring):
+    def __init__(self, arms, speed, lifetime, turn=7, spin=0):
+        '''
+        a ring that turns a bit every tick, firing it often makes spiral arms
+        (arms, speed, lifetime, turn: degrees per tick, spin: degrees per frame of age)
+        '''
+        super().__init__(arms, speed, lifetime, turn=turn, spin=spin)
+
+
+class Orbit(Ring):
+    def __init__(self, count, radius, growth, lifetime, turn=0, spin=0):
+        '''
+        a ring that follows the shooter and grows out to a radius instead of flying off
+        (count, radius: how far out it settles, growth: how fast it gets there, lifetime, turn, spin)
+        '''
+        super().__init__(count, 0, lifetime, turn=turn, spin=spin)
+        self.follow = True
+        self.distance = radius * (1 - np.exp(-growth * np.arange(lifetime + 1, dtype=np.float64)))
+
+
+class Aimed(Ring):
+    def __init__(self, count, spread, speed, lifetime):
+        '''
+        a fan of bullets pointed at the target when it's fired
+        (count, spread: degrees between the outside bullets, speed, lifetime)
+        '''
+        super().__init__(count, speed, lifetime)
+        self.spread = spread
+
+    def angles(self, tick, origin, target):
+        aim = math.degrees(math.atan2(target[1] - origin[1], target[0] - origin[0]))
+        offsets = np.linspace(-self.spread / 2, self.spread / 2, self.count) if self.count > 1 else np.zeros(1)
+        return np.round((aim + offsets) * ANGLE_STEPS / 360).astype(np.int32) & ANGLE_MASK
+
+
+class PatternSystem(ProjectileSystem):
+    columns = ProjectileSystem.columns + ('origin', 'angle', 'pattern')
+
+    def __init__(self, capacity=256):
+        '''
+        bullets fired by patterns, positions are evaluated from the pattern's tables every frame instead of integrated
+        (capacity: starting size, grows when full)
+        '''
+        super().__init__(capacity)
+        self.origin = np.zeros((capacity, 2))
+        self.angle = np.zeros(capacity, dtype=np.int32) # starting angle in table steps
+        self.pattern = np.zeros(capacity, dtype=np.int32) # index into self.patterns
+        self.patterns = []
+        self.pattern_ids = {}
+        self.lifetimes = np.zeros(0, dtype=np.int32)
+
+    def pattern_id(self, pattern):
+        '''
+        registers a pattern the first time it's fired
+        (pattern) -> (id)
+        '''
+        if id(pattern) not in self.pattern_ids:
+            self.pattern_ids[id(pattern)] = len(self.patterns)
+            self.patterns.append(pattern)
+            self.lifetimes = np.array([p.lifetime for p in self.patterns], dtype=np.int32)
+        return self.pattern_ids[id(pattern)]
+
+    def emit(self, pattern, tick, origin, target=(0, 0)):
+        '''
+        fires one volley of a pattern
+        (pattern, game tick, origin: where it's fired from, target: what aimed patterns point at)
+        '''
+        angles = pattern.angles(tick, origin, target)
+        new = self.reserve(len(angles))
+        self.pos[new] = origin
+        self.origin[new] = origin
+        self.velocity[new] = 0
+        self.timer[new] = 0
+        self.angle[new] = angles
+        self.pattern[new] = self.pattern_id(pattern)
+
+    def update(self, center):
+        '''
+        ages every bullet a frame and puts it where it's pattern says it should be at that age
+        (center: where the shooter is now, follow patterns are centered on it)
+        '''
+        n = self.count
+        if not n:
+            return
+        self.timer[:n] += 1
+        for pattern_id, pattern in enumerate(self.patterns):
+            index = np.nonzero(self.pattern[:n] == pattern_id)[0]
+            if not len(index):
+                continue
+            age = np.minimum(self.timer[index], pattern.lifetime)
+            angle = (self.angle[index] + age * pattern.spin) & ANGLE_MASK
+            direction = np.stack((COS[angle], SIN[angle]), axis=1)
+            anchor = np.asarray(center, dtype=np.float64) if pattern.follow else self.origin[index]
+            pos = anchor + pattern.distance[age][:, None] * direction
+            self.velocity[index] = pos - self.pos[index] # so anything that looks at velocity still sees which way it moved
+            self.pos[index] = pos
+
+    def expired(self):
+        '''
+        which bullets are older than their pattern's lifetime
+        () -> (bool array)
+        '''
+        n = self.count
+        return self.timer[:n] > self.lifetimes[self.pattern[:n]]
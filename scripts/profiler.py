@@ -0,0 +1,135 @@
+import json
+from collections import deque
+from time import perf_counter
+
+import numpy as np
+import pygame
+
+class Scope:
+    __slots__ = ('profiler', 'name')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler.begin(self.name)
+
+    def __exit__(self, *exc):
+        self.profiler.end()
+
+
+class FrameProfiler:
+    def __init__(self, history=240, trace_limit=200000):
+        '''
+        times named phases of every frame, keeps the last few hundred of each for percentiles and can write a chrome trace
+        phases nest, begin('enemies') inside begin('step') shows up under it in the trace and indented in the overlay
+        all it does per phase is two perf_counter calls and a couple appends, so it's fine to leave on
+        (history: frames kept for percentiles, trace_limit: most events kept for the trace, older ones get dropped)
+        '''
+        self.history = history
+        self.times = {} # phase name -> deque of the last durations in ms, in the order phases were first seen
+        self.depth = {} # phase name -> how deep it was nested when first seen
+        self.counts = {} # counter name -> latest value
+        self.stack = []
+        self.scopes = {}
+        self.events = deque(maxlen=trace_limit) # ('X', phase name, start, duration) or ('C', counter name, time, value) for the trace
+        self.origin = perf_counter()
+        self.frames = 0
+
+        self.overlay = False
+        self.overlay_surf = None
+        self.overlay_every = 15 # frames between redrawing the overlay text, percentiles don't change fast anyway
+        self.font = None
+
+    def begin(self, name):
+        '''
+        starts timing a phase, has to be closed with end()
+        (phase name)
+        '''
+        self.stack.append((name, perf_counter()))
+
+    def end(self):
+        '''
+        stops the last phase that was started
+        '''
+        end = perf_counter()
+        name, start = self.stack.pop()
+        if name not in self.times:
+            self.times[name] = deque(maxlen=self.history)
+            self.depth[name] = len(self.stack)
+        self.times[name].append((end - start) * 1000)
+        self.events.append(('X', name, start, end - start))
+
+    def scope(self, name):
+        '''
+        begin and end as a with block
+        (phase name) -> (context manager)
+        '''
+        if name not in self.scopes:
+            self.scopes[name] = Scope(self, name)
+        return self.scopes[name]
+
+    def count(self, name, value):
+        '''
+        records how many of something there are this frame, like particles alive
+        (counter name, value)
+        '''
+        self.counts[name] = value
+        self.events.append(('C', name, perf_counter(), value))
+
+    def end_frame(self):
+        self.frames += 1
+
+    def percentiles(self, name, points=(50, 95, 99)):
+        '''
+        (phase name, percentiles to work out) -> (tuple of ms)
+        '''
+        return tuple(np.percentile(np.fromiter(self.times[name], dtype=np.float64), points).tolist())
+
+    def report(self):
+        '''
+        one line per phase with it's p50/p95/p99 and the latest counts
+        () -> (str)
+        '''
+        lines = [f"{'phase':<24}{'p50':>8}{'p95':>8}{'p99':>8}  ms"]
+        for name in self.times:
+            p50, p95, p99 = self.percentiles(name)
+            lines.append(f"{'  ' * self.depth[name] + name:<24}{p50:8.3f}{p95:8.3f}{p99:8.3f}")
+        if self.counts:
+            lines.append('  '.join(f"{name} {value}" for name, value in self.counts.items()))
+        return '\n'.join(lines)
+
+    def export_trace(self, path):
+        '''
+        writes the recorded events as chrome trace event json, open it in chrome://tracing or ui.perfetto.dev
+        (path)
+        '''
+        trace = []
+        for kind, name, start, value in self.events: # counters can share a name with a phase, so the kind was kept when recording
+            if kind == 'X':
+                trace.append({'name': name, 'ph': 'X', 'pid': 1, 'tid': 1, 'ts': (start - self.origin) * 1e6, 'dur': value * 1e6})
+            else:
+                trace.append({'name': name, 'ph': 'C', 'pid': 1, 'tid': 1, 'ts': (start - self.origin) * 1e6, 'args': {name: value}})
+        f = open(path, 'w')
+        json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+        f.close()
+
+    def render(self, surf):
+        '''
+        draws the overlay in the top left if it's on, the text is only redrawn every overlay_every frames
+        (surface)
+        '''
+        if not self.overlay or not self.times:
+            return
+        if self.overlay_surf is None or self.frames % self.overlay_every == 0:
+            if self.font is None:
+                self.font = pygame.font.Font(None, 12)
+            lines = [f"{'  ' * self.depth[name] + name} {p50:.2f} {p95:.2f} {p99:.2f}" for name in self.times for p50, p95, p99 in [self.percentiles(name)]]
+            lines.append(' '.join(f"{name}:{value}" for name, value in self.counts.items()))
+            texts = [self.font.render(line, False, (255, 255, 255)) for line in lines]
+            self.overlay_surf = pygame.Surface((max(text.get_width() for text in texts) + 4, len(texts) * 9 + 4), pygame.SRCALPHA)
+            self.overlay_surf.fill((0, 0, 0, 160))
+            for i, text in enumerate(texts):
+                self.overlay_surf.blit(text, (2, 2 + i * 9))
+        surf.blit(self.overlay_surf, (0, 0))
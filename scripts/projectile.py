@@ -0,0 +1,108 @@
+import numpy as np
+
+class ProjectileSystem:
+    columns = ('pos', 'velocity', 'timer') # every per projectile array, subclasses add their own
+
+    def __init__(self, capacity=64):
+        '''
+        holds a group of projectiles (arrows, magic) in arrays, moving, aging and removing them happens for all of them at once
+        (capacity: starting size, grows when full)
+        '''
+        self.count = 0 # projectiles alive, always packed into [0, count)
+        self.pos = np.zeros((capacity, 2))
+        self.velocity = np.zeros((capacity, 2))
+        self.timer = np.zeros(capacity, dtype=np.int32) # frames the projectile has been alive
+
+    def __len__(self):
+        return self.count
+
+    def _grow(self):
+        '''
+        doubles the size of every array
+        '''
+        capacity = len(self.pos) * 2
+        for name in self.columns:
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def reserve(self, n):
+        '''
+        makes room for n more projectiles and counts them as alive
+        (n) -> (slice of the new projectiles, caller fills them in)
+        '''
+        while self.count + n > len(self.pos):
+            self._grow()
+        start = self.count
+        self.count += n
+        return slice(start, self.count)
+
+    def add(self, pos, velocity, timer=0):
+        '''
+        spawns a projectile
+        (position, velocity [x, y], timer to start at)
+        '''
+        i = self.reserve(1).start
+        self.pos[i] = pos
+        self.velocity[i] = velocity
+        self.timer[i] = timer
+
+    def clear(self):
+        '''
+        removes every projectile
+        '''
+        self.count = 0
+
+    def advance(self):
+        '''
+        moves every projectile by it's velocity and ages it by a frame
+        '''
+        n = self.count
+        self.pos[:n] += self.velocity[:n]
+        self.timer[:n] += 1
+
+    def inside(self, rect):
+        '''
+        which projectiles are inside a rect, same as rect.collidepoint for each one
+        (rect) -> (bool array)
+        '''
+        pos = self.pos[:self.count].astype(np.int64) # collidepoint drops the decimals too
+        return (pos[:, 0] >= rect.left) & (pos[:, 0] < rect.right) & (pos[:, 1] >= rect.top) & (pos[:, 1] < rect.bottom)
+
+    def remove(self, mask):
+        '''
+        removes every projectile where mask is True, survivors get packed to the front in the same order
+        (bool array of length len(self))
+        '''
+        if not mask.any():
+            return
+        n = self.count
+        alive = ~mask
+        alive_count = int(np.count_nonzero(alive))
+        for name in self.columns:
+            arr = getattr(self, name)
+            arr[:alive_count] = arr[:n][alive]
+        self.count = alive_count
+
+    def render(self, surf, img, offset=(0, 0)):
+        '''
+        renders every projectile centered on it's position with one blits call
+        (surface, image, camera offset)
+        '''
+        corners = self.pos[:self.count] - (img.get_width() / 2 + offset[0], img.get_height() / 2 + offset[1])
+        surf.blits([(img, corner) for corner in map(tuple, corners.tolist())], doreturn=False)
+
+    def render_atlas(self, surf, atlas, index, offset=(0, 0)):
+        '''
+        renders every projectile from the sprite atlas, flipped when it's moving left
+        (surface, SpriteAtlas, sprite index, camera offset)
+        '''
+        w, h = atlas.size(index)
+        corners = self.pos[:self.count] - (w / 2 + offset[0], h / 2 + offset[1])
+        sources = [atlas.source(index, flip) for flip in (False, True)]
+        blits = []
+        for corner, flip in zip(map(tuple, corners.tolist()), (self.velocity[:self.count, 0] <= 0).tolist()):
+            atlas_surf, area = sources[flip]
+            blits.append((atlas_surf, corner, area))
+        surf.blits(blits, doreturn=False)
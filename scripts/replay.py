@@ -0,0 +1,125 @@
+import struct
+import hashlib
+
+import numpy as np
+
+MAGIC = b'GQIN'
+VERSION = 1
+HEADER = struct.Struct('<4sHBQI') # magic, version, flags, seed, level the game started on
+FOOTER_MAGIC = b'GQEN'
+FOOTER = struct.Struct('<4sI32s') # magic, ticks recorded, fingerprint of the game after the last tick
+FLAG_SWARM = 1
+FLAG_BOSS_PHASES = 2
+DASH_KEYS = ['I', 'J', 'K', 'L'] # up, left, down, right
+
+def encode_inputs(inputs):
+    '''
+    packs one tick of inputs into a byte, bits 0-3 are movement [left, right, up, down], bits 4-6 the dash key (0 none, 1-4 DASH_KEYS)
+    only the last dash key of a tick is kept, Player.dash only cares about the last direction anyway
+    (inputs: dict from handle_events) -> (int 0-255)
+    '''
+    byte = 0
+    for i, held in enumerate(inputs['movement']):
+        if held:
+            byte |= 1 << i
+    if inputs['dash']:
+        byte |= (DASH_KEYS.index(inputs['dash'][-1]) + 1) << 4
+    return byte
+
+def decode_inputs(byte):
+    '''
+    (int 0-255) -> (inputs: dict like handle_events returns)
+    '''
+    dash = byte >> 4 & 7
+    return {'movement': [bool(byte >> i & 1) for i in range(4)], 'dash': [DASH_KEYS[dash - 1]] if dash else []}
+
+def fingerprint(game):
+    '''
+    hash of everything the simulation keeps, two games with the same fingerprint are in the same state
+    (game) -> (32 bytes)
+    '''
+    digest = hashlib.sha256()
+    digest.update(repr((game.tick, game.level, game.dead, game.cooldown, game.screenshake, game.transition, list(game.player.pos), game.player.dashing)).encode())
+    digest.update(repr(game.rng.getstate()).encode())
+    for group in (game.skeletons, game.spiders, game.boss):
+        if isinstance(group, list):
+            digest.update(np.array([enemy.pos for enemy in group], dtype=np.float64).tobytes())
+        else:
+            digest.update(group.pos[:group.count][group.alive[:group.count]].tobytes())
+    for system in (game.projectiles, game.magic, game.sparks, game.particles):
+        digest.update(system.pos[:len(system)].tobytes())
+    return digest.digest()
+
+
+class InputRecorder:
+    def __init__(self, path, game):
+        '''
+        writes the inputs of every tick to a file so the session can be played back exactly
+        (path, game: it's seed and mode go in the header, so make the recorder before the first tick)
+        '''
+        self.file = open(path, 'wb')
+        flags = (FLAG_SWARM if game.swarm else 0) | (FLAG_BOSS_PHASES if game.boss_phases else 0)
+        self.file.write(HEADER.pack(MAGIC, VERSION, flags, game.seed, game.level))
+        self.buffer = bytearray()
+        self.ticks = 0
+
+    def record(self, inputs):
+        '''
+        (inputs of the tick about to be stepped)
+        '''
+        self.buffer.append(encode_inputs(inputs))
+        self.ticks += 1
+        if len(self.buffer) >= 4096:
+            self.file.write(self.buffer)
+            self.buffer.clear()
+
+    def close(self, game):
+        '''
+        writes whatever is left and the footer, game is fingerprinted so a replay can check it ended up in the same state
+        (game)
+        '''
+        self.file.write(self.buffer)
+        self.buffer.clear()
+        self.file.write(FOOTER.pack(FOOTER_MAGIC, self.ticks, fingerprint(game)))
+        self.file.close()
+
+
+class InputReplay:
+    def __init__(self, path):
+        '''
+        reads a recording made by InputRecorder, iterate it for the inputs of each tick
+        a recording without a footer (the game crashed) still plays, there's just nothing to check against at the end
+        (path)
+        '''
+        f = open(path, 'rb')
+        data = f.read()
+        f.close()
+        magic, version, flags, self.seed, self.level = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} input recording")
+        self.swarm = bool(flags & FLAG_SWARM)
+        self.boss_phases = bool(flags & FLAG_BOSS_PHASES)
+        self.fingerprint = None
+        end = len(data)
+        if end - HEADER.size >= FOOTER.size and data[end - FOOTER.size:end - FOOTER.size + 4] == FOOTER_MAGIC:
+            footer_magic, ticks, self.fingerprint = FOOTER.unpack_from(data, end - FOOTER.size)
+            end -= FOOTER.size
+            if ticks != end - HEADER.size:
+                raise ValueError(f"{path} says it has {ticks} ticks but has {end - HEADER.size}")
+        self.inputs = data[HEADER.size:end]
+
+    def __len__(self):
+        return len(self.inputs)
+
+    def __iter__(self):
+        for byte in self.inputs:
+            yield decode_inputs(byte)
+
+    def matches(self, game):
+        '''
+        checks a game that just played the recording back ended up where the recorded one did
+        (game) -> (True, False, or None if the recording has no footer)
+        '''
+        if self.fingerprint is None:
+            return None
+        return fingerprint(game) == self.fingerprint
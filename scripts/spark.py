@@ -1,38 +1,79 @@
 import math
-import random
+import numpy as np
 import pygame
 
-class Spark:
-    def __init__(self, pos, angle, speed):
+class SparkSystem:
+    def __init__(self, capacity=512, overflow='replace'):
         '''
-        initializing spark
-        (position: tuple. angle, speed)
+        fixed size pool holding every spark, each value lives in it's own array (struct of arrays)
+        (capacity: max sparks alive at once, overflow: 'replace' overwrites the spark closest to dying, 'drop' ignores new sparks when full)
         '''
-        self.pos = list(pos)
-        self.angle = angle
-        self.speed = speed
+        if overflow not in ('replace', 'drop'):
+            raise ValueError(f"unknown spark overflow policy: {overflow}")
+        self.capacity = capacity
+        self.overflow = overflow
+        self.count = 0 # sparks alive, they're always packed into [0, count)
+        self.pos = np.zeros((capacity, 2), dtype=np.float64)
+        self.direction = np.zeros((capacity, 2), dtype=np.float64) # cos/sin of the angle, angle never changes so only work it out once
+        self.speed = np.zeros(capacity, dtype=np.float64)
+
+    def __len__(self):
+        return self.count
+
+    def add(self, pos, angle, speed):
+        '''
+        spawns a spark
+        (position: tuple, angle, speed)
+        '''
+        if self.count < self.capacity:
+            i = self.count
+            self.count += 1
+        elif self.overflow == 'replace':
+            i = int(np.argmin(self.speed[:self.count])) # slowest spark is the next one to die anyways
+        else:
+            return
+        self.pos[i] = pos
+        self.direction[i] = (math.cos(angle), math.sin(angle))
+        self.speed[i] = speed
+
+    def clear(self):
+        '''
+        removes every spark
+        '''
+        self.count = 0
 
     def update(self):
         '''
-        update function
+        moves every spark and slows it down, sparks that stop are removed all at once
         '''
-        self.pos[0] += math.cos(self.angle) * self.speed
-        self.pos[1] += math.sin(self.angle) * self.speed
+        n = self.count
+        if not n:
+            return
+        speed = self.speed[:n]
+        self.pos[:n] += self.direction[:n] * speed[:, None]
+        np.maximum(speed - 0.1, 0, out=speed)
 
-        self.speed = max(0, self.speed - 0.1)
-        return not self.speed # when speed = 0, returns true therefore removing it from the list of sparks
-    
-    def render(self, surf, color, offset=(0,0)):
-        '''
-        renders the spark visible in a polygon shape
-        (surface, color, offect=(0,0))
-        '''
-        self.color = color
-        render_points = [
-            (self.pos[0] + math.cos(self.angle) * self.speed * 3 - offset[0], self.pos[1] + math.sin(self.angle) * self.speed * 3 - offset[1]), # want one part of the spark to be longer
-            (self.pos[0] + math.cos(self.angle + math.pi * 0.5) * self.speed * 0.5 - offset[0], self.pos[1] + math.sin(self.angle + math.pi * 0.5) * self.speed * 0.5 - offset[1]),
-            (self.pos[0] + math.cos(self.angle + math.pi) * self.speed * 3 - offset[0], self.pos[1] + math.sin(self.angle + math.pi) * self.speed * 3 - offset[1]), # want one part of the spark to be longer
-            (self.pos[0] + math.cos(self.angle - math.pi * 0.5) * self.speed * 0.5 - offset[0], self.pos[1] + math.sin(self.angle - math.pi * 0.5) * self.speed * 0.5 - offset[1])
+        alive = speed > 0 # when speed = 0, the spark is done
+        alive_count = int(np.count_nonzero(alive))
+        if alive_count != n: # compact the survivors to the front of the arrays
+            self.pos[:alive_count] = self.pos[:n][alive]
+            self.direction[:alive_count] = self.direction[:n][alive]
+            self.speed[:alive_count] = speed[alive]
+            self.count = alive_count
 
-        ]
-        pygame.draw.polygon(surf, color, render_points)
+    def render(self, surf, color, offset=(0, 0)):
+        '''
+        renders every spark as a polygon, the points for all of them are worked out in one go
+        (surface, color, offset=(0,0))
+        '''
+        n = self.count
+        if not n:
+            return
+        pos = self.pos[:n] - offset
+        direction = self.direction[:n]
+        speed = self.speed[:n, None]
+        long_arm = direction * speed * 3 # want one part of the spark to be longer
+        short_arm = direction[:, ::-1] * (-1, 1) * speed * 0.5 # angle + pi/2
+        points = np.stack((pos + long_arm, pos + short_arm, pos - long_arm, pos - short_arm), axis=1)
+        for render_points in points.tolist():
+            pygame.draw.polygon(surf, color, render_points)
@@ -0,0 +1,376 @@
+import math
+import numpy as np
+import pygame
+
+from scripts.tilemap import NEIGHBOR_OFFSET
+from scripts.collision import hit_effect
+
+def lengths(vectors):
+    '''
+    length of every vector, sqrt(x*x + y*y) like pygame's Vector2.length
+    (numpy array (count, 2)) -> (numpy array (count,))
+    '''
+    return np.sqrt(vectors[:, 0] * vectors[:, 0] + vectors[:, 1] * vectors[:, 1])
+
+def walk(vectors, speed):
+    '''
+    every vector scaled to speed, the same direction the enemies get from cos and sin of atan2 without any trig
+    a vector of length 0 walks right, like atan2(0, 0) = 0 does
+    (numpy array (count, 2), speed) -> (numpy array (count, 2))
+    '''
+    distance = lengths(vectors)
+    still = distance == 0
+    movement = vectors / np.where(still, 1, distance)[:, None] * speed
+    movement[still] = (speed, 0)
+    return movement
+
+class SwarmMember:
+    def __init__(self, swarm, index):
+        '''
+        stands in for one enemy of a swarm when something outside needs an object, like the collision handlers
+        (swarm, index into it's arrays)
+        '''
+        self.swarm = swarm
+        self.index = index
+
+    def rect(self):
+        return self.swarm.rect(self.index)
+
+    def dashed(self):
+        '''
+        same as Enemy.dashed
+        () -> (True, swarm enemies always die)
+        '''
+        game = self.swarm.game
+        game.screenshake = max(16, game.screenshake)  # apply screenshake
+        game.sfx['hit'].play()
+        hit_effect(game, self.rect().center, sides=True) # enemy death effect
+        return True
+
+
+class EnemySwarm:
+    e_type = '' # asset prefix, like PhysicsEntity.type
+    columns = ('pos', 'action', 'frame', 'flip', 'alive') # every per enemy array, subclasses add their own
+
+    def __init__(self, game, size, capacity=32):
+        '''
+        every enemy of one kind in a level kept in arrays, steering, timers, animation and tile collisions are done for all of them at once
+        plays the same as the enemy classes in entities.py, just without an object per enemy
+        (game, size: hitbox of every enemy, capacity: starting size, grows when full)
+        '''
+        self.game = game
+        self.size = size
+        self.anim_offset = (-3, -3) #renders with an offset to pad the animation against the hitbox
+        # the two animations every enemy has, action 0 is idle and 1 is run
+        animations = [game.assets[self.e_type + '/' + action] for action in ('idle', 'run')]
+        self.anim_frames = [np.array(animation.frames) for animation in animations] # atlas index of every image
+        self.anim_duration = np.array([animation.img_duration for animation in animations])
+        self.anim_length = np.array([animation.img_duration * len(animation.images) for animation in animations])
+        self.anim_loop = np.array([animation.loop for animation in animations])
+
+        self.count = 0 # enemies in the arrays, always packed into [0, count), dead ones get packed out on the next update
+        self.pos = np.zeros((capacity, 2))
+        self.action = np.zeros(capacity, dtype=np.int32)
+        self.frame = np.zeros(capacity, dtype=np.int32)
+        self.flip = np.zeros(capacity, dtype=bool)
+        self.alive = np.zeros(capacity, dtype=bool)
+
+    def __len__(self):
+        return int(np.count_nonzero(self.alive[:self.count]))
+
+    def _grow(self):
+        '''
+        doubles the size of every array
+        '''
+        capacity = len(self.pos) * 2
+        for name in self.columns:
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def add(self, pos):
+        '''
+        spawns an enemy
+        (position) -> (index)
+        '''
+        if self.count == len(self.pos):
+            self._grow()
+        i = self.count
+        self.count += 1
+        for name in self.columns:
+            getattr(self, name)[i] = 0
+        self.pos[i] = pos
+        self.alive[i] = True
+        return i
+
+    def remove(self, member):
+        '''
+        kills an enemy, it's arrays get packed out on the next update
+        (SwarmMember)
+        '''
+        self.alive[member.index] = False
+
+    def compact(self):
+        '''
+        packs the living enemies to the front of the arrays, same order
+        '''
+        n = self.count
+        alive = self.alive[:n].copy()
+        if alive.all():
+            return
+        alive_count = int(np.count_nonzero(alive))
+        for name in self.columns:
+            arr = getattr(self, name)
+            arr[:alive_count] = arr[:n][alive]
+        self.count = alive_count
+
+    def rect(self, i):
+        '''
+        (index) -> (rect)
+        '''
+        return pygame.Rect(self.pos[i, 0], self.pos[i, 1], self.size[0], self.size[1])
+
+    def overlapping(self, rect):
+        '''
+        every living enemy whose hitbox overlaps rect, same test as colliderect
+        (rect) -> (list of SwarmMember)
+        '''
+        n = self.count
+        corner = np.trunc(self.pos[:n]) # pygame.Rect drops the decimals
+        hit = self.alive[:n] & (corner[:, 0] < rect.right) & (corner[:, 0] + self.size[0] > rect.left) & (corner[:, 1] < rect.bottom) & (corner[:, 1] + self.size[1] > rect.top)
+        return [SwarmMember(self, i) for i in np.nonzero(hit)[0].tolist()]
+
+    def centers(self):
+        '''
+        center of every enemy's rect, same rounding as rect().center
+        () -> (numpy array (count, 2))
+        '''
+        return np.trunc(self.pos[:self.count]) + (self.size[0] // 2, self.size[1] // 2)
+
+    def headings(self, dis):
+        '''
+        which way every enemy should walk to get to the player, see Enemy.heading
+        (dis: numpy array (count, 2) straight at the player) -> (numpy array (count, 2))
+        '''
+        centers = self.centers()
+        waypoints, use = self.game.flow.waypoints(centers)
+        return np.where(use[:, None], waypoints - centers, dis)
+
+    def steer(self, player_pos):
+        '''
+        where every enemy wants to go this frame, subclasses handle their own timers here
+        (player position: numpy array) -> (movement: numpy array (count, 2), running: bool array)
+        '''
+        n = self.count
+        return np.zeros((n, 2)), np.zeros(n, dtype=bool)
+
+    def move(self, tilemap, movement):
+        '''
+        moves every enemy and pushes it out of solid tiles, x then y like PhysicsEntity.update
+        the 3x3 tiles around each enemy are checked in NEIGHBOR_OFFSET order so they get pushed out the same way
+        (tilemap, movement: numpy array (count, 2))
+        '''
+        n = self.count
+        pos = self.pos[:n]
+        size = self.size
+        ts = tilemap.tile_size
+        origin = np.array(tilemap.grid_origin)
+        grid_w, grid_h = tilemap.grid_size
+        offsets = np.array(NEIGHBOR_OFFSET)
+        for axis in (0, 1):
+            step = movement[:, axis]
+            pos[:, axis] += step
+            cells = np.floor_divide(pos, ts).astype(np.int64) - origin
+            # physics_rects_around has nothing for enemies whose own cell is off the grid
+            on_grid = (cells[:, 0] >= 0) & (cells[:, 0] < grid_w) & (cells[:, 1] >= 0) & (cells[:, 1] < grid_h)
+            around = cells[:, None, :] + offsets # (count, 9, 2) cells around every enemy
+            valid = on_grid[:, None] & (around[..., 0] >= 0) & (around[..., 0] < grid_w) & (around[..., 1] >= 0) & (around[..., 1] < grid_h)
+            solid = np.zeros(valid.shape, dtype=bool)
+            solid[valid] = tilemap.solid[around[..., 0][valid], around[..., 1][valid]]
+
+            # only enemies with a solid tile next to them can collide, the rest are done
+            near = np.nonzero(solid.any(axis=1))[0]
+            if not len(near):
+                continue
+            solid = solid[near]
+            tiles = (around[near] + origin) * ts # pixel corner of every tile around them
+            corner = np.trunc(pos[near]).astype(np.int64) # the entity rect, pygame.Rect drops the decimals
+            forward = step[near] > 0
+            back = step[near] < 0
+            moved = np.zeros(len(near), dtype=bool)
+            for k in np.nonzero(solid.any(axis=0))[0].tolist(): # in order, each push changes the rect the next tile is checked against
+                tile = tiles[:, k]
+                hit = solid[:, k] & (corner[:, 0] < tile[:, 0] + ts) & (corner[:, 0] + size[0] > tile[:, 0]) & (corner[:, 1] < tile[:, 1] + ts) & (corner[:, 1] + size[1] > tile[:, 1])
+                # moving forward snaps against the tile's near side, moving back against it's far side
+                corner[hit & forward, axis] = tile[hit & forward, axis] - size[axis]
+                corner[hit & back, axis] = tile[hit & back, axis] + ts
+                moved |= hit
+            rows = near[moved]
+            pos[rows, axis] = corner[moved, axis]
+
+    def update(self, tilemap):
+        '''
+        steers, moves and animates every enemy
+        (tilemap)
+        '''
+        self.compact()
+        n = self.count
+        if not n:
+            return
+        movement, running = self.steer(np.array(self.game.player.pos, dtype=np.float64))
+        self.move(tilemap, movement)
+
+        # find when to flip img for animation
+        flip = self.flip[:n]
+        flip[movement[:, 0] > 0] = False
+        flip[movement[:, 0] < 0] = True
+
+        # update animation, then switch animations the same way set_action does
+        action = self.action[:n]
+        frame = self.frame[:n]
+        length = self.anim_length[action]
+        np.copyto(frame, np.where(self.anim_loop[action], (frame + 1) % length, np.minimum(frame + 1, length - 1)))
+        new_action = running.astype(np.int32)
+        frame[new_action != action] = 0
+        action[:] = new_action
+
+    def sprites(self):
+        '''
+        atlas index of the image every enemy is showing
+        () -> (int array)
+        '''
+        n = self.count
+        action = self.action[:n]
+        image = self.frame[:n] // self.anim_duration[action]
+        sprites = np.zeros(n, dtype=np.int64)
+        for action_id, frames in enumerate(self.anim_frames):
+            mask = action == action_id
+            sprites[mask] = frames[image[mask]]
+        return sprites
+
+    def render(self, surf, offset=(0, 0)):
+        '''
+        renders every living enemy with one blits call
+        (surface, camera offset)
+        '''
+        n = self.count
+        if not n:
+            return
+        atlas = self.game.atlas
+        corners = self.pos[:n] + (self.anim_offset[0] - offset[0], self.anim_offset[1] - offset[1])
+        blits = []
+        for i, (sprite, corner, flip, alive) in enumerate(zip(self.sprites().tolist(), map(tuple, corners.tolist()), self.flip[:n].tolist(), self.alive[:n].tolist())):
+            if alive:
+                atlas_surf, area = atlas.source(sprite, flip)
+                blits.append((atlas_surf, corner, area))
+                blits.extend(self.attachments(i, offset))
+        surf.blits(blits, doreturn=False)
+
+    def attachments(self, i, offset):
+        '''
+        anything drawn on top of an enemy right after it, like the skeleton's bow
+        (index, camera offset) -> (list of blits)
+        '''
+        return []
+
+
+class SkeletonSwarm(EnemySwarm):
+    e_type = 'skele'
+    columns = EnemySwarm.columns + ('timer', 'walking')
+
+    def __init__(self, game, capacity=32):
+        '''
+        every skeleton in a level, see Skeleton
+        (game, capacity)
+        '''
+        super().__init__(game, (7, 15), capacity)
+        self.speed = 1 # enemy speed
+        self.timer = np.zeros(capacity, dtype=np.int32) # enemy shooting timer
+        self.walking = np.zeros(capacity, dtype=np.int32)
+
+    def add(self, pos):
+        i = super().add(pos)
+        self.walking[i] = 1
+        return i
+
+    def steer(self, player_pos):
+        n = self.count
+        pos = self.pos[:n]
+        timer = self.timer[:n]
+        walking = self.walking[:n]
+        dis = player_pos - pos
+        distance = lengths(dis)
+        heading = self.headings(dis)
+
+        movement = np.zeros((n, 2))
+        far = (walking != 0) & (distance >= 30)
+        near = (walking != 0) & ~far & (dis[:, 1] != 0) # close enough, line up with the player and shoot
+        movement[far] = walk(heading[far], self.speed)
+        movement[near, 1] = dis[near, 1] / distance[near] * self.speed * 1.5 # sin of the angle to the player, near never has a length of 0
+
+        ready = near & (timer == 0)
+        shoot_left = ready & self.flip[:n] & (dis[:, 0] < 0) # player is left of enemy, and enemy is looking left
+        shoot_right = ready & ~self.flip[:n] & (dis[:, 0] > 0)
+        for i in np.nonzero(shoot_left | shoot_right)[0].tolist():
+            rect = self.rect(i)
+            self.game.sfx['shoot'].play()
+            if shoot_left[i]:
+                arrow_pos = (rect.centerx - 7, rect.centery)
+                self.game.projectiles.add(arrow_pos, (-2.5, 0))
+                for j in range(4):
+                    self.game.sparks.add(arrow_pos, self.game.rng.random() - 0.5 + math.pi, 2 + self.game.rng.random()) # sparks at the arrow, facing left
+            else:
+                arrow_pos = (rect.centerx + 7, rect.centery)
+                self.game.projectiles.add(arrow_pos, (2.5, 0))
+                for j in range(4):
+                    self.game.sparks.add(arrow_pos, self.game.rng.random() - 0.5, 2 + self.game.rng.random()) # facing right
+        timer[shoot_left | shoot_right] = 60 # Set a cooldown timer for shooting
+
+        for i in np.nonzero(walking == 0)[0].tolist():
+            if self.game.rng.random() < 0.01: # 1 in every 6.1 seconds
+                walking[i] = self.game.rng.randint(30, 120)
+
+        # Reduce timer
+        np.maximum(timer - 1, 0, out=timer)
+        return movement, (movement != 0).any(axis=1)
+
+    def attachments(self, i, offset):
+        # renders the bow, a flipped one sits on the other side of the skeleton
+        rect = self.rect(i)
+        bow = self.game.sprites['bow']
+        if self.flip[i]:
+            atlas_surf, area = self.game.atlas.source(bow, True)
+            return [(atlas_surf, (rect.centerx + 1 - self.game.assets['bow'].get_width() + 2 - offset[0], rect.centery - 8 - offset[1]), area)]
+        atlas_surf, area = self.game.atlas.source(bow)
+        return [(atlas_surf, (rect.centerx - 1 - offset[0], rect.centery - 8 - offset[1]), area)]
+
+
+class SpiderSwarm(EnemySwarm):
+    e_type = 'spid'
+    columns = EnemySwarm.columns + ('bite',)
+
+    def __init__(self, game, capacity=32):
+        '''
+        every spider in a level, see Spider
+        (game, capacity)
+        '''
+        super().__init__(game, (10, 7), capacity)
+        self.speed = 1.5 # enemy speed
+        self.bite = np.zeros(capacity, dtype=np.int32) # counter
+
+    def steer(self, player_pos):
+        n = self.count
+        bite = self.bite[:n]
+        dis = player_pos - self.pos[:n]
+        distance = lengths(dis)
+        heading = self.headings(dis) # at the player, around walls when it's far
+
+        bite[distance < 13] = 150 # back off after biting
+        chase = (bite == 0) | (distance > 25)
+        movement = np.zeros((n, 2))
+        movement[chase] = walk(heading[chase], self.speed)
+
+        # Reduce timer
+        np.maximum(bite - 1, 0, out=bite)
+        return movement, movement[:, 0] != 0
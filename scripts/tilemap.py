@@ -1,6 +1,11 @@
 import json
+
+import numpy as np
 import pygame
 
+from scripts.mapformat import is_binary, decode_layers, layer_tiles, write_map
+from scripts.collision import SpatialHash
+
 # depends on order location that we are rendering the tiles, tuple(sorted() solves this, + we can't use list as a key therefore tuple
 AUTOTILE_MAP = {
     tuple(sorted([(1, 0), (0, 1)])): 0,
@@ -13,9 +18,15 @@ AUTOTILE_MAP = {
     tuple(sorted([(1, 0), (0, -1), (0, 1)])): 7,
     tuple(sorted([(1, 0), (-1, 0), (0, 1), (0, -1)])): 8,
 }
+AUTOTILE_SHIFTS = [(1, 0), (-1, 0), (0, -1), (0, 1)] # bit 0-3 of a neighbor mask, set when the neighbor is the same type
+# AUTOTILE_MAP as a list indexed by neighbor mask, -1 where the map has no variant for that mask
+AUTOTILE_LOOKUP = np.full(1 << len(AUTOTILE_SHIFTS), -1, dtype=np.int16)
+for neighbors, variant in AUTOTILE_MAP.items():
+    AUTOTILE_LOOKUP[sum(1 << AUTOTILE_SHIFTS.index(shift) for shift in neighbors)] = variant
 NEIGHBOR_OFFSET = [(-1, 0), (-1, -1), (0, -1), (1, -1), (1, 0), (0, 0), (-1, 1), (0, 1), (1, 1)]
 PHYSICS_TILES = {'grass', 'stone'}
 AUTOTILE_TYPES = {'grass', 'stone'}
+CHUNK_SIZE = 8 # tiles per side of a pre rendered chunk
 
 class Tilemap:
     def __init__(self, game, tile_size=16):
@@ -25,33 +36,413 @@ class Tilemap:
         '''
         self.game = game
         self.tile_size = tile_size
+        self._layers = None # a binary map that was loaded straight into the grid, it's tile dicts get made from these when something needs them
         self.tilemap = {} # map tile based on location, using a dictionary for conveince (dont have to fill in all the space like lists) 
         self.offgrid_tiles = []
+        self.type_ids = {} # tile type -> integer id used in the grid
+        self.type_names = [] # integer id -> tile type
+        self.chunks = {} # pre rendered chunks (chunk x, chunk y) -> surface, None if the chunk is empty, missing means it needs baking
+        self.version = 0 # goes up every time what the map looks like changes
+        self.on_edit = None # called with the pixel position of every tile placed, removed or re-variant'd, the editor's chunk store uses it to know what to save
+        self.build_grid()
+
+    def type_id(self, tile_type):
+        '''
+        integer id of a tile type, new types get the next free id
+        (tile type: str) -> (int)
+        '''
+        if tile_type not in self.type_ids:
+            self.type_ids[tile_type] = len(self.type_ids)
+            self.type_names.append(tile_type)
+        return self.type_ids[tile_type]
+
+    @property
+    def tilemap(self):
+        '''
+        the "x;y" -> tile dict, a map loaded from layers makes it the first time it's used
+        '''
+        if self._layers is not None:
+            self._build_tiles()
+        return self._tilemap
+
+    @tilemap.setter
+    def tilemap(self, tilemap):
+        self._layers = None
+        self._tilemap = tilemap
+
+    @property
+    def grid_index(self):
+        '''
+        (type, variant) -> {"x;y": order} of every grid tile, made along with the tile dicts for a map loaded from layers
+        '''
+        if self._layers is not None:
+            self._build_tiles()
+        return self._grid_index
+
+    @grid_index.setter
+    def grid_index(self, grid_index):
+        self._grid_index = grid_index
+
+    def _build_tiles(self):
+        '''
+        makes the tile dicts and grid index of a map loaded from layers, tiles keep the order they had in the file
+        '''
+        tiles = layer_tiles(self._layers)
+        self._layers = None
+        self._tilemap = {loc: tile for order, loc, tile in tiles}
+        self._grid_index = {}
+        for order, loc, tile in tiles:
+            self._grid_index.setdefault((tile['type'], tile['variant']), {})[loc] = order
+
+    def _new_grid(self, origin, size):
+        '''
+        empty grid arrays covering size cells from origin, every chunk has to be baked again
+        (tile coords of grid cell [0, 0], (width, height))
+        '''
+        self.grid_origin = origin
+        self.grid_size = size
+        # indexed [x, y]
+        self.grid_type = np.full(size, -1, dtype=np.int16) # -1 means no tile
+        self.grid_variant = np.zeros(size, dtype=np.int16)
+        self.solid = np.zeros(size, dtype=bool)
+        # solid rects in the 3x3 block around each cell, None until something asks for them, plain nested lists since indexing these is cheaper than numpy for one cell
+        self.rects_around = [[None] * size[1] for x in range(size[0])]
+        self.chunks = {}
+        self.version += 1
+
+    def build_grid(self):
+        '''
+        rebuilds the grid from self.tilemap, the json "x;y" dict is only how we store maps, every lookup goes through the grid
+        the grid covers every tile plus a 1 tile border so the cells right next to the map still know about their neighbors
+        '''
+        if self.tilemap:
+            xs = [tile['pos'][0] for tile in self.tilemap.values()]
+            ys = [tile['pos'][1] for tile in self.tilemap.values()]
+            self._new_grid((min(xs) - 1, min(ys) - 1), (max(xs) - min(xs) + 3, max(ys) - min(ys) + 3))
+        else:
+            self._new_grid((0, 0), (0, 0))
+        self.build_index()
+
+        for tile in self.tilemap.values():
+            self._write_cell(tile)
+
+    def build_index(self):
+        '''
+        rebuilds the (type, variant) index of every tile, so finding all tiles of a kind doesn't have to look at the whole map
+        each tile keeps a number for where it is in self.tilemap / self.offgrid_tiles, so lookups come back in the same order a full scan would
+        '''
+        self.grid_index = {} # (type, variant) -> {"x;y": order}
+        for order, (loc, tile) in enumerate(self.tilemap.items()):
+            self.grid_index.setdefault((tile['type'], tile['variant']), {})[loc] = order
+        self._index_all_offgrid()
+        self.next_order = max(len(self.tilemap), len(self.offgrid_tiles)) # new tiles go after everything
+
+    def _index_all_offgrid(self):
+        '''
+        rebuilds the index and spatial hash of every offgrid tile
+        '''
+        self.offgrid_index = {} # (type, variant) -> {id(tile): (order, tile)}
+        # offgrid tiles are also bucketed by their pixel bounds, so chunk baking and the editor only look at decor near them
+        self.offgrid_hash = SpatialHash(CHUNK_SIZE * self.tile_size) # one cell per chunk
+        self.offgrid_entries = {} # id(tile) -> (order, tile, rect it was hashed with)
+        for order, tile in enumerate(self.offgrid_tiles):
+            self._index_offgrid(tile, order)
+
+    def _unindex(self, loc):
+        '''
+        takes a grid tile out of the index
+        (location: str) -> (it's order)
+        '''
+        tile = self.tilemap[loc]
+        key = (tile['type'], tile['variant'])
+        order = self.grid_index[key].pop(loc)
+        if not self.grid_index[key]:
+            del self.grid_index[key]
+        return order
+
+    def grid_pos(self, tile_pos):
+        '''
+        converts a tile position into a cell in the grid
+        (tile position) -> (grid x, grid y)
+        '''
+        return (int(tile_pos[0]) - self.grid_origin[0], int(tile_pos[1]) - self.grid_origin[1])
+
+    def in_grid(self, gx, gy, border=0):
+        '''
+        checks if a cell is inside the grid, border keeps that many cells away from the edge
+        '''
+        return border <= gx < self.grid_size[0] - border and border <= gy < self.grid_size[1] - border
+
+    def _write_cell(self, tile):
+        '''
+        puts a tile into the grid
+        '''
+        gx, gy = self.grid_pos(tile['pos'])
+        self.grid_type[gx, gy] = self.type_id(tile['type'])
+        self.grid_variant[gx, gy] = tile['variant']
+        self.solid[gx, gy] = tile['type'] in PHYSICS_TILES
+
+    def _clear_cell(self, gx, gy):
+        '''
+        empties a cell of the grid
+        '''
+        self.grid_type[gx, gy] = -1
+        self.grid_variant[gx, gy] = 0
+        self.solid[gx, gy] = False
+
+    def _cache_rects_around(self, gx, gy):
+        '''
+        works out the solid rects around a cell, kept in NEIGHBOR_OFFSET order
+        (grid x, grid y) -> (tuple of rects)
+        '''
+        rects = []
+        for offset in NEIGHBOR_OFFSET:
+            x, y = gx + offset[0], gy + offset[1]
+            if self.in_grid(x, y) and self.solid[x, y]:
+                rects.append(pygame.Rect((x + self.grid_origin[0]) * self.tile_size, (y + self.grid_origin[1]) * self.tile_size, self.tile_size, self.tile_size))
+        self.rects_around[gx][gy] = tuple(rects)
+        return self.rects_around[gx][gy]
+
+    def _refresh_around(self, gx, gy):
+        '''
+        forgets the cached rects of a cell and it's neighbors after the cell changed, they're worked out again when asked for
+        '''
+        for offset in NEIGHBOR_OFFSET:
+            x, y = gx + offset[0], gy + offset[1]
+            if self.in_grid(x, y):
+                self.rects_around[x][y] = None
+
+    def set_tile(self, tile):
+        '''
+        places a tile on the grid, replacing whatever was there
+        (tile: dict with type, variant, pos in tiles)
+        '''
+        loc = str(int(tile['pos'][0])) + ';' + str(int(tile['pos'][1]))
+        if loc in self.tilemap: # replacing keeps the old tile's spot in the dict
+            order = self._unindex(loc)
+        else:
+            order = self.next_order
+            self.next_order += 1
+        self.tilemap[loc] = tile
+        self.grid_index.setdefault((tile['type'], tile['variant']), {})[loc] = order
+        gx, gy = self.grid_pos(tile['pos'])
+        if not self.in_grid(gx, gy, border=1): # outside the grid, it has to grow
+            self.build_grid()
+        else:
+            self._write_cell(tile)
+            self._refresh_around(gx, gy)
+            self.invalidate_tile(tile['pos'])
+        self._edited((int(tile['pos'][0]) * self.tile_size, int(tile['pos'][1]) * self.tile_size))
+
+    def remove_tile(self, loc):
+        '''
+        removes the tile at a "x;y" location from the grid
+        (location: str)
+        '''
+        if self._layers is not None and loc in self._layers['spawners']: # spawners come out of a map loaded from layers without making every tile's dict
+            tile = self._layers['spawners'].pop(loc)[1]
+        else:
+            self._unindex(loc)
+            tile = self.tilemap.pop(loc)
+        gx, gy = self.grid_pos(tile['pos'])
+        self._clear_cell(gx, gy)
+        self._refresh_around(gx, gy)
+        self.invalidate_tile(tile['pos'])
+        self._edited((int(tile['pos'][0]) * self.tile_size, int(tile['pos'][1]) * self.tile_size))
+
+    def _edited(self, pos):
+        if self.on_edit:
+            self.on_edit(pos)
+
+    def add_tiles(self, tiles, offgrid_tiles):
+        '''
+        puts a batch of tiles in at once without counting as an edit, for streaming parts of a map in
+        the grid is rebuilt once for the whole batch and baked chunks away from the new tiles are kept
+        (grid tiles, offgrid tiles)
+        '''
+        chunks = self.chunks
+        for tile in tiles:
+            self.tilemap[str(int(tile['pos'][0])) + ';' + str(int(tile['pos'][1]))] = tile
+        self.offgrid_tiles.extend(offgrid_tiles)
+        self.build_grid()
+        self.chunks = chunks
+        self._forget_chunks(tiles, offgrid_tiles)
+
+    def remove_tiles(self, locs, offgrid_tiles):
+        '''
+        takes a batch of tiles out at once without counting as an edit, for streaming parts of a map out
+        (grid tile "x;y" locations, offgrid tiles from offgrid_tiles)
+        '''
+        chunks = self.chunks
+        tiles = [self.tilemap.pop(loc) for loc in locs]
+        removed = set(map(id, offgrid_tiles))
+        self.offgrid_tiles = [tile for tile in self.offgrid_tiles if id(tile) not in removed]
+        self.build_grid()
+        self.chunks = chunks
+        self._forget_chunks(tiles, offgrid_tiles)
+
+    def _forget_chunks(self, tiles, offgrid_tiles):
+        '''
+        throws away the baked chunks a batch of tiles was in
+        '''
+        for tile in tiles:
+            self.chunks.pop((int(tile['pos'][0]) // CHUNK_SIZE, int(tile['pos'][1]) // CHUNK_SIZE), None)
+        for tile in offgrid_tiles:
+            self.invalidate_rect(self.offgrid_rect(tile))
+
+    def add_offgrid(self, tile):
+        '''
+        places a decor tile that isn't snapped to the grid
+        (tile: dict with type, variant, pos in pixels)
+        '''
+        self.offgrid_tiles.append(tile)
+        self._index_offgrid(tile, self.next_order)
+        self.next_order += 1
+        self.invalidate_rect(self.offgrid_rect(tile))
+        self._edited(tile['pos'])
+
+    def remove_offgrid(self, tile):
+        '''
+        removes a decor tile that isn't snapped to the grid
+        (tile: dict from offgrid_tiles)
+        '''
+        self.offgrid_tiles.remove(tile)
+        self._unindex_offgrid(tile)
+        self.invalidate_rect(self.offgrid_rect(tile))
+        self._edited(tile['pos'])
+
+    def _index_offgrid(self, tile, order):
+        '''
+        puts an offgrid tile in the index and the spatial hash
+        (tile: dict from offgrid_tiles, where it is in offgrid_tiles)
+        '''
+        rect = self.offgrid_rect(tile)
+        self.offgrid_index.setdefault((tile['type'], tile['variant']), {})[id(tile)] = (order, tile)
+        self.offgrid_entries[id(tile)] = (order, tile, rect)
+        self.offgrid_hash.insert(rect, id(tile))
+
+    def _unindex_offgrid(self, tile):
+        '''
+        takes an offgrid tile out of the index and the spatial hash
+        (tile: dict from offgrid_tiles)
+        '''
+        key = (tile['type'], tile['variant'])
+        del self.offgrid_index[key][id(tile)]
+        if not self.offgrid_index[key]:
+            del self.offgrid_index[key]
+        order, tile, rect = self.offgrid_entries.pop(id(tile))
+        self.offgrid_hash.remove(rect, id(tile))
+
+    def offgrid_in(self, rect):
+        '''
+        every offgrid tile overlapping a pixel rect, only looks at the ones hashed near it
+        (rect) -> (list of tiles, in the order they're drawn)
+        '''
+        entries = sorted(self.offgrid_entries[key] for key in self.offgrid_hash.query(rect))
+        return [tile for order, tile, tile_rect in entries if tile_rect.colliderect(rect)]
+
+    def offgrid_at(self, pos):
+        '''
+        every offgrid tile under a pixel position
+        (pixel position) -> (list of tiles)
+        '''
+        return self.offgrid_in(pygame.Rect(int(pos[0]), int(pos[1]), 1, 1))
+
+    def offgrid_rect(self, tile):
+        '''
+        pixel bounds of an offgrid tile, tiles the game has no image for (spawners) are tile sized
+        (tile) -> (Rect)
+        '''
+        if tile['type'] not in self.game.assets:
+            return pygame.Rect(tile['pos'][0], tile['pos'][1], self.tile_size, self.tile_size)
+        img = self.game.assets[tile['type']][tile['variant']]
+        return pygame.Rect(tile['pos'][0], tile['pos'][1], img.get_width(), img.get_height())
+
+    def invalidate_tile(self, tile_pos):
+        '''
+        throws away the pre rendered chunk holding a tile, it gets baked again next render
+        (tile position)
+        '''
+        self.chunks.pop((int(tile_pos[0]) // CHUNK_SIZE, int(tile_pos[1]) // CHUNK_SIZE), None)
+        self.version += 1
+
+    def invalidate_rect(self, rect):
+        '''
+        throws away every pre rendered chunk touching a pixel rect
+        (rect)
+        '''
+        chunk_px = CHUNK_SIZE * self.tile_size
+        for cx in range(rect.left // chunk_px, (rect.right - 1) // chunk_px + 1):
+            for cy in range(rect.top // chunk_px, (rect.bottom - 1) // chunk_px + 1):
+                self.chunks.pop((cx, cy), None)
+        self.version += 1
+
+    def find(self, id_pairs):
+        '''
+        every tile of the given kinds, straight from the index so it only costs as much as the number of matches
+        (List of tile ids: List) -> (list of matching offgrid tiles, list of "x;y" locations of matching grid tiles), both in map order
+        '''
+        keys = dict.fromkeys(id_pairs) # the same id twice shouldn't find tiles twice
+        offgrid = sorted(entry for key in keys for entry in self.offgrid_index.get(key, {}).values())
+        if self._layers is not None:
+            grid = sorted(self._find_in_layers(keys))
+        else:
+            grid = sorted((order, loc) for key in keys for loc, order in self.grid_index.get(key, {}).items())
+        return [tile for order, tile in offgrid], [loc for order, loc in grid]
+
+    def _find_in_layers(self, keys):
+        '''
+        find for a map loaded from layers that hasn't made it's tile dicts, spawners are already tiles and the rest are looked up in the layers
+        (keys: (type, variant) pairs) -> (list of (order, "x;y"))
+        '''
+        layers = self._layers
+        found = [(order, loc) for loc, (order, tile) in layers['spawners'].items() if (tile['type'], tile['variant']) in keys]
+        ox, oy = layers['origin']
+        for tile_type, variant in keys:
+            if tile_type not in layers['names']:
+                continue
+            xs, ys = np.nonzero((layers['types'] == layers['names'].index(tile_type) + 1) & (layers['variants'] == variant))
+            found += [(order, str(x) + ';' + str(y)) for x, y, order in zip((xs + ox).tolist(), (ys + oy).tolist(), layers['order'][xs, ys].tolist())]
+        return found
+
+    def _tile_at(self, loc):
+        '''
+        the grid tile at a "x;y" location, a map loaded from layers makes just this one instead of every tile's dict
+        (location: str) -> (tile, only edit it through set_tile)
+        '''
+        if self._layers is None:
+            return self.tilemap[loc]
+        if loc in self._layers['spawners']:
+            return self._layers['spawners'][loc][1]
+        x, y = (int(value) for value in loc.split(';'))
+        gx, gy = self.grid_pos((x, y))
+        return {'type': self.type_names[self.grid_type[gx, gy]], 'variant': int(self.grid_variant[gx, gy]), 'pos': [x, y]}
 
     def extract(self, id_pairs, keep=False):
         '''
         takes the ids of a tile list, and checks where the tile is in the list
         (List of tile ids: List, want to keep tile: bool) -> (list of matches)
         '''
-        matches = []
+        offgrid, locs = self.find(id_pairs)
         # offgrid
-        for tile in self.offgrid_tiles.copy():
-            if (tile['type'], tile['variant']) in id_pairs: # look for match
-                matches.append(tile.copy())
-                if not keep:
-                    self.offgrid_tiles.remove(tile)
-        
-        for loc in self.tilemap.copy():
-            tile = self.tilemap[loc]
-            if (tile['type'], tile['variant']) in id_pairs:
-                matches.append(tile.copy())
-                # change position for the tile we are referncing bc we want it in pixels, 
-                # copy so we dont modify the actual tile in the tilemap
-                matches[-1]['pos'] = matches[-1]['pos'].copy() 
-                matches[-1]['pos'][0] *= self.tile_size # x axis
-                matches[-1]['pos'][1] *= self.tile_size # y axis
-                if not keep:
-                    del self.tilemap[loc]
+        matches = [tile.copy() for tile in offgrid]
+        if offgrid and not keep: # out of the list in one go instead of a remove() per tile
+            for tile in offgrid:
+                self._unindex_offgrid(tile)
+                self.invalidate_rect(self.offgrid_rect(tile))
+            removed = set(map(id, offgrid))
+            self.offgrid_tiles = [tile for tile in self.offgrid_tiles if id(tile) not in removed]
+
+        for loc in locs:
+            tile = self._tile_at(loc)
+            matches.append(tile.copy())
+            # change position for the tile we are referncing bc we want it in pixels, 
+            # copy so we dont modify the actual tile in the tilemap
+            matches[-1]['pos'] = list(matches[-1]['pos'])
+            matches[-1]['pos'][0] *= self.tile_size # x axis
+            matches[-1]['pos'][1] *= self.tile_size # y axis
+            if not keep:
+                self.remove_tile(loc)
         return matches
 
     def tiles_around(self, pos):
@@ -61,89 +452,238 @@ class Tilemap:
         '''
         tiles = []
         # convert pixel position into grid position
-        tile_loc = (int(pos[0] // self.tile_size), int(pos[1] // self.tile_size)) # remove the .0 w int()
+        gx, gy = self.grid_pos((pos[0] // self.tile_size, pos[1] // self.tile_size))
         for offset in NEIGHBOR_OFFSET:
-            check_loc = str(tile_loc[0] + offset[0]) + ';' + str(tile_loc[1] + offset[1])
-            if check_loc in self.tilemap: # checks if tile is there and not just empty space
-                tiles.append(self.tilemap[check_loc])
+            x, y = gx + offset[0], gy + offset[1]
+            if self.in_grid(x, y) and self.grid_type[x, y] >= 0: # checks if tile is there and not just empty space
+                tiles.append(self.tilemap[str(x + self.grid_origin[0]) + ';' + str(y + self.grid_origin[1])])
         
         return tiles
     
     def save(self, path):
         '''
-        saves the tile map
+        saves the tile map, as a binary map if the path ends in .gqmap and json otherwise
         (file path to save to)
         '''
-        f = open(path, 'w') # open file
-        json.dump({'tilemap': self.tilemap, 'tile_size': self.tile_size, 'offgrid': self.offgrid_tiles}, f) # dump object into file
-        f.close()
+        write_map(path, {'tilemap': self.tilemap, 'tile_size': self.tile_size, 'offgrid': self.offgrid_tiles})
     
     def load(self, path):
         '''
-        load the tilemap using the path of the json file
+        load the tilemap from a json or binary map file, binary maps go straight into the grid (see load_layers)
         (file path to access tilemap from)
         '''
-        f = open(path, 'r')
-        map_data = json.load(f)
+        f = open(path, 'rb')
+        data = f.read()
         f.close()
+        if is_binary(data):
+            self.load_layers(decode_layers(data))
+            return
+        map_data = json.loads(data)
 
         self.tilemap = map_data['tilemap']
         self.tile_size = map_data['tile_size']
         self.offgrid_tiles = map_data['offgrid']
+        self.build_grid()
+
+    def load_layers(self, layers):
+        '''
+        loads a binary map's layers, the grid is filled from them with numpy instead of one tile at a time
+        the tile dicts and grid index wait until something needs them (editing, saving), playing a level never does
+        (layers from decode_layers)
+        '''
+        self.tile_size = layers['tile_size']
+        self.offgrid_tiles = layers['offgrid']
+        types = layers['types']
+        spawners = [tile for order, tile in layers['spawners'].values()]
+
+        # same bounds build_grid would find, the layers cover every grid tile but the spawners
+        xs = [tile['pos'][0] for tile in spawners]
+        ys = [tile['pos'][1] for tile in spawners]
+        if types.size:
+            xs += [layers['origin'][0], layers['origin'][0] + types.shape[0] - 1]
+            ys += [layers['origin'][1], layers['origin'][1] + types.shape[1] - 1]
+        if xs:
+            self._new_grid((min(xs) - 1, min(ys) - 1), (max(xs) - min(xs) + 3, max(ys) - min(ys) + 3))
+        else:
+            self._new_grid((0, 0), (0, 0))
+
+        if types.size:
+            ids = np.array([-1] + [self.type_id(name) for name in layers['names']], dtype=np.int16) # layer type -> grid type, 0 is empty
+            x, y = layers['origin'][0] - self.grid_origin[0], layers['origin'][1] - self.grid_origin[1]
+            self.grid_type[x:x + types.shape[0], y:y + types.shape[1]] = ids[types]
+            self.grid_variant[x:x + types.shape[0], y:y + types.shape[1]] = layers['variants']
+            self.solid = np.isin(self.grid_type, [self.type_ids[tile_type] for tile_type in PHYSICS_TILES if tile_type in self.type_ids])
+        for tile in spawners:
+            self._write_cell(tile)
+
+        self._layers = layers
+        self._tilemap = None
+        self._grid_index = None
+        self._index_all_offgrid()
+        self.next_order = max(layers['tiles'], len(self.offgrid_tiles)) # new tiles go after everything
+
+    def copy(self):
+        '''
+        a copy that can be played on or edited without changing this one, a lot quicker than loading the map again since the grid is copied instead of rebuilt
+        the solid rects are shared, they're read only anyway
+        () -> (Tilemap)
+        '''
+        other = Tilemap.__new__(Tilemap)
+        other.__dict__.update(self.__dict__)
+        other.offgrid_tiles = [dict(tile, pos=list(tile['pos'])) for tile in self.offgrid_tiles]
+        other.type_ids = dict(self.type_ids)
+        other.type_names = list(self.type_names)
+        other.grid_type = self.grid_type.copy()
+        other.grid_variant = self.grid_variant.copy()
+        other.solid = self.solid.copy()
+        other.rects_around = [column.copy() for column in self.rects_around]
+        other.chunks = {}
+        if self._layers is not None: # still no tile dicts, the copy shares the layers (they're only read) and gets it's own spawners
+            other._layers = dict(self._layers, spawners={loc: (order, dict(tile, pos=list(tile['pos']))) for loc, (order, tile) in self._layers['spawners'].items()})
+            other._index_all_offgrid() # the index points at the copied offgrid tiles
+        else:
+            other.tilemap = {loc: dict(tile, pos=list(tile['pos'])) for loc, tile in self.tilemap.items()}
+            other.build_index()
+        return other
+
+    def adopt(self, other):
+        '''
+        takes over everything another tilemap has loaded, so a map can be loaded into a spare tilemap on another thread and swapped in at once
+        anything holding on to this tilemap (the flow field, the editor) sees the new map, the version still only goes up
+        (tilemap to take from, don't use it after)
+        '''
+        version = max(self.version, other.version) + 1
+        self.__dict__.update(other.__dict__)
+        self.version = version
 
     def solid_check(self, pos):
         '''
-        checks the position and returns the location of any solide tiles next to it
-        (pos: tuple) -> (str)
+        checks if the pixel position is inside a solid tile
+        (pos: tuple) -> (bool)
+        '''
+        gx, gy = self.grid_pos((pos[0] // self.tile_size, pos[1] // self.tile_size))
+        return self.in_grid(gx, gy) and bool(self.solid[gx, gy])
+    
+    def solid_check_many(self, points):
+        '''
+        solid_check for a whole array of pixel positions at once
+        (points: numpy array of shape (n, 2)) -> (bool array)
         '''
-        tile_loc = str(int(pos[0] // self.tile_size)) + ';' + str(int(pos[1] // self.tile_size)) # gives tile location
-        if tile_loc in self.tilemap:
-            if self.tilemap[tile_loc]['type'] in PHYSICS_TILES:
-                return self.tilemap[tile_loc]
+        cells = np.floor_divide(points, self.tile_size).astype(np.int64) - self.grid_origin
+        inside = (cells[:, 0] >= 0) & (cells[:, 0] < self.grid_size[0]) & (cells[:, 1] >= 0) & (cells[:, 1] < self.grid_size[1])
+        solid = np.zeros(len(points), dtype=bool)
+        solid[inside] = self.solid[cells[inside, 0], cells[inside, 1]]
+        return solid
     
-    def autotile(self):
-        '''
-        auto tiles depending on it's neightbors
-        '''
-        for loc in self.tilemap:
-            tile = self.tilemap[loc]
-            neighbors = set()
-            for shift in [(1, 0), (-1, 0), (0, -1), (0, 1)]:
-                check_loc = str(tile['pos'][0] + shift[0]) + ';' + str(tile['pos'][1] + shift[1])
-                if check_loc in self.tilemap:
-                    if self.tilemap[check_loc]['type'] == tile['type']: # check if neighbors are same type/group
-                        neighbors.add(shift)
-            neighbors = tuple(sorted(neighbors)) #tuple(sorted() solves this, + we can't use list as a key therefore tuple
-            if (tile['type'] in AUTOTILE_TYPES) and (neighbors in AUTOTILE_MAP):
-                tile['variant'] = AUTOTILE_MAP[neighbors]
+    def _set_variant(self, gx, gy, variant):
+        '''
+        changes the variant of the tile in a grid cell, keeping the index and grid in step
+        '''
+        loc = str(gx + self.grid_origin[0]) + ';' + str(gy + self.grid_origin[1])
+        tile = self.tilemap[loc]
+        order = self._unindex(loc) # it's moving to another (type, variant) in the index
+        tile['variant'] = variant
+        self.grid_index.setdefault((tile['type'], variant), {})[loc] = order
+        self.grid_variant[gx, gy] = variant
+        self._edited((int(tile['pos'][0]) * self.tile_size, int(tile['pos'][1]) * self.tile_size))
+
+    def autotile_around(self, tile_pos):
+        '''
+        auto tiles a tile that was just placed or removed and it's 4 neighbors, nothing else can have changed
+        (tile position)
+        '''
+        gx, gy = self.grid_pos(tile_pos)
+        autotiled = [self.type_ids[tile_type] for tile_type in AUTOTILE_TYPES if tile_type in self.type_ids]
+        for x, y in [(gx, gy)] + [(gx + shift[0], gy + shift[1]) for shift in AUTOTILE_SHIFTS]:
+            if not self.in_grid(x, y, border=1) or self.grid_type[x, y] not in autotiled:
+                continue
+            tile_type = self.grid_type[x, y]
+            mask = 0
+            for bit, shift in enumerate(AUTOTILE_SHIFTS):
+                if self.grid_type[x + shift[0], y + shift[1]] == tile_type: # check if neighbors are same type/group
+                    mask |= 1 << bit
+            variant = int(AUTOTILE_LOOKUP[mask])
+            if variant >= 0 and variant != self.grid_variant[x, y]:
+                self._set_variant(x, y, variant)
+                self.invalidate_tile((x + self.grid_origin[0], y + self.grid_origin[1]))
+
+    def autotile(self, only=None):
+        '''
+        auto tiles the whole map depending on each tile's neighbors, the neighbor masks of every cell are worked out at once on the grid
+        (only: bool array shaped like the grid, just those cells get redone, None for every cell)
+        '''
+        grid_type = self.grid_type
+        mask = np.zeros(self.grid_size, dtype=np.int16)
+        for bit, (dx, dy) in enumerate(AUTOTILE_SHIFTS):
+            # same[x, y] is grid_type[x + dx, y + dy] == grid_type[x, y], the border means every tile has all 4 neighbors in the grid
+            same = np.zeros(self.grid_size, dtype=bool)
+            same[max(0, -dx):self.grid_size[0] - max(0, dx), max(0, -dy):self.grid_size[1] - max(0, dy)] = (
+                grid_type[max(0, dx):self.grid_size[0] + min(0, dx), max(0, dy):self.grid_size[1] + min(0, dy)] ==
+                grid_type[max(0, -dx):self.grid_size[0] - max(0, dx), max(0, -dy):self.grid_size[1] - max(0, dy)])
+            mask |= same.astype(np.int16) << bit
+        variants = AUTOTILE_LOOKUP[mask]
+        autotiled = np.isin(grid_type, [self.type_ids[tile_type] for tile_type in AUTOTILE_TYPES if tile_type in self.type_ids])
+        changed = autotiled & (variants >= 0) & (variants != self.grid_variant)
+        if only is not None:
+            changed &= only
+        for gx, gy in zip(*np.nonzero(changed)):
+            self._set_variant(gx, gy, int(variants[gx, gy]))
+        self.chunks = {} # variants changed all over, bake everything again
+        self.version += 1
 
     
     def physics_rects_around(self, pos):
         '''
-        filters nearby tiles to check if they have physics
-        (position) -> (list of rectangles) 
+        solid tile rects around a position, these are cached so treat them as read only
+        (position) -> (tuple of rectangles) 
         '''
-        rects = []
-        for tile in self.tiles_around(pos):
-            if tile['type'] in PHYSICS_TILES:
-                rects.append(pygame.Rect(tile['pos'][0] * self.tile_size, tile['pos'][1] * self.tile_size, self.tile_size, self.tile_size))
-        return rects
+        gx, gy = self.grid_pos((pos[0] // self.tile_size, pos[1] // self.tile_size))
+        if self.in_grid(gx, gy):
+            rects = self.rects_around[gx][gy]
+            if rects is None: # first time anything has been here since the cell changed
+                rects = self._cache_rects_around(gx, gy)
+            return rects
+        return ()
+
+    def bake_chunk(self, chunk):
+        '''
+        draws every tile in a chunk onto one surface, decor that pokes into the chunk gets drawn too
+        (chunk: (chunk x, chunk y)) -> (surface, None if nothing is in the chunk)
+        '''
+        chunk_px = CHUNK_SIZE * self.tile_size
+        origin = (chunk[0] * chunk_px, chunk[1] * chunk_px)
+        chunk_rect = pygame.Rect(origin[0], origin[1], chunk_px, chunk_px)
+        surf = None
+
+        # rendering offgrid tiles, decor gets rendered first (behind the actual tiles)
+        for tile in self.offgrid_in(chunk_rect):
+            if not surf:
+                surf = pygame.Surface((chunk_px, chunk_px), pygame.SRCALPHA)
+            surf.blit(self.game.assets[tile['type']][tile['variant']], (int(tile['pos'][0]) - origin[0], int(tile['pos'][1]) - origin[1])) # int first, the chunk origin can put us below 0
+
+        # grid tiles straight from the grid arrays, the part of the chunk that's in the grid
+        gx, gy = self.grid_pos((chunk[0] * CHUNK_SIZE, chunk[1] * CHUNK_SIZE))
+        x0, y0 = max(gx, 0), max(gy, 0)
+        x1, y1 = max(gx + CHUNK_SIZE, 0), max(gy + CHUNK_SIZE, 0)
+        types = self.grid_type[x0:x1, y0:y1]
+        variants = self.grid_variant[x0:x1, y0:y1]
+        xs, ys = np.nonzero(types >= 0)
+        for x, y, tile_type, variant in zip((xs + x0).tolist(), (ys + y0).tolist(), types[xs, ys].tolist(), variants[xs, ys].tolist()):
+            if not surf:
+                surf = pygame.Surface((chunk_px, chunk_px), pygame.SRCALPHA)
+            surf.blit(self.game.assets[self.type_names[tile_type]][variant], ((x + self.grid_origin[0]) * self.tile_size - origin[0], (y + self.grid_origin[1]) * self.tile_size - origin[1]))
+        return surf
 
     def render(self, surf, offset=(0, 0)):
         '''
-        renders tilemap on surface
+        renders tilemap on surface, one blit per chunk on screen, chunks get baked the first time they're seen
         (screen surface)
         '''
-        # rendering offgrid tiles, decor gets rendered first (behind the actual tiles)
-        for tile in self.offgrid_tiles:
-            surf.blit(self.game.assets[tile['type']][tile['variant']], (tile['pos'][0] - offset[0], tile['pos'][1] - offset[1]))
-
-        # for x in range(top left tile x position [tile coord], to top  right edge of screen [tile coord])
-        for x in range(offset[0] // self.tile_size, (offset[0] + surf.get_width()) // self.tile_size + 1):
-            for y in range(offset[1] // self.tile_size, (offset[1] + surf.get_height()) // self.tile_size + 1):
-                loc = str(x) + ';' + str(y)
-                if loc in self.tilemap:
-                    tile = self.tilemap[loc]
-                    # pos * tile size bc it's in terms of grid within tilemap currently, we want position in terms of pixels
-                    # (tile in assets, rendering pos)
-                    surf.blit(self.game.assets[tile['type']][tile['variant']], (tile['pos'][0] * self.tile_size - offset[0], tile['pos'][1] * self.tile_size - offset[1]))
\ No newline at end of file
+        chunk_px = CHUNK_SIZE * self.tile_size
+        # for x in range(top left chunk x position [chunk coord], to top right edge of screen [chunk coord])
+        for cx in range(offset[0] // chunk_px, (offset[0] + surf.get_width()) // chunk_px + 1):
+            for cy in range(offset[1] // chunk_px, (offset[1] + surf.get_height()) // chunk_px + 1):
+                if (cx, cy) not in self.chunks:
+                    self.chunks[(cx, cy)] = self.bake_chunk((cx, cy))
+                if self.chunks[(cx, cy)]:
+                    surf.blit(self.chunks[(cx, cy)], (cx * chunk_px - offset[0], cy * chunk_px - offset[1]))
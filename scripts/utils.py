@@ -2,14 +2,37 @@ import os
 
 import pygame
 
+from scripts.assetpack import AssetPack, PACK_PATH
+
 BASE_IMG_PATH = 'data/images/'
+BASE_DATA_PATH = 'data/'
+
+pack = None # AssetPack that images and sounds load from, None loads the files
+
+def use_pack(path=PACK_PATH):
+    '''
+    makes load_image, load_images and load_sound read from a compiled asset pack, if there is one
+    (path to the pack) -> (bool, True if the pack is being used)
+    '''
+    global pack
+    if not os.path.exists(path):
+        return False
+    try:
+        pack = AssetPack(path)
+    except ValueError: # built by an older version, the files still work
+        return False
+    return True
 
 def load_image(path):
     '''
     short cut to load a single image, removes the background and increasing preformance
     (file path) -> (img)
     '''
-    img = pygame.image.load(BASE_IMG_PATH + path).convert() # helps preformance when rendering
+    if pack and pack.fresh('images/' + path, BASE_IMG_PATH + path): # files changed after the pack was built win
+        return pack.image('images/' + path)
+    img = pygame.image.load(BASE_IMG_PATH + path)
+    if pygame.display.get_surface(): # convert needs a display, headless runs skip it
+        img = img.convert() # helps preformance when rendering
     img.set_colorkey((0, 0, 0)) # removes the background in png images
     return img
 
@@ -19,21 +42,118 @@ def load_images(path):
     (file path) -> (List of images within file)
     '''
     images = []
-    for img_name in sorted(os.listdir(BASE_IMG_PATH + path)):  # gives all files in the path, sorted makes it consistent with other operating systems (starting at 0->8)
+    img_names = sorted(os.listdir(BASE_IMG_PATH + path)) # gives all files in the path, sorted makes it consistent with other operating systems (starting at 0->8), the pack only has the pixels
+    for img_name in img_names:
         images.append(load_image(path + '/' + img_name))
     return images
 
+def load_sound(path):
+    '''
+    loads a sound effect, from the pack when it has it
+    (file path inside data/) -> (pygame.mixer.Sound)
+    '''
+    if pack and pack.fresh(path, BASE_DATA_PATH + path):
+        sound = pack.sound(path)
+        if sound:
+            return sound
+    return pygame.mixer.Sound(BASE_DATA_PATH + path)
+
+
+class NullSound:
+    '''
+    stand in for pygame.mixer.Sound when running headless, every call does nothing
+    '''
+    def play(self, loops=0):
+        pass
+
+    def stop(self):
+        pass
+
+    def set_volume(self, volume):
+        pass
+
+
+class SpriteAtlas:
+    def __init__(self, width=256):
+        '''
+        packs sprites into one surface, every sprite is stored facing both ways so we never flip while rendering
+        (width of the atlas in px)
+        '''
+        self.width = width
+        self.images = []
+        self.rects = [] # index -> (area facing right, area flipped)
+        self.surf = None # gets built the first time we need it
+
+    def add(self, img):
+        '''
+        adds a sprite to the atlas
+        (img) -> (index of the sprite)
+        '''
+        self.images.append(img)
+        self.surf = None # has to be packed again
+        return len(self.images) - 1
+
+    def build(self):
+        '''
+        packs every sprite into rows (tallest first), the flipped copy sits right next to the original
+        '''
+        self.rects = [None] * len(self.images)
+        x, y, row_height = 0, 0, 0
+        for index in sorted(range(len(self.images)), key=lambda i: -self.images[i].get_height()):
+            w, h = self.images[index].get_size()
+            if x + w * 2 > self.width: # next row
+                x, y, row_height = 0, y + row_height, 0
+            self.rects[index] = ((x, y, w, h), (x + w, y, w, h))
+            x += w * 2
+            row_height = max(row_height, h)
+
+        if pygame.display.get_surface():
+            self.surf = pygame.Surface((self.width, max(1, y + row_height))).convert() # matches load_image's converted images
+        else:
+            self.surf = pygame.Surface((self.width, max(1, y + row_height)), pygame.SRCALPHA) # headless images keep their alpha, so does the atlas
+        self.surf.fill((0, 0, 0, 0))
+        for img, rects in zip(self.images, self.rects):
+            self.surf.blit(img, rects[0][:2])
+            self.surf.blit(pygame.transform.flip(img, True, False), rects[1][:2])
+        self.surf.set_colorkey((0, 0, 0)) # same background removal as load_image
+
+    def size(self, index):
+        '''
+        (sprite index) -> (width, height)
+        '''
+        return self.images[index].get_size()
+
+    def source(self, index, flip=False):
+        '''
+        where a sprite is in the atlas, for batching blits
+        (sprite index, flip: bool) -> (atlas surface, area rect)
+        '''
+        if self.surf is None:
+            self.build()
+        return self.surf, self.rects[index][flip]
+
+    def blit(self, surf, index, pos, flip=False):
+        '''
+        draws a sprite from the atlas
+        (surface, sprite index, position, flip: bool, facing left)
+        '''
+        if self.surf is None:
+            self.build()
+        surf.blit(self.surf, pos, self.rects[index][flip])
+
 
 class Animation:
-    def __init__(self, images, img_dur=5, loop=True):
+    def __init__(self, images, img_dur=5, loop=True, atlas=None):
         '''
         initializing animation
+        (images, frames each image shows for, loop: bool, atlas: SpriteAtlas to pack the images into so they can be drawn by index)
         '''
         self.images = images
         self.loop = loop
         self.img_duration = img_dur
         self.done = False
         self.frame = 0
+        self.frames = [atlas.add(img) for img in images] if atlas else None # atlas index of each image
 
     def copy(self):
         '''
@@ -43,7 +163,9 @@ class Animation:
 
         () -> (Animation)
         '''
-        return Animation(self.images, self.img_duration, self.loop)
+        animation = Animation(self.images, self.img_duration, self.loop)
+        animation.frames = self.frames # shares the atlas frames too
+        return animation
     
     def update(self):
         '''
@@ -61,4 +183,10 @@ class Animation:
         '''
         returns the current image of the animation
         '''
-        return self.images[int(self.frame / self.img_duration)] # divides frame by how long each image shows for
\ No newline at end of file
+        return self.images[int(self.frame / self.img_duration)] # divides frame by how long each image shows for
+
+    def frame_index(self):
+        '''
+        returns the atlas index of the current image, only for animations made with an atlas
+        '''
+        return self.frames[int(self.frame / self.img_duration)]
\ No newline at end of file
@@ -0,0 +1,24 @@
+from scripts.utils import Animation
+from scripts.particle import ParticleSystem
+
+class Image:
+    def get_width(self):
+        return 4
+
+    def get_height(self):
+        return 4
+
+def frames_drawn(frame):
+    particles = ParticleSystem({'particle': Animation([Image() for i in range(4)], img_dur=6, loop=False)})
+    particles.add('particle', (0, 0), frame=frame)
+    drawn = []
+    while len(particles):
+        particles.update()
+        if len(particles): # what render would draw this frame
+            drawn.append(int(particles.frame[0]))
+    return drawn
+
+def test_particles_play_their_whole_animation_like_particle_did():
+    # Particle started it's animation at 0 whatever frame it was given, then was drawn once more after the last frame before being removed
+    assert frames_drawn(0) == list(range(1, 24))
+    assert frames_drawn(5) == frames_drawn(0)
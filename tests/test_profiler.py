@@ -0,0 +1,24 @@
+import json
+
+from scripts.profiler import FrameProfiler
+
+def test_counters_sharing_a_phase_name_export_as_counters(tmp_path):
+    profiler = FrameProfiler()
+    for frame in range(3):
+        with profiler.scope('step'):
+            with profiler.scope('particles'):
+                pass
+        profiler.count('particles', frame * 10)
+        profiler.count('sparks', frame)
+        profiler.end_frame()
+
+    path = tmp_path / 'trace.json'
+    profiler.export_trace(str(path))
+    events = json.loads(path.read_text())['traceEvents']
+
+    phases = [event for event in events if event['ph'] == 'X']
+    counters = [event for event in events if event['ph'] == 'C']
+    assert len(phases) == 6
+    assert all(event['dur'] >= 0 for event in phases)
+    assert [event['args'] for event in counters if event['name'] == 'particles'] == [{'particles': 0}, {'particles': 10}, {'particles': 20}]
+    assert len(counters) == 6
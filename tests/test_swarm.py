@@ -0,0 +1,45 @@
+import numpy as np
+
+from game import Game
+from scripts.replay import fingerprint
+
+MOVES = [[False, True, False, False], [False, False, True, False], [True, False, False, False], [False, False, False, True]]
+
+def enemy_positions(game):
+    positions = []
+    for group in (game.skeletons, game.spiders):
+        if isinstance(group, list):
+            positions.append(np.array([enemy.pos for enemy in group], dtype=np.float64).reshape(-1, 2))
+        else:
+            positions.append(group.pos[:group.count][group.alive[:group.count]])
+    return np.concatenate(positions)
+
+def play(swarms, ticks=600):
+    '''
+    runs a game for each swarm flag side by side on level 3 with the same inputs, yields the games after every tick
+    '''
+    games = []
+    for swarm in swarms:
+        game = Game(headless=True, seed=11, swarm=swarm)
+        game.level = 3
+        game.load_level(3)
+        games.append(game)
+
+    for tick in range(ticks):
+        inputs = {'movement': MOVES[tick // 90 % 4], 'dash': ['L'] if tick % 150 == 0 else []}
+        for game in games:
+            game.dead = min(game.dead, -2) # hits still happen, the level just never reloads
+            game.step(dict(inputs))
+        yield tick, games
+
+def test_swarm_follows_the_enemy_objects():
+    # the swarm steers with a division instead of atan2/cos/sin, so it's only the same to a rounding error
+    for tick, (objects, swarm) in play((False, True)):
+        a, b = enemy_positions(objects), enemy_positions(swarm)
+        assert a.shape == b.shape, f"different enemies alive on tick {tick}"
+        assert np.allclose(a, b, rtol=0, atol=1e-6), f"enemies moved apart on tick {tick}"
+
+def test_swarm_is_deterministic():
+    for tick, games in play((True, True)):
+        pass
+    assert fingerprint(games[0]) == fingerprint(games[1])